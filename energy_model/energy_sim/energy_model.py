@@ -3,8 +3,15 @@
 
 # Import
 # import pandas
+import collections
+import numpy
 # Import custom
 from energy_sim import utils
+from energy_sim import problem_instance
+from energy_sim import schedule
+
+# Tracing
+log = utils.get_log(__name__)
 
 ######################
 # Energy consumption #
@@ -28,7 +35,8 @@ from energy_sim import utils
 #   a        : ARCH value
 #   D[d]     : array of DPUs
 #   A[d]     : array of arch values
-#   k[n]     : multi-threading runtime adjustment factor
+#   k[d,n]   : multi-threading runtime adjustment factor of DPU (d) running (n) threads,
+#               tabulated from a pluggable interference model (see interference.py)
 #   M[t]     : DNN model of thread t
 #   t[a,m]   : single-thread runtime of model (m) on arch (a) (measured)
 #   p[a,m]   : single-thread power draw of model (m) on arch (a) (measured)
@@ -39,6 +47,8 @@ from energy_sim import utils
 #               => W[d] = S[d,:]
 #               => D[m] = S[:,m]
 #   D[m]     : target DPU for thread (m)
+#   X[m]     : Assignment array {num_threads}, i.e. X[m] = D[m]
+#               => S[m,d] = (X[m] == d)
 #   W[d]     : thread array allocated to DPU (d), including Idle time (m=Idle) for (d)
 #   N[d]     : popcount(W[d])
 # Outputs:
@@ -54,61 +64,103 @@ from energy_sim import utils
 #               E_comp = sum[D[:]](E[:])
 #   E_tot_idle : batch multi-DPU idle energy consumption
 #               E_tot_idle = sum[D[:]](t[A[d],"Idle"] * p[A[d],"Idle"])
+# Semantics:
+#   The model above is the "per-npu" semantics of a ProblemInstance. By default, instances
+#   keep the "baseline" semantics of the original loops (see evaluate_baseline), which
+#   evaluate, evaluate_batch (without a base load) and the dataframe-based wrappers follow.
+#   Count-based and incremental evaluations (Load, evaluate_counts, schedule_state) only
+#   implement the per-npu semantics, hence so do the schedulers built on them.
 
-def compute_energy_model(
-            hw_config_df,   # D array
-            workload_df,    # W array
-            S: list[list[int]],              # Allocation matrix
-            runtime_df,     # t(a,m)
-            avg_power_df,   # p(a,mo)
-            compute_Ttot: bool,
-            compute_Ecompute: bool,
-            compute_E_idle: bool,
+# Single-pass evaluation record
+#   T_d[d], E_d[d], E_idle_d[d] : per-NPU breakdown
+#   T_tot, E_compute, E_idle, E_tot : totals
+class Evaluation(collections.namedtuple("Evaluation", [
+            "T_d",
+            "E_d",
+            "E_idle_d",
+            "T_tot",
+            "E_compute",
+            "E_idle",
+            "E_tot",
+        ])):
+    __slots__ = ()
+
+    # Value of an optimization target
+    def objective ( self, opt_target: str ) -> float:
+        return objective_by(
+                opt_target=opt_target,
+                T_tot=self.T_tot,
+                E_comp=self.E_compute,
+                E_idle=self.E_idle,
+            )
+
+# Supported optimization targets
+OPT_TARGETS = [
+        "T_tot",
+        "E_compute",
+        "E_idle",
+        "E_tot",
+    ]
+
+# Select optimization target from evaluated totals (scalars or arrays)
+def objective_by (
+            opt_target: str,    # Optimization target
+            T_tot,
+            E_comp,
+            E_idle,
         ):
+    if opt_target == "T_tot":
+        return T_tot
+    elif opt_target == "E_compute":
+        return E_comp
+    elif opt_target == "E_idle":
+        return E_idle
+    elif opt_target == "E_tot":
+        return E_comp + E_idle
+    else:
+        # Print and error out
+        utils.print_error("Unsupported optimization target " + opt_target)
+        exit(1)
+
+# Evaluate all objectives in a single pass over the schedule, in the instance's semantics
+def evaluate(
+            instance: problem_instance.ProblemInstance,
+            S,              # Schedule: assignment array, or allocation matrix
+        ) -> Evaluation:
+    if instance.semantics == "baseline":
+        return evaluate_baseline(instance, S)
+    return evaluate_per_npu(instance, S)
+
+# Evaluate all objectives in a single pass over the schedule, in the per-npu semantics
+def evaluate_per_npu(
+            instance: problem_instance.ProblemInstance,
+            S,              # Schedule: assignment array, or allocation matrix
+        ) -> Evaluation:
 
     ########################
     # Init data-structures #
     ########################
-    # Init return values
-    T_tot = 0.
-    E_comp = 0.
-    E_idle_tot = 0.
-
-    # Unroll hw_config dataframe
-    D = list(range(len(hw_config_df)))
-    utils.print_log(f"D: {D}")
-    A = hw_config_df["ARCH"].values
-    utils.print_log(f"A: {A}")
-    M = workload_df["Model"].values
-    utils.print_log(f"M: {M}")
-
     # Pre-compute lengths
-    LEN_D = len(D)
-    LEN_W = len(M)
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
 
     # Debug
-    utils.print_log(f"hw_config_df  : {hw_config_df}")
-    utils.print_log(f"workload_df   : {workload_df}")
+    log("instance: %s", instance)
+    # Assignment array X[thread] = d, from either schedule representation
+    X = schedule.as_schedule(S).astype(numpy.intp)
+    assert(len(X) == LEN_W)
     # Debug
-    if utils.LOG_ON :
-        utils.print_log("[compute_energy_model] S:")
-        for i in range(0,LEN_W):
-            print("\t", i, ": ", end="")
-            for j in range(0,LEN_D):
-                print(str(S[i][j]) + ", ", end='')
-            print("")
-
-    # Load dataframes
-    t = runtime_df
-    p = avg_power_df
+    log("[evaluate] X: %s", X)
 
     # Count number of threads per DPU
-    N = [0 for _ in range(LEN_D)]
-    for i in range(0,LEN_W):
-        for d in D:
-            if S[i][d] == 1:
-                N[d] += 1
-    utils.print_log(f"N: {N}")
+    N = numpy.bincount(X, minlength=LEN_D)
+    log("N: %s", N)
+
+    # Multi-threading adjustment factor k[d,N[d]]
+    k_N = instance.k[numpy.arange(LEN_D), N]
+
+    # Thread indices, to gather (thread,X[thread]) pairs
+    threads = numpy.arange(LEN_W)
 
     ###########
     # Runtime #
@@ -121,42 +173,19 @@ def compute_energy_model(
     #               => t[A[d],"Idle"] = T_tot - T[d]
     #               => sum[D[:]](T[:]) = T_tot, for each (d)
 
-    # Compute DPU runtimes
-    if compute_Ttot:
-        utils.print_log(f"[compute_energy_model] Compute DPU runtimes T_tot")
-        T = [0. for _ in range(LEN_D)]
-        # Compute: T[d] = sum[W[d]](t[A[d],:]) * k[N[d]]
-        for thread_index in range(LEN_W):
-            # Compute: sum[W[d]](t[A[d],:])
-            allocated_threads = 1
-            for d in D:
-                utils.print_log(f"A[d] {A[d]}")
-                # If allocated
-                if S[thread_index][d]:
-                    utils.print_log(f"model {M[thread_index]}")
-                    T[d] += t.loc[
-                            (t["ARCH"] == A[d])
-                            &
-                            (t["Model"] == M[thread_index])
-                        ]["Runtime (s)"].values[0] * utils.k[allocated_threads]
-                    # Increment counter
-                    allocated_threads += 1
-        # # Adjust for multi-threading (k[N[d]])
-        # for d in D:
-        #     T[d] *= utils.k[N[d]]
-        utils.print_log("T:" + str(T))
-
-        # Compute total T_tot = max[d](T[d])
-        T_tot = max(T)
-        utils.print_log("T_tot:" + str(T_tot))
-
-        # Compute idle times
-        T_idle = [0. for _ in range(LEN_D)]
-        for d in D:
-            T_idle[d] = T_tot - T[d]
-            # TBD
-            # assert(math.isclose(sum(t[A[d]]) + T_idle[0], T))
-        utils.print_log("T_idle:" + str(T_idle))
+    # Compute: T[d] = sum[W[d]](t[A[d],:]) * k[N[d]]
+    # Gather t[A[X[thread]],M[thread]] and scatter-add per DPU
+    t = instance.runtime[threads, X]
+    T = numpy.bincount(X, weights=t, minlength=LEN_D) * k_N
+    log("T:%s", T)
+
+    # Compute total T_tot = max[d](T[d])
+    T_tot = float(T.max())
+    log("T_tot:%s", T_tot)
+
+    # Compute idle times
+    T_idle = T_tot - T
+    log("T_idle:%s", T_idle)
 
     ######################
     # Energy consumption #
@@ -166,95 +195,398 @@ def compute_energy_model(
     #   E_comp    : batch multi-DPU energy consumption
     #               E_comp = sum[D[:]](E[:])
 
-    if compute_Ecompute:
-        utils.print_log(f"[compute_energy_model] Compute DPU energy draws E_compute")
-        E = [0. for _ in range(LEN_D)]
-        # Compute: E[d] = sum[W[d]](p[A[d],] * t[A[d],:]) * k[N[d]]
-        allocated_threads = 1
-        for thread_index in range(LEN_W):
-            for d in D:
-                # Compute: sum[W[d]](t[A[d],:])
-                # If allocated
-                if S[thread_index][d]:
-                    # Extract runtime
-                    runtime = t.loc[
-                            (t["ARCH"] == A[d])
-                            &
-                            (t["Model"] == M[thread_index])
-                        ]["Runtime (s)"].values[0]
-                    # Extract power
-                    # PS
-                    power_ps = p.loc[
-                            (p["ARCH"] == A[d])
-                            &
-                            (p["Model"] == M[thread_index])
-                        ]["Power PS (mW)"].values[0]
-                    # PL
-                    power_pl = p.loc[
-                            (p["ARCH"] == A[d])
-                            &
-                            (p["Model"] == M[thread_index])
-                        ]["Power PL (mW)"].values[0]
-                    # Calculate compute energy
-                    # Adjust for multi-threading (k[N[d]])
-                    E[d] = (power_pl + power_ps) * runtime * utils.k[allocated_threads]
-                    # Increment counter
-                    allocated_threads += 1
-        # Adjust for multi-threading (k[N[d]])
-        # for d in D:
-        #     E[d] *= utils.k[N[d]]
-        # # Print
-        # utils.print_log("E:" + str(E))
-
-        # Compute total E_comp = sum[D[:]](E[:])
-        E_comp = sum(E)
-        utils.print_log(f"E_comp: {E_comp}")
+    # Compute: E[d] = sum[W[d]](p[A[d],] * t[A[d],:]) * k[N[d]]
+    # Gather p*t[A[X[thread]],M[thread]] and scatter-add per DPU
+    e = instance.energy[threads, X]
+    E = numpy.bincount(X, weights=e, minlength=LEN_D) * k_N
+    log("E:%s", E)
 
+    # Compute total E_comp = sum[D[:]](E[:])
+    E_comp = float(E.sum())
+    log("E_comp: %s", E_comp)
 
     ###########################
     # Idle energy consumption #
     ###########################
+    # Calculate idle energy
+    #   E_idle[d] = (p_ps[A[d],"Idle"] + p_pl[A[d],"Idle"]) * T_idle[d]
+    E_idle = instance.power_idle * T_idle
+    # Print
+    log("E_idle: %s", E_idle)
 
+    # Wasted energy
+    E_idle_tot = float(E_idle.sum())
+    log("E_idle_tot:%s", E_idle_tot)
 
-    if compute_E_idle:
-        utils.print_log(f"[compute_energy_model] Compute DPU idle energy draws E_idle_tot")
+    # # Percentage
+    # energy_waste =  E_idle_tot / (E_comp + E_idle_tot)
+    # utils.print_log("Wasted energy: " + "{:2.2}".format(energy_waste) + "%")
+
+    # Return values
+    return Evaluation(
+            T_d=T,
+            E_d=E,
+            E_idle_d=E_idle,
+            T_tot=T_tot,
+            E_compute=E_comp,
+            E_idle=E_idle_tot,
+            E_tot=E_comp + E_idle_tot,
+        )
+
+#####################
+# Baseline behavior #
+#####################
+# The original compute_energy_model loops did not implement the model above:
+#   T[d]     : the thread counter was reset per thread, hence k[1] = 1 was always applied
+#               => T[d] = sum[W[d]](t[A[d],:])
+#   E[d]     : overwritten instead of accumulated, with k indexed by a counter over all
+#               allocated threads, i.e. (j+1) for thread (j)
+#               => E[d] = p[A[d],M[j]] * t[A[d],M[j]] * k[j+1], with (j) the last thread in W[d]
+# These are the default "baseline" semantics of a ProblemInstance, for output equivalence
+# with earlier runs. See CHANGELOG.md.
+def evaluate_baseline(
+            instance: problem_instance.ProblemInstance,
+            S,              # Schedule: assignment array, or allocation matrix
+        ) -> Evaluation:
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    X = schedule.as_schedule(S).astype(numpy.intp)
+    assert(len(X) == LEN_W)
+    threads = numpy.arange(LEN_W)
 
-        # Assert T_idle has been computed
+    # T[d] = sum[W[d]](t[A[d],:])
+    T = numpy.bincount(X, weights=instance.runtime[threads, X], minlength=LEN_D)
+    T_tot = float(T.max())
+
+    # Last thread (j) allocated to each NPU, -1 if none
+    last = numpy.full(LEN_D, -1)
+    numpy.maximum.at(last, X, threads)
+    # E[d] = p*t[A[d],M[j]] * k[j+1]
+    npus = numpy.flatnonzero(last >= 0)
+    E = numpy.zeros(LEN_D)
+    E[npus] = instance.energy[last[npus], npus] * instance.k[npus, last[npus] + 1]
+    E_comp = float(E.sum())
+
+    # E_idle[d] = p[A[d],"Idle"] * (T_tot - T[d])
+    E_idle = instance.power_idle * (T_tot - T)
+    E_idle_tot = float(E_idle.sum())
+    log("[evaluate_baseline] T: %s E: %s E_idle: %s", T, E, E_idle)
+
+    # Return values
+    return Evaluation(
+            T_d=T,
+            E_d=E,
+            E_idle_d=E_idle,
+            T_tot=T_tot,
+            E_compute=E_comp,
+            E_idle=E_idle_tot,
+            E_tot=E_comp + E_idle_tot,
+        )
+
+# Batched version of evaluate_baseline
+def evaluate_baseline_batch(
+            instance: problem_instance.ProblemInstance,
+            X,              # Assignment arrays {NUM_S x LEN_W}
+        ):
+
+    # Pre-compute lengths
+    X = numpy.asarray(X, dtype=numpy.intp)
+    NUM_S, LEN_W = X.shape
+    LEN_D = instance.LEN_D
+    threads = numpy.arange(LEN_W)
+    bins = (numpy.arange(NUM_S)[:,None] * LEN_D + X).ravel()
+
+    # T[s,d] = sum[W[d]](t[A[d],:])
+    T = numpy.bincount(bins, weights=instance.runtime[threads, X].ravel(), minlength=NUM_S * LEN_D).reshape(NUM_S, LEN_D)
+
+    # Last thread (j) allocated to each (s,d), -1 if none
+    last = numpy.full(NUM_S * LEN_D, -1)
+    numpy.maximum.at(last, bins, numpy.tile(threads, NUM_S))
+    last = last.reshape(NUM_S, LEN_D)
+    # E[s,d] = p*t[A[d],M[j]] * k[j+1]
+    npus = numpy.broadcast_to(numpy.arange(LEN_D), (NUM_S, LEN_D))
+    allocated = last >= 0
+    E = numpy.zeros((NUM_S, LEN_D))
+    E[allocated] = instance.energy[last[allocated], npus[allocated]] * instance.k[npus[allocated], last[allocated] + 1]
+
+    # Totals
+    T_tot = T.max(axis=1)
+    E_comp = E.sum(axis=1)
+    E_idle_tot = ((T_tot[:,None] - T) * instance.power_idle).sum(axis=1)
+
+    # Return values
+    return T_tot, E_comp, E_idle_tot
+
+# Per-NPU load of threads already allocated, before the multi-threading adjustment
+#   N[d]     : number of threads allocated to DPU (d)
+#   t_sum[d] : sum[W[d]](t[A[d],:])
+#   e_sum[d] : sum[W[d]](p[A[d],:] * t[A[d],:])
+class Load(collections.namedtuple("Load", [
+            "N",
+            "t_sum",
+            "e_sum",
+        ])):
+    __slots__ = ()
+
+    # Accumulate another load
+    def __add__ ( self, other: "Load" ) -> "Load":
+        return Load(
+                N=self.N + other.N,
+                t_sum=self.t_sum + other.t_sum,
+                e_sum=self.e_sum + other.e_sum,
+            )
+
+# Load of a schedule
+def load_of(
+            instance: problem_instance.ProblemInstance,
+            S,              # Schedule: assignment array, or allocation matrix
+        ) -> Load:
+    X = schedule.as_schedule(S).astype(numpy.intp)
+    threads = numpy.arange(instance.LEN_W)
+    return Load(
+            N=numpy.bincount(X, minlength=instance.LEN_D),
+            t_sum=numpy.bincount(X, weights=instance.runtime[threads, X], minlength=instance.LEN_D),
+            e_sum=numpy.bincount(X, weights=instance.energy[threads, X], minlength=instance.LEN_D),
+        )
+
+# Batched version of evaluate
+# Inputs:
+#   X[s,thread] : stack of NUM_S candidate schedules, as target NPU index per thread {NUM_S x LEN_W}
+#   base        : optional Load of threads allocated before these, shared by all candidates
+# Outputs:
+#   T_tot[s], E_comp[s], E_idle_tot[s] : arrays of length NUM_S
+# NOTE: a base load is only defined in the per-npu semantics, which it implies
+def evaluate_batch(
+            instance: problem_instance.ProblemInstance,
+            X,              # Assignment arrays {NUM_S x LEN_W}
+            base: Load = None,
+        ):
+
+    # Baseline semantics
+    if base is None and instance.semantics == "baseline":
+        return evaluate_baseline_batch(instance, X)
+
+    # Pre-compute lengths
+    X = numpy.asarray(X, dtype=numpy.intp)
+    NUM_S, LEN_W = X.shape
+    LEN_D = instance.LEN_D
+    log("[evaluate_batch] NUM_S: %s, LEN_W: %s, LEN_D: %s", NUM_S, LEN_W, LEN_D)
+
+    # Gather t[A[X[s,thread]],M[thread]] and p*t {NUM_S x LEN_W}
+    threads = numpy.arange(LEN_W)
+    t = instance.runtime[threads, X]
+    e = instance.energy[threads, X]
+
+    # Scatter-add to per-NPU bins (s,d) {NUM_S x LEN_D}
+    bins = (numpy.arange(NUM_S)[:,None] * LEN_D + X).ravel()
+    N = numpy.bincount(bins, minlength=NUM_S * LEN_D).reshape(NUM_S, LEN_D)
+    t_sum = numpy.bincount(bins, weights=t.ravel(), minlength=NUM_S * LEN_D).reshape(NUM_S, LEN_D)
+    e_sum = numpy.bincount(bins, weights=e.ravel(), minlength=NUM_S * LEN_D).reshape(NUM_S, LEN_D)
+    # On top of the base load
+    if base is not None:
+        N += base.N
+        t_sum += base.t_sum
+        e_sum += base.e_sum
+    k_N = instance.k[numpy.arange(LEN_D), N]
+    T = t_sum * k_N
+    E = e_sum * k_N
+
+    # T_tot = max[d](T[d])
+    T_tot = T.max(axis=1)
+    # E_comp = sum[D[:]](E[:])
+    E_comp = E.sum(axis=1)
+    # E_idle_tot = sum[D[:]](p[A[d],"Idle"] * (T_tot - T[d]))
+    E_idle_tot = ((T_tot[:,None] - T) * instance.power_idle).sum(axis=1)
+
+    # Return values
+    return T_tot, E_comp, E_idle_tot
+
+##########################
+# Count-based evaluation #
+##########################
+# The model only depends on how many threads of each model land on each NPU:
+#   C[d,m]   : number of threads of model (m) allocated to NPU (d) {LEN_D x LEN_M}
+#               => N[d] = sum[m](C[d,m])
+#               => T[d] = k[N[d]] * sum[m](C[d,m] * t[A[d],m])
+#               => E[d] = k[N[d]] * sum[m](C[d,m] * p[A[d],m] * t[A[d],m])
+# with (m) indexing instance.models. Cost is O(LEN_D * LEN_M), independent of LEN_W.
+
+# Count matrix C {LEN_D x LEN_M} of an assignment array
+def count_matrix(
+            instance: problem_instance.ProblemInstance,
+            S,              # Schedule: assignment array, or allocation matrix
+        ) -> numpy.ndarray:
+    X = schedule.as_schedule(S).astype(numpy.intp)
+    LEN_M = len(instance.models)
+    C = numpy.bincount(
+            X * LEN_M + instance.model_of_thread,
+            minlength=instance.LEN_D * LEN_M,
+        )
+    return C.reshape(instance.LEN_D, LEN_M)
+
+# Evaluate all objectives from a count matrix
+def evaluate_counts(
+            instance: problem_instance.ProblemInstance,
+            C,              # Count matrix {LEN_D x LEN_M}
+        ) -> Evaluation:
+
+    # Check all threads are allocated exactly once
+    C = numpy.asarray(C)
+    assert(numpy.array_equal(C.sum(axis=0), instance.model_counts))
+
+    # Threads per NPU, and k[d,N[d]]
+    N = C.sum(axis=1)
+    k_N = instance.k[numpy.arange(instance.LEN_D), N]
+
+    # T[d] = k[N[d]] * sum[m](C[d,m] * t[A[d],m])
+    T = numpy.einsum("dm,md->d", C, instance.model_runtime) * k_N
+    T_tot = float(T.max())
+    # E[d] = k[N[d]] * sum[m](C[d,m] * p[A[d],m] * t[A[d],m])
+    E = numpy.einsum("dm,md->d", C, instance.model_energy) * k_N
+    E_comp = float(E.sum())
+    # E_idle[d] = p[A[d],"Idle"] * (T_tot - T[d])
+    E_idle = instance.power_idle * (T_tot - T)
+    E_idle_tot = float(E_idle.sum())
+    log("[evaluate_counts] N: %s T: %s E: %s E_idle: %s", N, T, E, E_idle)
+
+    # Return values
+    return Evaluation(
+            T_d=T,
+            E_d=E,
+            E_idle_d=E_idle,
+            T_tot=T_tot,
+            E_compute=E_comp,
+            E_idle=E_idle_tot,
+            E_tot=E_comp + E_idle_tot,
+        )
+
+# Batched version of evaluate_counts
+# Inputs:
+#   C[s,d,m] : stack of NUM_S count matrices {NUM_S x LEN_D x LEN_M}
+# Outputs:
+#   T_tot[s], E_comp[s], E_idle_tot[s] : arrays of length NUM_S
+# NOTE: counts are not checked against the workload
+def evaluate_counts_batch(
+            instance: problem_instance.ProblemInstance,
+            C,              # Count matrices {NUM_S x LEN_D x LEN_M}
+        ):
+
+    C = numpy.asarray(C)
+    k_N = instance.k[numpy.arange(instance.LEN_D), C.sum(axis=2)]
+    T = numpy.einsum("sdm,md->sd", C, instance.model_runtime) * k_N
+    E = numpy.einsum("sdm,md->sd", C, instance.model_energy) * k_N
+
+    # Totals
+    T_tot = T.max(axis=1)
+    E_comp = E.sum(axis=1)
+    E_idle_tot = ((T_tot[:,None] - T) * instance.power_idle).sum(axis=1)
+
+    # Return values
+    return T_tot, E_comp, E_idle_tot
+
+################
+# Lower bounds #
+################
+# Admissible bounds on the optimum over all schedules, in the per-npu semantics, with:
+#   kglob[d] = min(k[d, 1 : LEN_W+1])
+#   T_tot   >= max[j](min[d](kglob[d] * t[j,d]))
+#               (longest single thread)
+#   T_tot   >= sum[j](min[d](t[j,d])) / sum[d](1 / kglob[d])
+#               (total work over aggregate speed)
+#   E_comp  >= sum[j](min[d](kglob[d] * e[j,d]))
+#   E_idle  >= 0
+# In the baseline semantics, k is not applied to T[d], i.e. kglob[d] = 1 above, and E[d] only
+# counts the last thread on (d). The last thread (LEN_W-1) is always the last one on its NPU:
+#   E_comp  >= min[d](e[LEN_W-1,d] * k[d,LEN_W])
+def lower_bound(
+            instance: problem_instance.ProblemInstance,
+            opt_target: str,    # Optimization target
+        ) -> float:
+
+    # No threads, nothing to run
+    if instance.LEN_W == 0:
+        return 0.
+
+    # Per-NPU factors, by semantics
+    if instance.semantics == "baseline":
+        k_glob = numpy.ones(instance.LEN_D)
+        E_comp = float((instance.energy[-1] * instance.k[:, instance.LEN_W]).min())
+    else:
+        k_glob = instance.k[:, 1 : instance.LEN_W+1].min(axis=1)
+        E_comp = float((instance.energy * k_glob).min(axis=1).sum())
+
+    # Bound by target
+    T_tot = float((instance.runtime * k_glob).min(axis=1).max())
+    if (k_glob > 0).all():
+        T_tot = max(T_tot, float(instance.runtime.min(axis=1).sum() / (1. / k_glob).sum()))
+    return objective_by(
+            opt_target=opt_target,
+            T_tot=T_tot,
+            E_comp=E_comp,
+            E_idle=0.,
+        )
+
+############################
+# Dataframe-based wrappers #
+############################
+# NOTE: these build a ProblemInstance on each call, prefer the instance-based API above in loops
+
+# Evaluate all objectives in a single pass over the schedule
+def evaluate_schedule(
+            hw_config_df,   # D array
+            workload_df,    # W array
+            S,              # Schedule: assignment array, or allocation matrix
+            runtime_df,     # t(a,m)
+            avg_power_df,   # p(a,m)
+        ) -> Evaluation:
+    return evaluate(
+            problem_instance.ProblemInstance(hw_config_df, workload_df, runtime_df, avg_power_df),
+            S,
+        )
+
+# Evaluate a schedule, return only the requested totals (others default to 0.)
+def compute_energy_model(
+            hw_config_df,   # D array
+            workload_df,    # W array
+            S,              # Schedule: assignment array, or allocation matrix
+            runtime_df,     # t(a,m)
+            avg_power_df,   # p(a,m)
+            compute_Ttot: bool,
+            compute_Ecompute: bool,
+            compute_E_idle: bool,
+            cache = None,   # Optional evaluation_cache.EvaluationCache
+        ):
+
+    # Assert T_idle can be computed
+    if compute_E_idle:
         assert( compute_Ttot == True )
 
-        # Calculate idle energy
-        E_idle = [0. for _ in range(LEN_D)]
-
-        # For each NPU
-        for d in D:
-            # Idle power
-            power_idle_ps = p.loc[
-                    (p["ARCH"] == A[d])
-                    &
-                    (p["Model"] == "Idle")
-                ]["Power PS (mW)"].values[0]
-            power_idle_pl = p.loc[
-                    (p["ARCH"] == A[d])
-                    &
-                    (p["Model"] == "Idle")
-                ]["Power PL (mW)"].values[0]
-            # Calculate
-            E_idle[d] = (power_idle_ps + power_idle_pl) * T_idle[d]
-        # Print
-        utils.print_log("E_idle: " +  str(E_idle))
-
-        # Wasted energy
-        E_idle_tot = sum(E_idle)
-        utils.print_log("E_idle_tot:" + str(E_idle_tot))
-
-        # if compute_E_idle:
-        #     # Percentage
-        #     energy_waste =  E_idle_tot / (E_comp + E_idle_tot)
-        #     utils.print_log("Wasted energy: " + "{:2.2}".format(energy_waste) + "%")
-
-    # Save to file
-    # TBD
+    # Evaluate all objectives at once
+    instance = problem_instance.ProblemInstance(hw_config_df, workload_df, runtime_df, avg_power_df)
+    if cache is not None:
+        T_tot, E_comp, E_idle_tot = cache.evaluate(instance, S)
+    else:
+        evaluation = evaluate(instance, S)
+        T_tot, E_comp, E_idle_tot = evaluation.T_tot, evaluation.E_compute, evaluation.E_idle
 
     # Return values
+    T_tot      = T_tot      if compute_Ttot     else 0.
+    E_comp     = E_comp     if compute_Ecompute else 0.
+    E_idle_tot = E_idle_tot if compute_E_idle   else 0.
     return T_tot, E_comp, E_idle_tot
 
+# Batched version of compute_energy_model
+def compute_energy_model_batch(
+            hw_config_df,   # D array
+            workload_df,    # W array
+            X,              # Assignment arrays {NUM_S x LEN_W}
+            runtime_df,     # t(a,m)
+            avg_power_df,   # p(a,m)
+            cache = None,   # Optional evaluation_cache.EvaluationCache
+        ):
+    instance = problem_instance.ProblemInstance(hw_config_df, workload_df, runtime_df, avg_power_df)
+    if cache is not None:
+        return cache.evaluate_batch(instance, X)
+    return evaluate_batch(instance, X)
@@ -0,0 +1,223 @@
+# Description:
+#   Bounded, LRU memoization of schedule evaluations.
+#   The energy model only depends on which models land on which ARCH, and on how many
+#   threads share each NPU. Hence, schedules that only permute threads of the same model,
+#   or swap the loads of NPUs with the same ARCH, evaluate to the same totals.
+#   These are collapsed on a canonical key, and evaluated once.
+#   In the "baseline" semantics, evaluations also depend on thread order, hence schedules
+#   are only collapsed when identical.
+
+# Import
+import collections
+import numpy
+# Import custom
+from energy_sim import utils
+from energy_sim import energy_model
+from energy_sim import schedule
+from energy_sim import problem_instance
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Default number of cached evaluations
+DEFAULT_MAXSIZE = 1 << 16
+# Largest packed NPU load, exactly representable in double precision
+MAX_PACKED_LOAD = 2.**53
+
+# Canonical key:
+#   (tables, interference, semantics, archs, models, LEN_W, counts, loads)
+#   tables    : source lookup tables (evaluations are only comparable within the same tables)
+#   interference : interference model
+#   semantics : energy-model semantics of the instance
+#   archs     : ((arch_id, number of NPUs), ...), sorted by arch_id
+#   models    : model IDs present in the workload, sorted
+#   LEN_W     : workload size, i.e. the radix of loads
+#   counts    : threads per model in the workload, in the order of models
+#               (loads only record placements, not which threads are left elsewhere)
+#   loads     : per-NPU model counts, packed in a single integer per NPU,
+#               sorted within each ARCH group, with groups in the order of archs
+#               (in the baseline semantics, the assignment array itself)
+# NOTE: an NPU load is packed in mixed radix (LEN_W+1), one digit per model in models.
+#       Should this not fit in a double-precision mantissa, loads fall back to
+#       per-NPU model counts, LEN_M integers per NPU.
+#       Either way, loads are one integer row per schedule, hashed as raw bytes.
+class EvaluationCache:
+    __slots__ = (
+            "maxsize",
+            "entries",
+            "hits",
+            "misses",
+        )
+
+    def __init__ (
+                self,
+                maxsize: int = DEFAULT_MAXSIZE, # Maximum number of cached evaluations
+            ):
+        assert(maxsize > 0)
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Canonical key rows of a stack of schedules {NUM_S x LEN_W}
+    # Returns the key prefix shared by the whole stack, and one integer row per schedule
+    def rows (
+                self,
+                instance: problem_instance.ProblemInstance,
+                X,      # Assignment arrays {NUM_S x LEN_W}
+            ):
+
+        # Pre-compute lengths
+        X = numpy.asarray(X, dtype=numpy.intp)
+        NUM_S, LEN_W = X.shape
+        LEN_D = instance.LEN_D
+
+        # Group NPUs by ARCH
+        archs, arch_of_npu = numpy.unique(instance.arch_ids, return_inverse=True)
+        npu_order = numpy.argsort(arch_of_npu, kind="stable")
+        group_sizes = numpy.bincount(arch_of_npu).tolist()
+        group_bounds = numpy.cumsum([0] + group_sizes).tolist()
+
+        # Models present in this workload
+        models = instance.models
+        LEN_M = len(models)
+        model_of_thread = instance.model_of_thread
+        prefix = (
+                instance.tables,
+                instance.interference,
+                instance.semantics,
+                tuple(zip(archs.tolist(), group_sizes)),
+                tuple(models.tolist()),
+                LEN_W,
+                tuple(instance.model_counts.tolist()),
+            )
+
+        # Baseline semantics: raw assignment arrays
+        if instance.semantics == "baseline":
+            return prefix, X.astype(numpy.int64)
+
+        # Pack per-NPU model counts {NUM_S x LEN_D}
+        radix = LEN_W + 1
+        bins = (numpy.arange(NUM_S)[:,None] * LEN_D + X).ravel()
+        if float(radix) ** LEN_M <= MAX_PACKED_LOAD:
+            digits = (float(radix) ** model_of_thread)[numpy.newaxis,:].repeat(NUM_S, axis=0)
+            loads = numpy.bincount(bins, weights=digits.ravel(), minlength=NUM_S * LEN_D)
+            loads = loads.astype(numpy.int64).reshape(NUM_S, LEN_D)[:,npu_order]
+            # Sort within ARCH groups
+            for low, high in zip(group_bounds[:-1], group_bounds[1:]):
+                if high - low > 1:
+                    loads[:,low:high].sort(axis=1)
+            return prefix, loads
+
+        # Fallback: per-NPU model counts {NUM_S x LEN_D x LEN_M},
+        # with NPUs sorted lexicographically within ARCH groups
+        cells = bins * LEN_M + numpy.tile(model_of_thread, NUM_S)
+        counts = numpy.bincount(cells, minlength=NUM_S * LEN_D * LEN_M)
+        counts = counts.astype(numpy.int64).reshape(NUM_S, LEN_D, LEN_M)[:,npu_order,:]
+        for low, high in zip(group_bounds[:-1], group_bounds[1:]):
+            if high - low > 1:
+                group = counts[:,low:high,:].reshape(-1, LEN_M)
+                sample = numpy.repeat(numpy.arange(NUM_S), high - low)
+                order = numpy.lexsort(tuple(group[:,m] for m in reversed(range(LEN_M))) + (sample,))
+                counts[:,low:high,:] = group[order].reshape(NUM_S, high - low, LEN_M)
+        return prefix, counts.reshape(NUM_S, LEN_D * LEN_M)
+
+    # Canonical keys of a stack of schedules {NUM_S x LEN_W}
+    def keys (
+                self,
+                instance: problem_instance.ProblemInstance,
+                X,      # Assignment arrays {NUM_S x LEN_W}
+            ) -> list:
+        prefix, rows = self.rows(instance, X)
+        return [prefix + (row,) for row in map(bytes, rows)]
+
+    # Cached version of energy_model.evaluate_batch
+    # NOTE: duplicates within the same batch are collapsed in numpy before any lookup,
+    #       are evaluated once, and count as hits.
+    #       Dictionary operations hence scale with distinct keys, not with NUM_S.
+    def evaluate_batch (
+                self,
+                instance: problem_instance.ProblemInstance,
+                X,      # Assignment arrays {NUM_S x LEN_W}
+            ):
+
+        X = numpy.asarray(X)
+        NUM_S = len(X)
+
+        # Distinct keys of the batch
+        prefix, rows = self.rows(instance, X)
+        rows = numpy.ascontiguousarray(rows)
+        packed = rows.view(numpy.dtype((numpy.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+        packed, first, inverse = numpy.unique(packed, return_index=True, return_inverse=True)
+        NUM_K = len(packed)
+        T_key  = numpy.empty(NUM_K)
+        E_comp_key = numpy.empty(NUM_K)
+        E_idle_key = numpy.empty(NUM_K)
+
+        # Lookup
+        entries = self.entries
+        keys = [prefix + (row,) for row in map(bytes, packed)]
+        pending = []
+        for k, key in enumerate(keys):
+            totals = entries.get(key)
+            if totals is not None:
+                entries.move_to_end(key)
+                T_key[k], E_comp_key[k], E_idle_key[k] = totals
+            else:
+                pending.append(k)
+
+        # Evaluate one representative per missing key, in a single batch
+        if len(pending) != 0:
+            pending = numpy.array(pending)
+            T_key[pending], E_comp_key[pending], E_idle_key[pending] = energy_model.evaluate_batch(
+                    instance,
+                    X[first[pending]],
+                )
+            for k, totals in zip(
+                        pending.tolist(),
+                        zip(T_key[pending].tolist(), E_comp_key[pending].tolist(), E_idle_key[pending].tolist()),
+                    ):
+                entries[keys[k]] = totals
+            # Evict least recently used
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+        # Update counters
+        self.misses += len(pending)
+        self.hits += NUM_S - len(pending)
+        log("[evaluate_batch] NUM_S: %s, misses: %s, %s", NUM_S, len(pending), self)
+
+        # Return values
+        inverse = inverse.ravel()
+        return T_key[inverse], E_comp_key[inverse], E_idle_key[inverse]
+
+    # Cached totals of a single schedule
+    def evaluate (
+                self,
+                instance: problem_instance.ProblemInstance,
+                S,      # Schedule: assignment array, or allocation matrix
+            ):
+        X = schedule.as_schedule(S)
+        T_tot, E_comp, E_idle = self.evaluate_batch(instance, X[numpy.newaxis,:])
+        return float(T_tot[0]), float(E_comp[0]), float(E_idle[0])
+
+    ############
+    # Counters #
+    ############
+    # Fraction of evaluations served from the cache
+    @property
+    def hit_ratio ( self ) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups != 0 else 0.
+
+    # Drop all entries and reset counters
+    def clear ( self ):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__ ( self ):
+        return len(self.entries)
+
+    def __repr__ ( self ):
+        return f"EvaluationCache(size={len(self.entries)}/{self.maxsize}, hits={self.hits}, misses={self.misses}, hit_ratio={self.hit_ratio:.3f})"
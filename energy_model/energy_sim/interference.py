@@ -0,0 +1,127 @@
+# Description:
+#   Pluggable multi-threading interference models.
+#   An interference model provides the runtime adjustment factor k[n] of an NPU running
+#   n threads, possibly depending on its ARCH:
+#       T[d] = sum[W[d]](t[A[d],:]) * k[A[d],N[d]]
+#   Factors are tabulated once per problem instance, for every NPU and for any number of
+#   threads up to the workload size, hence lookups are O(1) and there is no fixed cap.
+
+# Import
+import abc
+import numpy
+# Import custom
+from energy_sim import utils
+
+# Interface
+class InterferenceModel(abc.ABC):
+    __slots__ = ()
+
+    # Factors k[n], for n in [0, max_threads], for an NPU of ARCH (arch)
+    # NOTE: k[0] = 0. (no thread) and k[1] = 1. (single thread)
+    @abc.abstractmethod
+    def table (
+                self,
+                arch,               # ARCH value
+                max_threads: int,   # Maximum number of threads on the NPU
+            ) -> numpy.ndarray:
+        pass
+
+    # Per-NPU factors k[d,n] {LEN_D x (max_threads+1)}
+    def compile (
+                self,
+                A,                  # ARCH values, one per NPU
+                max_threads: int,   # Maximum number of threads on any NPU
+            ) -> numpy.ndarray:
+        k = numpy.empty((len(A), max_threads + 1))
+        # Tabulate once per distinct ARCH
+        tables = {}
+        for d, arch in enumerate(A):
+            if arch not in tables:
+                tables[arch] = self.table(arch, max_threads)
+            k[d] = tables[arch]
+        return k
+
+# Linear regression of the normalized multi-threaded runtime:
+#   runtime(n) = b0 + b1 * n
+#   k[n] = runtime(n) / n
+# NOTE: as in the original k table, the regression is evaluated at (n+1) for the n-th entry
+class LinearRegression(InterferenceModel):
+    __slots__ = (
+            "b0",
+            "b1",
+        )
+
+    def __init__ (
+                self,
+                b0: float,  # Intercept
+                b1: float,  # Num threads
+            ):
+        self.b0 = b0
+        self.b1 = b1
+
+    def table ( self, arch, max_threads: int ) -> numpy.ndarray:
+        # At least k[0] and k[1], even for an empty workload
+        n = numpy.arange(1, max(max_threads + 1, 2) + 1, dtype=float)
+        k = (self.b0 + self.b1 * n) / n
+        k[:2] = [0., 1.]
+        return k[:max_threads + 1]
+
+    # Least-squares fit on measured (number of threads, normalized runtime) pairs
+    @classmethod
+    def fit (
+                cls,
+                num_threads,        # Number of threads of each measure
+                runtime,            # Multi-threaded runtime, normalized to single-thread
+            ) -> "LinearRegression":
+        b1, b0 = numpy.polyfit(numpy.asarray(num_threads, dtype=float), numpy.asarray(runtime, dtype=float), 1)
+        return cls(b0=float(b0), b1=float(b1))
+
+    def __repr__ ( self ):
+        return f"LinearRegression(b0={self.b0}, b1={self.b1})"
+
+# Tabulated factors k[n], held constant past the last entry
+class Tabulated(InterferenceModel):
+    __slots__ = (
+            "k",
+        )
+
+    def __init__ (
+                self,
+                k,          # Factors k[0], k[1], ..., k[n]
+            ):
+        assert(len(k) >= 2)
+        self.k = tuple(float(value) for value in k)
+
+    def table ( self, arch, max_threads: int ) -> numpy.ndarray:
+        k = numpy.full(max_threads + 1, self.k[-1])
+        length = min(len(self.k), max_threads + 1)
+        k[:length] = self.k[:length]
+        k[0] = 0.
+        return k
+
+    def __repr__ ( self ):
+        return f"Tabulated(len={len(self.k)})"
+
+# Per-ARCH models, with a fallback for ARCH values not listed
+class PerArch(InterferenceModel):
+    __slots__ = (
+            "models",
+            "default",
+        )
+
+    def __init__ (
+                self,
+                models: dict,                   # ARCH -> InterferenceModel
+                default: InterferenceModel,     # Any other ARCH
+            ):
+        self.models = dict(models)
+        self.default = default
+
+    def table ( self, arch, max_threads: int ) -> numpy.ndarray:
+        return self.models.get(arch, self.default).table(arch, max_threads)
+
+    def __repr__ ( self ):
+        return f"PerArch({self.models}, default={self.default})"
+
+# Default model, from the linear regression in utils
+DEFAULT = LinearRegression(b0=utils.b0, b1=utils.b1)
@@ -0,0 +1,99 @@
+# Description:
+#   Dense ARCH x Model lookup tables, compiled once from the measurement dataframes.
+#   Replaces per-call boolean-mask scans of runtime_df and avg_power_df with
+#   integer-indexed array accesses.
+
+# Import
+import numpy
+# Tables:
+#   arch_index[a]   : integer ID of ARCH value (a)
+#   model_index[m]  : integer ID of DNN model (m)
+#   runtime[a,m]    : single-thread runtime t[a,m] (s)
+#   power_ps[a,m]   : single-thread PS power draw (mW)
+#   power_pl[a,m]   : single-thread PL power draw (mW)
+#   energy[a,m]     : single-thread energy (p_ps[a,m] + p_pl[a,m]) * t[a,m] (mJ)
+#   power_idle[a]   : idle power draw p_ps[a,"Idle"] + p_pl[a,"Idle"] (mW)
+# NOTE: missing (ARCH, Model) measurements are stored as NaN
+class LookupTables:
+    __slots__ = (
+            "arch_index",
+            "model_index",
+            "runtime",
+            "power_ps",
+            "power_pl",
+            "energy",
+            "power_idle",
+        )
+
+    def __init__ (
+                self,
+                runtime_df,     # t(a,m)
+                avg_power_df,   # p(a,m)
+            ):
+
+        # Intern ARCH and model values
+        archs = sorted(set(runtime_df["ARCH"].tolist()) | set(avg_power_df["ARCH"].tolist()))
+        models = sorted(set(runtime_df["Model"].tolist()) | set(avg_power_df["Model"].tolist()))
+        models.remove("Idle")
+        self.arch_index = {arch: a for a, arch in enumerate(archs)}
+        self.model_index = {model: m for m, model in enumerate(models)}
+
+        # Pre-allocate tables
+        LEN_A = len(archs)
+        LEN_M = len(models)
+        self.runtime    = numpy.full((LEN_A, LEN_M), numpy.nan)
+        self.power_ps   = numpy.full((LEN_A, LEN_M), numpy.nan)
+        self.power_pl   = numpy.full((LEN_A, LEN_M), numpy.nan)
+        self.power_idle = numpy.full(LEN_A, numpy.nan)
+
+        # Runtime
+        for arch, model, runtime in zip(
+                    runtime_df["ARCH"].tolist(),
+                    runtime_df["Model"].tolist(),
+                    runtime_df["Runtime (s)"].tolist(),
+                ):
+            self.runtime[self.arch_index[arch], self.model_index[model]] = runtime
+
+        # Power
+        for arch, model, power_ps, power_pl in zip(
+                    avg_power_df["ARCH"].tolist(),
+                    avg_power_df["Model"].tolist(),
+                    avg_power_df["Power PS (mW)"].tolist(),
+                    avg_power_df["Power PL (mW)"].tolist(),
+                ):
+            a = self.arch_index[arch]
+            if model == "Idle":
+                self.power_idle[a] = power_ps + power_pl
+            else:
+                m = self.model_index[model]
+                self.power_ps[a, m] = power_ps
+                self.power_pl[a, m] = power_pl
+
+        # Single-thread energy
+        self.energy = (self.power_ps + self.power_pl) * self.runtime
+
+    # Map an array of ARCH values to integer IDs
+    def arch_ids ( self, A ) -> numpy.ndarray:
+        return numpy.array([self.arch_index[arch] for arch in A.tolist()], dtype=numpy.intp)
+
+    # Map an array of DNN models to integer IDs
+    def model_ids ( self, M ) -> numpy.ndarray:
+        return numpy.array([self.model_index[model] for model in M.tolist()], dtype=numpy.intp)
+
+# Compiled tables, keyed by the identity of the source dataframes
+# NOTE: measurement dataframes are treated as read-only once compiled.
+#       References are kept to prevent id() reuse.
+_tables_cache = {}
+
+def get_lookup_tables (
+                runtime_df,     # t(a,m)
+                avg_power_df,   # p(a,m)
+            ) -> LookupTables:
+
+    key = (id(runtime_df), id(avg_power_df))
+    entry = _tables_cache.get(key)
+    # Compile on first use
+    if entry is None:
+        entry = (runtime_df, avg_power_df, LookupTables(runtime_df, avg_power_df))
+        _tables_cache[key] = entry
+    return entry[2]
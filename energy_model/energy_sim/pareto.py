@@ -0,0 +1,128 @@
+# Description:
+#   Non-dominated archive over the objective vectors (T_tot, E_compute, E_idle).
+#   A point dominates another if it is no worse on all three objectives, up to round-off:
+#   the same per-NPU loads summed in different orders must compare equal.
+#   Since E_tot = E_compute + E_idle is monotone in both, the optimum of every target in
+#   energy_model.OPT_TARGETS lies on the frontier, hence one archive serves all targets.
+
+import numpy
+# Import custom
+from energy_sim import utils
+from energy_sim import energy_model
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Objective vector columns
+OBJECTIVES = [
+        "T_tot",
+        "E_compute",
+        "E_idle",
+    ]
+
+# Relative tolerance of comparisons, well above the round-off of evaluations
+DOMINANCE_RTOL = 1e-9
+
+# Whether each of points {NUM_S x 3} is weakly dominated by point {3}, up to DOMINANCE_RTOL
+def dominated_by ( points, point ) -> numpy.ndarray:
+    return (points >= point - DOMINANCE_RTOL * numpy.abs(point)).all(axis=1)
+
+# Non-dominated subset of a batch of points {NUM_S x 3}, as sorted indices
+# The lexicographic minimum of the points left is non-dominated, and removes all points it dominates,
+# hence the cost is O(NUM_S) per frontier point.
+# NOTE: duplicates keep the first occurrence
+def non_dominated ( points ) -> numpy.ndarray:
+    order = numpy.lexsort(points.T[::-1])
+    points = points[order]
+    kept = []
+    alive = numpy.ones(len(points), dtype=bool)
+    first = 0
+    while True:
+        # Lexicographic minimum of the points left
+        alive_indices = numpy.flatnonzero(alive[first:])
+        if len(alive_indices) == 0:
+            break
+        first += int(alive_indices[0])
+        kept.append(first)
+        # Remove it, and all points it weakly dominates
+        alive[first:] &= ~dominated_by(points[first:], points[first])
+    return numpy.sort(order[kept])
+
+class ParetoArchive:
+    __slots__ = (
+            "points",
+            "payloads",
+            "num_updates",
+            "num_dominated",
+        )
+
+    def __init__ ( self ):
+        # Objective vectors {K x 3}, and the payload (e.g. schedule) of each
+        self.points = numpy.empty((0, len(OBJECTIVES)))
+        self.payloads = None
+        # Counters
+        self.num_updates = 0
+        self.num_dominated = 0
+
+    # Insert a batch of points, with a payload array aligned on the first axis
+    # Returns the number of points inserted
+    def update (
+                self,
+                points,         # Objective vectors {NUM_S x 3}
+                payloads,       # Payloads {NUM_S x ...}
+            ) -> int:
+
+        points = numpy.asarray(points, dtype=float)
+        payloads = numpy.asarray(payloads)
+        self.num_updates += len(points)
+
+        # Filter out candidates weakly dominated by the archive, one archive point at a time
+        alive = numpy.ones(len(points), dtype=bool)
+        for point in self.points:
+            alive &= ~dominated_by(points, point)
+        # Non-dominated survivors
+        survivors = numpy.flatnonzero(alive)
+        survivors = survivors[non_dominated(points[survivors])]
+        self.num_dominated += len(points) - len(survivors)
+        if len(survivors) == 0:
+            return 0
+        new_points = points[survivors]
+
+        # Drop archive points dominated by the survivors, which are not equal to any of them
+        keep = numpy.ones(len(self.points), dtype=bool)
+        for point in new_points:
+            keep &= ~dominated_by(self.points, point)
+
+        # Merge
+        self.points = numpy.concatenate([self.points[keep], new_points])
+        if self.payloads is None:
+            self.payloads = payloads[survivors]
+        else:
+            self.payloads = numpy.concatenate([self.payloads[keep], payloads[survivors]])
+        log("[update] inserted: %s, dropped: %s, size: %s", len(survivors), int((~keep).sum()), len(self.points))
+        return len(survivors)
+
+    # Index of the best point by target, ties resolve to the earliest inserted
+    def argmin_by ( self, opt_target: str ) -> int:
+        assert(len(self.points) > 0)
+        objective = energy_model.objective_by(
+                opt_target=opt_target,
+                T_tot=self.points[:,0],
+                E_comp=self.points[:,1],
+                E_idle=self.points[:,2],
+            )
+        return int(numpy.argmin(objective))
+
+    # Sort by T_tot, then E_compute, then E_idle, e.g. for reporting
+    def sort ( self ):
+        if len(self.points) > 0:
+            order = numpy.lexsort(self.points.T[::-1])
+            self.points = self.points[order]
+            self.payloads = self.payloads[order]
+
+    def __len__ ( self ) -> int:
+        return len(self.points)
+
+    def __repr__ ( self ) -> str:
+        return "ParetoArchive(size={}, updates={}, dominated={})".format(
+                len(self.points), self.num_updates, self.num_dominated)
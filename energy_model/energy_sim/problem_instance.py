@@ -0,0 +1,176 @@
+# Description:
+#   Immutable, pre-compiled problem instance: one multi-NPU array and one workload.
+#   Built once per experiment cell from the input dataframes, then shared by the
+#   dispatcher, all schedulers and the evaluator, so that no pandas work happens
+#   in their inner loops.
+
+# Import
+import numpy
+# Import custom
+from energy_sim import lookup_tables
+from energy_sim import interference as interference_models
+
+# Energy-model semantics, see energy_model.evaluate
+#   baseline : as the original compute_energy_model loops, for output equivalence with earlier runs
+#   per-npu  : k[d,N[d]] applied to the per-NPU sums, as documented in energy_model
+SEMANTICS = [
+        "baseline",
+        "per-npu",
+    ]
+DEFAULT_SEMANTICS = "baseline"
+
+# Attributes:
+#   LEN_D          : number of NPUs
+#   LEN_W          : number of threads
+#   A[d]           : ARCH value of NPU (d)
+#   M[thread]      : DNN model of thread
+#   arch_ids[d]    : interned ARCH ID of NPU (d)
+#   model_ids[thread] : interned model ID of thread
+#   runtime[thread,d] : single-thread runtime t[A[d],M[thread]] (s)
+#   power[thread,d]   : single-thread power draw p_ps + p_pl [A[d],M[thread]] (mW)
+#   energy[thread,d]  : single-thread energy p[A[d],M[thread]] * t[A[d],M[thread]] (mJ)
+#   power_idle[d]  : idle power draw of NPU (d) (mW)
+#   k[d,n]         : multi-threading runtime adjustment factor of NPU (d) running (n) threads,
+#                    for n in [0, LEN_W]
+#   interference   : interference model k is tabulated from
+#   semantics      : energy-model semantics, in SEMANTICS
+#   tables         : dense ARCH x Model lookup tables
+# Per-model view, for count-based evaluation:
+#   models[m]      : distinct model IDs in the workload, sorted
+#   model_of_thread[thread] : index (m) in models of the thread's model
+#   model_counts[m]   : number of threads of model (m) in the workload
+#   model_runtime[m,d] : single-thread runtime of model (m) on NPU (d) (s)
+#   model_energy[m,d]  : single-thread energy of model (m) on NPU (d) (mJ)
+# NOTE: all arrays are read-only
+class ProblemInstance:
+    __slots__ = (
+            "LEN_D",
+            "LEN_W",
+            "A",
+            "M",
+            "arch_ids",
+            "model_ids",
+            "runtime",
+            "power",
+            "energy",
+            "power_idle",
+            "k",
+            "interference",
+            "semantics",
+            "tables",
+            "models",
+            "model_of_thread",
+            "model_counts",
+            "model_runtime",
+            "model_energy",
+        )
+
+    def __init__ (
+                self,
+                hw_config_df,   # D array
+                workload_df,    # W array
+                runtime_df,     # t(a,m)
+                avg_power_df,   # p(a,m)
+                interference: interference_models.InterferenceModel = interference_models.DEFAULT,
+                semantics: str = DEFAULT_SEMANTICS,
+            ):
+        assert(semantics in SEMANTICS)
+
+        # Dense lookup tables (compiled once)
+        tables = lookup_tables.get_lookup_tables(runtime_df, avg_power_df)
+        A = tuple(hw_config_df["ARCH"].tolist())
+        M = tuple(workload_df["Model"].tolist())
+        arch_ids = tables.arch_ids(hw_config_df["ARCH"].values)
+        model_ids = tables.model_ids(workload_df["Model"].values)
+
+        # Gather per-thread, per-NPU matrices {LEN_W x LEN_D}
+        runtime = tables.runtime[arch_ids[None,:], model_ids[:,None]]
+        power = (tables.power_ps + tables.power_pl)[arch_ids[None,:], model_ids[:,None]]
+        energy = tables.energy[arch_ids[None,:], model_ids[:,None]]
+
+        self._set(
+                A=A,
+                M=M,
+                arch_ids=arch_ids,
+                model_ids=model_ids,
+                runtime=runtime,
+                power=power,
+                energy=energy,
+                power_idle=tables.power_idle[arch_ids],
+                k=interference.compile(A, len(M)),
+                interference=interference,
+                semantics=semantics,
+                tables=tables,
+            )
+
+    # Initialize all slots, freezing arrays
+    def _set ( self, **attributes ):
+        # Derived lengths
+        attributes["LEN_D"] = len(attributes["A"])
+        attributes["LEN_W"] = len(attributes["M"])
+
+        # Derived per-model view
+        arch_ids = attributes["arch_ids"]
+        tables = attributes["tables"]
+        models, model_of_thread, model_counts = numpy.unique(
+                attributes["model_ids"],
+                return_inverse=True,
+                return_counts=True,
+            )
+        attributes["models"] = models
+        attributes["model_of_thread"] = model_of_thread
+        attributes["model_counts"] = model_counts
+        attributes["model_runtime"] = tables.runtime[arch_ids[None,:], models[:,None]]
+        attributes["model_energy"] = tables.energy[arch_ids[None,:], models[:,None]]
+
+        for name, value in attributes.items():
+            if isinstance(value, numpy.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    # Sub-instance with a selection or permutation of the threads
+    # E.g.: instance.take(shuffle), instance.take(slice(low, high))
+    def take ( self, threads ) -> "ProblemInstance":
+        if isinstance(threads, slice):
+            M = self.M[threads]
+        else:
+            threads = numpy.asarray(threads, dtype=numpy.intp)
+            M = tuple(self.M[thread] for thread in threads.tolist())
+        instance = object.__new__(ProblemInstance)
+        instance._set(
+                A=self.A,
+                M=M,
+                arch_ids=self.arch_ids,
+                model_ids=self.model_ids[threads],
+                runtime=self.runtime[threads],
+                power=self.power[threads],
+                energy=self.energy[threads],
+                power_idle=self.power_idle,
+                k=self.k,
+                interference=self.interference,
+                semantics=self.semantics,
+                tables=self.tables,
+            )
+        return instance
+
+    ################
+    # Immutability #
+    ################
+    def __setattr__ ( self, name, value ):
+        raise AttributeError("ProblemInstance is immutable")
+
+    def __delattr__ ( self, name ):
+        raise AttributeError("ProblemInstance is immutable")
+
+    # Pickling, e.g. for process pools
+    def __getstate__ ( self ):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__ ( self, state ):
+        for name, value in state.items():
+            if isinstance(value, numpy.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __repr__ ( self ):
+        return f"ProblemInstance(A={self.A}, M={self.M})"
@@ -0,0 +1,44 @@
+# Description:
+#   Compact schedule representation.
+#   A schedule is a length-|W| array of target NPU indices:
+#       X[thread] = d  <=>  S[thread][d] = 1
+#   Each thread has exactly one target by construction, hence legality reduces to range checks.
+
+# Import
+import numpy
+
+# Small-int NPU indices (up to 127 NPUs)
+SCHEDULE_DTYPE = numpy.int8
+# Marker for threads not allocated (yet)
+UNALLOCATED = -1
+
+# New schedule, with all threads unallocated
+def empty_schedule ( len_w: int ) -> numpy.ndarray:
+    return numpy.full(len_w, UNALLOCATED, dtype=SCHEDULE_DTYPE)
+
+# Convert a one-hot allocation matrix S {LEN_W x LEN_D} to an assignment array
+# NOTE: rows without allocation map to UNALLOCATED
+def from_matrix ( S ) -> numpy.ndarray:
+    S = numpy.asarray(S)
+    X = numpy.argmax(S, axis=1).astype(SCHEDULE_DTYPE)
+    X[S.sum(axis=1) == 0] = UNALLOCATED
+    return X
+
+# Convert an assignment array to a one-hot allocation matrix S {LEN_W x LEN_D}
+def to_matrix (
+            X,
+            len_d: int,
+        ) -> list[list[int]]:
+    return [[int(x == d) for d in range(len_d)] for x in X]
+
+# Accept either representation, as arrays or lists, return an assignment array
+def as_schedule ( S ) -> numpy.ndarray:
+    # Empty matrix
+    if len(S) == 0:
+        return empty_schedule(0)
+    X = numpy.asarray(S)
+    # Already compact
+    if X.ndim == 1:
+        return X if X is S else X.astype(SCHEDULE_DTYPE)
+    # Allocation matrix
+    return from_matrix(X)
@@ -0,0 +1,192 @@
+# Description:
+#   Mutable, incrementally-evaluated schedule.
+#   Keeps per-NPU accumulators, so that allocating, deallocating or moving
+#   a single thread updates T_tot, E_comp and E_idle with a constant-time delta,
+#   instead of re-evaluating the whole allocation matrix.
+
+# Import custom
+from energy_sim import energy_model
+from energy_sim import problem_instance
+
+# Accumulators:
+#   X[thread]  : target NPU of thread, -1 if unallocated
+#   N[d]       : number of threads allocated to DPU (d)
+#   t_sum[d]   : sum[W[d]](t[A[d],:])
+#   e_sum[d]   : sum[W[d]](p[A[d],:] * t[A[d],:])
+#   T[d]       : t_sum[d] * k[d,N[d]]
+#   E[d]       : e_sum[d] * k[d,N[d]]
+# Running totals:
+#   E_comp     : sum[D[:]](E[:])
+#   T_idle_w   : sum[D[:]](p[A[d],"Idle"] * T[:])
+#               => E_idle = T_tot * sum[D[:]](p[A[:],"Idle"]) - T_idle_w
+class ScheduleState:
+    __slots__ = (
+            "LEN_D",
+            "LEN_W",
+            "t",
+            "e",
+            "p_idle",
+            "p_idle_sum",
+            "k",
+            "X",
+            "N",
+            "t_sum",
+            "e_sum",
+            "T",
+            "E",
+            "E_comp",
+            "T_idle_w",
+        )
+
+    def __init__ (
+                self,
+                instance: problem_instance.ProblemInstance,
+            ):
+
+        # Pre-compute lengths
+        self.LEN_D = instance.LEN_D
+        self.LEN_W = instance.LEN_W
+
+        # Per-thread, per-NPU runtime and energy as nested lists, for fast scalar access
+        self.t = instance.runtime.tolist()
+        self.e = instance.energy.tolist()
+        self.p_idle = instance.power_idle.tolist()
+        self.p_idle_sum = sum(self.p_idle)
+        self.k = instance.k.tolist()
+
+        # Empty schedule
+        self._reset()
+
+    # Refresh T[d], E[d] and running totals after NPU (d) changed
+    def _update ( self, d: int ):
+        k_N = self.k[d][self.N[d]]
+        T_d = self.t_sum[d] * k_N
+        E_d = self.e_sum[d] * k_N
+        self.E_comp += E_d - self.E[d]
+        self.T_idle_w += self.p_idle[d] * (T_d - self.T[d])
+        self.T[d] = T_d
+        self.E[d] = E_d
+
+    # Allocate an unallocated thread on NPU (d)
+    def assign ( self, thread_index: int, d: int ):
+        assert(self.X[thread_index] == -1)
+        self.X[thread_index] = d
+        self.N[d] += 1
+        self.t_sum[d] += self.t[thread_index][d]
+        self.e_sum[d] += self.e[thread_index][d]
+        self._update(d)
+
+    # Deallocate a thread from its NPU
+    # NOTE: depth-first searches can pass the sums of the NPU saved before allocating the thread,
+    #       to restore them exactly
+    def unassign ( self, thread_index: int, t_sum_d: float = None, e_sum_d: float = None ):
+        d = self.X[thread_index]
+        assert(d != -1)
+        self.X[thread_index] = -1
+        self.N[d] -= 1
+        if t_sum_d is not None:
+            self.t_sum[d] = t_sum_d
+            self.e_sum[d] = e_sum_d
+        # Reset exactly when empty, to avoid accumulating round-off
+        elif self.N[d] == 0:
+            self.t_sum[d] = 0.
+            self.e_sum[d] = 0.
+        else:
+            self.t_sum[d] -= self.t[thread_index][d]
+            self.e_sum[d] -= self.e[thread_index][d]
+        self._update(d)
+
+    # Move an allocated thread to NPU (d)
+    def move ( self, thread_index: int, d: int ):
+        if self.X[thread_index] != d:
+            self.unassign(thread_index)
+            self.assign(thread_index, d)
+
+    # Recompute accumulators from scratch, e.g. to flush round-off after long searches
+    def refresh ( self ):
+        X = self.X
+        self._reset()
+        for thread_index in range(self.LEN_W):
+            if X[thread_index] != -1:
+                self.assign(thread_index, X[thread_index])
+
+    # Deallocate all threads
+    def _reset ( self ):
+        self.X = [-1 for _ in range(self.LEN_W)]
+        self.N = [0 for _ in range(self.LEN_D)]
+        self.t_sum = [0. for _ in range(self.LEN_D)]
+        self.e_sum = [0. for _ in range(self.LEN_D)]
+        self.T = [0. for _ in range(self.LEN_D)]
+        self.E = [0. for _ in range(self.LEN_D)]
+        self.E_comp = 0.
+        self.T_idle_w = 0.
+
+    # Totals with an unallocated thread tentatively allocated on each NPU, without allocating it
+    # Returns lists over NPUs (d) of T[d], E[d], T_tot, E_comp and E_idle after the allocation
+    def placements ( self, thread_index: int ):
+        assert(self.X[thread_index] == -1)
+        t = self.t[thread_index]
+        e = self.e[thread_index]
+        d_max, T_max, T_second = self.top_two()
+        T_new = []
+        E_new = []
+        T_tot = []
+        E_comp = []
+        E_idle = []
+        for d in range(self.LEN_D):
+            k_N = self.k[d][self.N[d] + 1]
+            T_d = (self.t_sum[d] + t[d]) * k_N
+            E_d = (self.e_sum[d] + e[d]) * k_N
+            # Largest T of the other NPUs
+            T_tot_d = max(T_d, T_second if d == d_max else T_max)
+            T_new.append(T_d)
+            E_new.append(E_d)
+            T_tot.append(T_tot_d)
+            E_comp.append(self.E_comp + E_d - self.E[d])
+            E_idle.append(T_tot_d * self.p_idle_sum - (self.T_idle_w + self.p_idle[d] * (T_d - self.T[d])))
+        return T_new, E_new, T_tot, E_comp, E_idle
+
+    ##############
+    # Objectives #
+    ##############
+    # Index of the largest T[d], the largest and second largest T[d], in O(LEN_D)
+    # NOTE: the second largest is 0 with a single NPU, i.e. an empty NPU
+    def top_two ( self ):
+        d_max = 0
+        T_max = T_second = 0.
+        for d, T_d in enumerate(self.T):
+            if T_d > T_max:
+                d_max, T_max, T_second = d, T_d, T_max
+            elif T_d > T_second:
+                T_second = T_d
+        return d_max, T_max, T_second
+
+    # T_tot = max[d](T[d])
+    # NOTE: O(LEN_D), with LEN_D small
+    @property
+    def T_tot ( self ) -> float:
+        return max(self.T)
+
+    # E_comp = sum[D[:]](E[:])
+    @property
+    def E_compute ( self ) -> float:
+        return self.E_comp
+
+    # E_idle = sum[D[:]](p[A[d],"Idle"] * (T_tot - T[d]))
+    @property
+    def E_idle ( self ) -> float:
+        return self.T_tot * self.p_idle_sum - self.T_idle_w
+
+    # E_tot = E_comp + E_idle
+    @property
+    def E_tot ( self ) -> float:
+        return self.E_comp + self.E_idle
+
+    # Current value of an optimization target
+    def objective ( self, opt_target: str ) -> float:
+        return energy_model.objective_by(
+                opt_target=opt_target,
+                T_tot=self.T_tot,
+                E_comp=self.E_comp,
+                E_idle=self.E_idle,
+            )
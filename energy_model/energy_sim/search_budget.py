@@ -0,0 +1,101 @@
+# Description:
+#   Anytime search budget, for exact schedulers.
+#   Bounds a search by wall-clock time and/or number of evaluated schedules.
+#   An interrupted search still commits its incumbent, and records a proven lower bound
+#   on the optimum, hence an optimality gap:
+#       gap = (incumbent - lower_bound) / |incumbent|
+#   A search run to completion has lower_bound == incumbent, i.e. gap = 0.
+
+import math
+import time
+# Import custom
+from energy_sim import utils
+
+# Tracing
+log = utils.get_log(__name__)
+
+class SearchBudget:
+    __slots__ = (
+            "time_limit_ns",
+            "max_evaluations",
+            "start_ns",
+            "evaluations",
+            "incumbent",
+            "lower_bound",
+        )
+
+    def __init__ (
+                self,
+                time_limit_s: float = None,     # Wall-clock budget, None for unlimited
+                max_evaluations: int = None,    # Evaluation budget, None for unlimited
+            ):
+        self.time_limit_ns = None if time_limit_s is None else int(time_limit_s * 1e9)
+        self.max_evaluations = max_evaluations
+        self.start()
+
+    # (Re-)start the clock and counters, schedulers call this on entry
+    def start ( self ):
+        self.start_ns = time.perf_counter_ns()
+        self.evaluations = 0
+        self.incumbent = None
+        self.lower_bound = None
+
+    # Wall-clock time since start
+    @property
+    def elapsed_ns ( self ) -> int:
+        return time.perf_counter_ns() - self.start_ns
+
+    # Evaluations left, None for unlimited
+    @property
+    def remaining_evaluations ( self ) -> int:
+        if self.max_evaluations is None:
+            return None
+        return max(self.max_evaluations - self.evaluations, 0)
+
+    # Whether any limit is set, else the budget only records the search
+    @property
+    def limited ( self ) -> bool:
+        return self.max_evaluations is not None or self.time_limit_ns is not None
+
+    # Whether the search must stop
+    @property
+    def exhausted ( self ) -> bool:
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return True
+        if self.time_limit_ns is not None and self.elapsed_ns >= self.time_limit_ns:
+            return True
+        return False
+
+    # Account for evaluated schedules, returns whether the search must stop
+    def charge ( self, num_evaluations: int ) -> bool:
+        self.evaluations += num_evaluations
+        return self.exhausted
+
+    # Mirror the clock and counters of the budget driving a search shared across targets
+    def follow ( self, other ):
+        self.start_ns = other.start_ns
+        self.evaluations = other.evaluations
+
+    # Record the outcome of a search
+    def close (
+                self,
+                incumbent: float,   # Objective of the committed schedule
+                lower_bound: float, # Proven lower bound on the optimum
+            ):
+        self.incumbent = incumbent
+        self.lower_bound = min(lower_bound, incumbent)
+        log("[close] evaluations: %s, elapsed_ns: %s, incumbent: %s, lower_bound: %s, gap: %s",
+                self.evaluations, self.elapsed_ns, self.incumbent, self.lower_bound, self.gap)
+
+    # Relative optimality gap, NaN if the scheduler did not close the budget
+    @property
+    def gap ( self ) -> float:
+        if self.lower_bound is None:
+            return math.nan
+        if self.incumbent == self.lower_bound:
+            return 0.
+        return (self.incumbent - self.lower_bound) / abs(self.incumbent)
+
+    def __repr__ ( self ) -> str:
+        return "SearchBudget(time_limit_ns={}, max_evaluations={}, evaluations={}, gap={})".format(
+                self.time_limit_ns, self.max_evaluations, self.evaluations, self.gap)
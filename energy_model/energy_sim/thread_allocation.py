@@ -2,120 +2,242 @@
 #   Wrapper script to redirect ot the selected scheduler
 
 # Import
-import sys
+import numpy
 from energy_sim.energy_model import utils
+from energy_sim import energy_model
+from energy_sim import schedule
+from energy_sim import problem_instance
+from energy_sim import pareto
 from schedulers import round_robin
 from schedulers import greedy
+from schedulers import greedy_lpt
+from schedulers import simulated_annealing
+from schedulers import genetic
 from schedulers import exhaustive
+from schedulers import branch_and_bound
+from schedulers import symmetric_exhaustive
+from schedulers import dynamic_programming
+from schedulers import pareto_frontier
 from schedulers import batched_exhaustive
 from schedulers import random
 from schedulers import arch_affine
 
+# Tracing
+log = utils.get_log(__name__)
+debug = utils.get_debug(__name__)
+
+# Optional scheduler settings, from the scheduler row (empty or missing cells for defaults)
+#   Seed   : seed of randomized searches
+#   Params : space-separated key=value pairs, e.g. "cooling=linear t_start=0.05"
+# Keys accepted by each scheduler
+SA_PARAMS = [
+        "time_limit_s",
+        "cooling",
+        "t_start",
+        "t_end",
+    ]
+GA_PARAMS = [
+        "weight",
+        "population_size",
+        "crossover_rate",
+        "mutation_rate",
+        "elitism",
+        "max_generations",
+        "time_limit_s",
+    ]
+
+# Whether a row cell is empty, i.e. missing or NaN
+def is_empty ( value ) -> bool:
+    return value is None or value != value
+
+# Seed of the scheduler row, None for fresh entropy
+def row_seed ( scheduler_row ):
+    seed = scheduler_row.get("Seed")
+    return None if is_empty(seed) else int(seed)
+
+# Parameters of the scheduler row, as keyword arguments
+# NOTE: values parse as int, else float, else string ("None" for None)
+def row_params (
+            scheduler_row,
+            allowed: list,  # Accepted keys
+        ) -> dict:
+    params = {}
+    cell = scheduler_row.get("Params")
+    if is_empty(cell):
+        return params
+    for pair in str(cell).split():
+        key, _, value = pair.partition("=")
+        if key not in allowed or value == "":
+            utils.print_error("Unsupported parameter " + pair + " for scheduler " + scheduler_row["Name"])
+            exit(1)
+        for parse in (int, float):
+            try:
+                value = parse(value)
+                break
+            except ValueError:
+                pass
+        params[key] = None if value == "None" else value
+    return params
+
+# Merge a frontier of reshuffled schedules into the caller's, undoing the reshuffle
+def unshuffle_frontier (
+            shuffled_frontier,  # pareto.ParetoArchive of reshuffled schedules, or None
+            shuffle,            # Reshuffle, as passed to ProblemInstance.take
+            frontier,           # Caller's pareto.ParetoArchive
+        ):
+    if shuffled_frontier is None or len(shuffled_frontier) == 0:
+        return
+    schedules = numpy.empty_like(shuffled_frontier.payloads)
+    schedules[:, shuffle] = shuffled_frontier.payloads
+    frontier.update(shuffled_frontier.points, schedules)
+
 # Wrapper function
 def thread_allocation (
             scheduler_row,
-            hw_config_df,
-            workload_df,
-            runtime_df,
-            avg_power_df,
+            instance: problem_instance.ProblemInstance,
             opt_target: str,
+            cache = None,   # Optional evaluation_cache.EvaluationCache, for exhaustive searches
+            num_workers: int = 1, # Number of worker processes, for exhaustive searches
+            budget = None,  # Optional search_budget.SearchBudget, for exact schedulers
+            refinement = None, # Optional local_search.LocalSearch, run on the schedule found
+            frontier = None, # Optional pareto.ParetoArchive, updated with the frontier of Pareto-Frontier
         ):
 
-    # Pre-allocate allocation matrix
-    # S in {|W| x |D|}
-    S = [[0 for _ in range(len(hw_config_df))] for _ in range(len(workload_df))]
+    # Pre-allocate assignment array
+    # S in {|W|}, S[thread] = d
+    S = schedule.empty_schedule(instance.LEN_W)
 
     # Reshuffle for randomness
     # NOTE: this is useless for "Exhaustive-search"
-    workload_df = workload_df.sample(frac=1).reset_index(drop=True)
-
-
-    # Select optimization taget
-    compute_Ttot=False
-    compute_Ecompute=False
-    compute_E_idle=False
-    if opt_target == "T_tot":
-            compute_Ttot=True
-    elif opt_target == "E_compute":
-            compute_Ecompute=True
-    elif opt_target ==  "E_idle":
-            compute_Ttot=True
-            compute_E_idle=True
-    elif opt_target ==  "E_tot":
-            # Also requires T_tot for T_idle
-            compute_Ttot=True
-            compute_Ecompute=True
-            compute_E_idle=True
-    else:
+    shuffle = numpy.random.permutation(instance.LEN_W)
+    instance = instance.take(shuffle)
+    # Frontier in the reshuffled thread order
+    shuffled_frontier = None if frontier is None else pareto.ParetoArchive()
+
+
+    # Check optimization target
+    if opt_target not in energy_model.OPT_TARGETS:
             utils.print_error("Unsupported optimization target " + opt_target)
             exit(1)
 
     # Launch selected scheduler
     if scheduler_row["Name"] == "Exhaustive":
             exhaustive.thread_allocation_E(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                cache=cache,
+                num_workers=num_workers,
+                budget=budget,
+            )
+    elif scheduler_row["Name"] == "Exhaustive-Symmetric":
+            symmetric_exhaustive.thread_allocation_SE(
+                instance=instance,
                 S=S,
-                runtime_df=runtime_df,
-                avg_power_df=avg_power_df,
-                compute_Ttot=compute_Ttot,
-                compute_Ecompute=compute_Ecompute,
-                compute_E_idle=compute_E_idle,
                 opt_target=opt_target,
+                budget=budget,
+            )
+    elif scheduler_row["Name"] == "Dynamic-Programming":
+            dynamic_programming.thread_allocation_DP(
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                budget=budget,
+            )
+    elif scheduler_row["Name"] == "Pareto-Frontier":
+            pareto_frontier.thread_allocation_P(
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                budget=budget,
+                frontier=shuffled_frontier,
+            )
+    elif scheduler_row["Name"] == "Branch-and-Bound":
+            branch_and_bound.thread_allocation_BB(
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                budget=budget,
             )
     elif scheduler_row["Name"] ==  "Batched":
             batched_exhaustive.thread_allocation_BE(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
+                batch_size=int(scheduler_row["Batch_Size"]),
+                S=S,
+                opt_target=opt_target,
+                cache=cache,
+                num_workers=num_workers,
+            )
+    elif scheduler_row["Name"] == "Batched-Carry":
+            batched_exhaustive.thread_allocation_BE(
+                instance=instance,
                 batch_size=int(scheduler_row["Batch_Size"]),
                 S=S,
-                runtime_df=runtime_df,
-                avg_power_df=avg_power_df,
-                compute_Ttot=compute_Ttot,
-                compute_Ecompute=compute_Ecompute,
-                compute_E_idle=compute_E_idle,
                 opt_target=opt_target,
+                num_workers=num_workers,
+                carry=True,
             )
     elif scheduler_row["Name"] ==  "Round-Robin":
             round_robin.thread_allocation_RR(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
                 S=S,
             )
     elif scheduler_row["Name"] ==  "Random":
             random.thread_allocation_R(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
                 S=S,
             )
     elif scheduler_row["Name"] == "Arch-Affine":
             arch_affine.thread_allocation_AA(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
                 S=S,
-                runtime_df=runtime_df,
-                avg_power_df=avg_power_df,
             )
     elif scheduler_row["Name"] == "Greedy":
             greedy.thread_allocation_G(
-                hw_config_df=hw_config_df,
-                workload_df=workload_df,
+                instance=instance,
                 S=S,
-                runtime_df=runtime_df,
-                avg_power_df=avg_power_df,
-                compute_Ttot=compute_Ttot,
-                compute_Ecompute=compute_Ecompute,
-                compute_E_idle=compute_E_idle,
                 opt_target=opt_target,
             )
+    elif scheduler_row["Name"] == "Simulated-Annealing":
+            simulated_annealing.thread_allocation_SA(
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                seed=row_seed(scheduler_row),
+                budget=budget,
+                **row_params(scheduler_row, SA_PARAMS),
+            )
+    elif scheduler_row["Name"] == "Genetic":
+            genetic.thread_allocation_GA(
+                instance=instance,
+                S=S,
+                opt_target=opt_target,
+                seed=row_seed(scheduler_row),
+                budget=budget,
+                **row_params(scheduler_row, GA_PARAMS),
+            )
+    elif scheduler_row["Name"] == "Greedy-LPT":
+            greedy_lpt.thread_allocation_LPT(
+                instance=instance,
+                S=S,
+            )
     else:
             utils.print_error("Unsupported scheduler " + scheduler_row["Name"])
             exit(1)
 
     # Debug
-    utils.print_debug("[thread_allocation] S:")
-    if utils.DEBUG_ON:
-        [print(*line) for line in S]
+    debug("[thread_allocation] S: %s", S)
+
+    # Post-optimization
+    if refinement is not None:
+            refinement.run(instance, S, opt_target)
+            debug("[thread_allocation] refined S: %s", S)
+
+    # Undo reshuffle, to index threads as in the caller's workload
+    S_unshuffled = schedule.empty_schedule(len(S))
+    S_unshuffled[shuffle] = S
+    unshuffle_frontier(shuffled_frontier, shuffle, frontier)
+    S = S_unshuffled
 
 
     # Save S and shuffle to file
@@ -137,6 +259,167 @@ def thread_allocation (
     # Return schedule
     return S
 
+# Searches whose enumeration does not depend on the optimization target,
+# scoring each candidate on all objectives at once, hence a single run serves all targets
+SHARED_SEARCHES = [
+        "Exhaustive",
+        "Exhaustive-Symmetric",
+        "Pareto-Frontier",
+        "Batched",
+    ]
+# Heuristics ignoring the optimization target
+TARGET_AGNOSTIC = [
+        "Round-Robin",
+        "Random",
+        "Arch-Affine",
+        "Greedy-LPT",
+    ]
+
+# Schedulers accounting their evaluations on a search_budget.SearchBudget
+BUDGETED = [
+        "Exhaustive",
+        "Exhaustive-Symmetric",
+        "Dynamic-Programming",
+        "Pareto-Frontier",
+        "Branch-and-Bound",
+        "Simulated-Annealing",
+        "Genetic",
+    ]
+# Target-agnostic heuristics run once for all targets, without a budget
+assert(not set(TARGET_AGNOSTIC) & set(BUDGETED))
+
+# Schedulers modeling the per-npu semantics only (see energy_model), they refuse other instances
+PER_NPU_ONLY = [
+        "Exhaustive-Symmetric",
+        "Dynamic-Programming",
+        "Pareto-Frontier",
+        "Branch-and-Bound",
+        "Batched-Carry",
+        "Greedy-LPT",
+        "Simulated-Annealing",
+    ]
+
+# Whether a scheduler supports an energy-model semantics
+def supports ( scheduler_name: str, semantics: str ) -> bool:
+    return semantics == "per-npu" or scheduler_name not in PER_NPU_ONLY
+
+# Whether a single run of this scheduler serves all optimization targets
+def is_shared ( scheduler_row ) -> bool:
+    return scheduler_row["Name"] in SHARED_SEARCHES + TARGET_AGNOSTIC
+
+# Wrapper function, running a shared scheduler once for several targets
+# Returns one assignment array per target
+def thread_allocation_multi (
+            scheduler_row,
+            instance: problem_instance.ProblemInstance,
+            opt_targets: list,
+            cache = None,   # Optional evaluation_cache.EvaluationCache, for exhaustive searches
+            num_workers: int = 1, # Number of worker processes, for exhaustive searches
+            budgets = None, # Optional search_budget.SearchBudget per target, for exact schedulers
+            refinements = None, # Optional local_search.LocalSearch per target, run on the schedules found
+            frontier = None, # Optional pareto.ParetoArchive, updated with the frontier of Pareto-Frontier
+        ):
+
+    # Single target, or schedulers depending on the target: one run per target
+    if len(opt_targets) == 1 or not is_shared(scheduler_row):
+        return [thread_allocation(
+                scheduler_row=scheduler_row,
+                instance=instance,
+                opt_target=opt_target,
+                cache=cache,
+                num_workers=num_workers,
+                budget=None if budgets is None else budgets[target_index],
+                refinement=None if refinements is None else refinements[target_index],
+                frontier=frontier,
+            ) for target_index, opt_target in enumerate(opt_targets)]
+
+    # Check optimization targets
+    for opt_target in opt_targets:
+        if opt_target not in energy_model.OPT_TARGETS:
+            utils.print_error("Unsupported optimization target " + opt_target)
+            exit(1)
+
+    # Target-agnostic heuristics, run once
+    if scheduler_row["Name"] in TARGET_AGNOSTIC:
+            S = thread_allocation(
+                scheduler_row=scheduler_row,
+                instance=instance,
+                opt_target=opt_targets[0],
+                budget=None if budgets is None else budgets[0],
+            )
+            S_list = [S.copy() for _ in opt_targets]
+            # The run serves all targets, mirror its counters
+            if budgets is not None:
+                for budget in budgets[1:]:
+                    budget.follow(budgets[0])
+            # Post-optimization, per target
+            if refinements is not None:
+                for S, opt_target, refinement in zip(S_list, opt_targets, refinements):
+                    refinement.run(instance, S, opt_target)
+            return S_list
+
+    # Pre-allocate assignment arrays
+    S_list = [schedule.empty_schedule(instance.LEN_W) for _ in opt_targets]
+
+    # Reshuffle for randomness, shared by all targets
+    shuffle = numpy.random.permutation(instance.LEN_W)
+    instance = instance.take(shuffle)
+    # Frontier in the reshuffled thread order
+    shuffled_frontier = None if frontier is None else pareto.ParetoArchive()
+
+    # Launch selected scheduler
+    if scheduler_row["Name"] == "Exhaustive":
+            exhaustive.thread_allocation_E_multi(
+                instance=instance,
+                S_list=S_list,
+                opt_targets=opt_targets,
+                cache=cache,
+                num_workers=num_workers,
+                budgets=budgets,
+            )
+    elif scheduler_row["Name"] == "Exhaustive-Symmetric":
+            symmetric_exhaustive.thread_allocation_SE_multi(
+                instance=instance,
+                S_list=S_list,
+                opt_targets=opt_targets,
+                budgets=budgets,
+            )
+    elif scheduler_row["Name"] == "Pareto-Frontier":
+            pareto_frontier.thread_allocation_P_multi(
+                instance=instance,
+                S_list=S_list,
+                opt_targets=opt_targets,
+                budgets=budgets,
+                frontier=shuffled_frontier,
+            )
+    elif scheduler_row["Name"] == "Batched":
+            batched_exhaustive.thread_allocation_BE_multi(
+                instance=instance,
+                S_list=S_list,
+                batch_size=int(scheduler_row["Batch_Size"]),
+                opt_targets=opt_targets,
+                cache=cache,
+                num_workers=num_workers,
+            )
+
+    # Debug
+    debug("[thread_allocation_multi] S_list: %s", S_list)
+
+    # Post-optimization, per target
+    if refinements is not None:
+            for S, opt_target, refinement in zip(S_list, opt_targets, refinements):
+                refinement.run(instance, S, opt_target)
+
+    # Undo reshuffle, to index threads as in the caller's workload
+    for target_index, S in enumerate(S_list):
+        S_unshuffled = schedule.empty_schedule(len(S))
+        S_unshuffled[shuffle] = S
+        S_list[target_index] = S_unshuffled
+    unshuffle_frontier(shuffled_frontier, shuffle, frontier)
+
+    # Return schedules
+    return S_list
+
 # Configurable minimization function
 def running_argmin_by (
             opt_target: str,       # Optimization target
@@ -152,13 +435,8 @@ def running_argmin_by (
         is_new_min = False
 
         # Print
-        utils.print_log(f"T_tot: {T_tot}" +
-                        f"E_compute: {E_comp}" +
-                        f"E_idle: {E_idle}" +
-                        f"E_tot: {(E_comp + E_idle)}" +
-                        f"running_min: {running_min}" +
-                        f"running_argmin: {running_argmin}"
-                    )
+        log("T_tot: %s E_compute: %s E_idle: %s E_tot: %s running_min: %s running_argmin: %s",
+                T_tot, E_comp, E_idle, (E_comp + E_idle), running_min, running_argmin)
 
         # Set condition
         # Minimize by runtime
@@ -190,7 +468,31 @@ def running_argmin_by (
             running_min = new_value
             running_argmin = argmin_index
             # Print
-            utils.print_log(f"[argmin] New {opt_target} minimum ({running_min}) at index {running_argmin}")
+            log("[argmin] New %s minimum (%s) at index %s", opt_target, running_min, running_argmin)
 
         # Return values
         return running_min, running_argmin
+
+# Vectorized counterpart of running_argmin_by, over a batch of evaluations
+# NOTE: ties resolve to the first index, as with running_argmin_by
+def argmin_by (
+            opt_target: str,    # Optimization target
+            T_tot,              # T_tot array
+            E_comp,             # E_comp array
+            E_idle,             # E_idle array
+        ):
+
+        # Select objective
+        objective = energy_model.objective_by(
+                opt_target=opt_target,
+                T_tot=T_tot,
+                E_comp=E_comp,
+                E_idle=E_idle,
+            )
+
+        # Minimize
+        argmin = int(numpy.argmin(objective))
+        log("[argmin_by] New %s minimum (%s) at index %s", opt_target, objective[argmin], argmin)
+
+        # Return values
+        return float(objective[argmin]), argmin
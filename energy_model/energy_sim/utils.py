@@ -1,9 +1,12 @@
 # Description:
 #   Common utilities
 
+import os
+import numpy
 import pandas
 
 # Based on linear regression model from TECS
+# NOTE: the energy model tabulates k per problem instance, see interference.DEFAULT
 # ISSUE: this model should only apply for a uniform workload,
 #       I.e., for very heterogeneous workloads ( e.g. DenseNet+MobileNet ) it results that
 #       allocating both DNNs on the same NPU saves time, because:
@@ -12,16 +15,6 @@ import pandas
 #       * hence: (t[DenseNet] + t[MobileNet]) * k[2] < t[DenseNet])
 b0 = 0.231800862 # Intercept
 b1 = 0.717562696 # Num threads
-MAX_THREADS = 128
-k = [1. for _ in range(MAX_THREADS)]
-for i in range(0,MAX_THREADS):
-    # Compute model (i+1 is the number of threads)
-    linreg_runtime = b0 + (b1 * (i+1))
-    # Compute reduction w.r.t. number of threads
-    k[i] = linreg_runtime / (i+1)
-k[0] = 0. # Adjust to exactly 0. for no thread
-k[1] = 1. # Adjust to exactly 1. for one thread
-# print("k:", k)
 
 def is_schedule_legal (
                         len_d,
@@ -29,6 +22,10 @@ def is_schedule_legal (
                         schedule,
                     ) -> bool:
 
+        # Assignment array: one target per thread by construction
+        if isinstance(schedule, numpy.ndarray) and schedule.ndim == 1:
+            return (len(schedule) == len_w) and bool(((schedule >= 0) & (schedule < len_d)).all())
+
         # For each row/thread
         for t in range(0,len_w):
             # Check allocation is legal
@@ -173,20 +170,110 @@ def is_multinpu_placeable(multiNPU_config_df):
 # Print utils #
 ###############
 
+# Global switches
+# NOTE: these set the default for all modules. Prefer switching tracing per module
+#       at runtime with set_log_on()/set_debug_on(), or from the environment, e.g.:
+#       ENERGY_SIM_LOG="schedulers.greedy,energy_sim.energy_model" energy_model/launch.py
+#       ENERGY_SIM_DEBUG="*" energy_model/launch.py
+#       ENERGY_SIM_DEBUG="*,-schedulers.greedy" energy_model/launch.py   (all but one)
+# Per-module settings take precedence over "*", which takes precedence over the global switch.
 LOG_ON = False
 # LOG_ON = True
-def print_log( message ):
-    if LOG_ON :
-        print("[LOG]:", message)
-
 DEBUG_ON = False
 # DEBUG_ON = True
-def print_debug( message ):
-    if DEBUG_ON :
-        print("[DEBUG]:", message)
+
+# Per-module tracer, reading its setting on each call (see is_log_on/is_debug_on),
+# hence following later changes to the switches and module settings.
+# Messages are formatted lazily with printf-style arguments, e.g.:
+#       log = utils.get_log(__name__)
+#       log("hw_config_df: %s", hw_config_df)
+# In hot loops, hoist the check:
+#       log_on = log.on
+#       if log_on: log(...)
+class Tracer:
+    __slots__ = (
+            "module",
+            "prefix",
+            "is_on",
+        )
+
+    def __init__ ( self, module: str, prefix: str, is_on ):
+        self.module = module
+        self.prefix = prefix
+        self.is_on = is_on
+
+    @property
+    def on ( self ) -> bool:
+        return self.is_on(self.module)
+
+    def __call__ ( self, message, *args ):
+        if self.is_on(self.module):
+            print(self.prefix, (message % args) if args else message)
+
+# Module settings {module: on}, from a comma-separated list ("*" for all, "-module" to disable)
+def _parse_modules ( value: str ) -> dict:
+    modules = {}
+    for name in filter(None, value.split(",")):
+        if name.startswith("-"):
+            modules[name[1:]] = False
+        else:
+            modules[name] = True
+    return modules
+
+# Module settings from the environment
+_log_modules   = _parse_modules(os.environ.get("ENERGY_SIM_LOG", ""))
+_debug_modules = _parse_modules(os.environ.get("ENERGY_SIM_DEBUG", ""))
+
+def get_log ( module: str ) -> Tracer:
+    return Tracer(module, "[LOG]:", is_log_on)
+
+def get_debug ( module: str ) -> Tracer:
+    return Tracer(module, "[DEBUG]:", is_debug_on)
+
+def is_log_on ( module: str = None ) -> bool:
+    return _is_on(_log_modules, LOG_ON, module)
+
+def is_debug_on ( module: str = None ) -> bool:
+    return _is_on(_debug_modules, DEBUG_ON, module)
+
+# The module's own setting, else the "*" setting, else the global switch
+def _is_on (
+            modules: dict,      # Module settings
+            global_on: bool,    # Global switch
+            module: str,
+        ) -> bool:
+    if module in modules:
+        return modules[module]
+    return modules.get("*", global_on)
+
+# Switch LOG tracing at runtime, for a module or for all modules (module="*")
+def set_log_on ( module: str = "*", on: bool = True ):
+    _set_on(_log_modules, module, on)
+
+# Switch DEBUG tracing at runtime, for a module or for all modules (module="*")
+def set_debug_on ( module: str = "*", on: bool = True ):
+    _set_on(_debug_modules, module, on)
+
+def _set_on (
+            modules: dict,      # Module settings
+            module: str,
+            on: bool,
+        ):
+    # "*" overrides all per-module settings
+    if module == "*":
+        modules.clear()
+    modules[module] = on
+
+def print_log( message, *args ):
+    if is_log_on() :
+        print("[LOG]:", (message % args) if args else message)
+
+def print_debug( message, *args ):
+    if is_debug_on() :
+        print("[DEBUG]:", (message % args) if args else message)
 
 def print_debug_nonl( message ):
-    if DEBUG_ON :
+    if is_debug_on() :
         print("[DEBUG]:", message, end="")
 
 # INFO_ON = False
@@ -197,4 +284,3 @@ def print_info( message ):
 
 def print_error( message ):
     print("[ERROR]:", message)
-
@@ -4,6 +4,7 @@
 
 # Imports
 from math import ceil
+import math # for isnan
 import os # for basename
 import time # measure runtimes
 import numpy # for random.shuffle
@@ -15,11 +16,45 @@ import sys # for argv
 from energy_sim import energy_model
 from energy_sim import utils
 from energy_sim import thread_allocation
+from energy_sim import problem_instance
+from energy_sim import evaluation_cache
+from energy_sim import search_budget
+from energy_sim import pareto
+from schedulers import local_search
 
 ###############
 # Environment #
 ###############
 INTERACTIVE = False
+# Energy-model semantics, see problem_instance.SEMANTICS
+#   "baseline" reproduces earlier runs, "per-npu" follows the model documented in energy_model
+# NOTE: schedulers in thread_allocation.PER_NPU_ONLY only model the per-npu semantics,
+#       and are refused with the baseline semantics
+ENERGY_MODEL_SEMANTICS = problem_instance.DEFAULT_SEMANTICS
+# Memoize evaluations of equivalent schedules in exhaustive searches (0 to disable)
+# NOTE: the cache is shared across runs, hence it also affects Scheduler_runtime(ns)
+# NOTE: the cache only pays off when keys repeat, i.e. in the per-npu semantics, with repeated
+#       models or NPUs of the same ARCH, or across repeated searches (e.g. Batched).
+#       Otherwise, hashing keys costs more than the batched evaluation it saves.
+#       It is bypassed in the baseline semantics, with a base load (Batched-Carry),
+#       and by parallel workers (EXHAUSTIVE_WORKERS > 1).
+EVALUATION_CACHE_SIZE = 0
+# Worker processes per exhaustive search, searches below exhaustive.PARALLEL_MIN_SCHEDULES run serially
+# NOTE: mind oversubscription when also splitting the experiment plan across processes
+EXHAUSTIVE_WORKERS = 1
+# Anytime budget per exact search, wall-clock (s) and/or evaluated schedules (None for unlimited)
+# NOTE: interrupted searches report their optimality gap, exact schedulers run serially with either limit set
+SEARCH_TIME_BUDGET = None
+SEARCH_EVALUATION_BUDGET = None
+# Run schedulers whose enumeration does not depend on the target once for all targets,
+# one row per target, see Response columns below
+SHARE_TARGETS = True
+# Local-search refinement after every scheduler, "first" or "best" improvement (None to disable)
+# NOTE: refinement scores neighbours in the per-npu semantics, and requires it
+REFINEMENT = None
+# Refinement budget per run, wall-clock (s) and/or evaluated neighbours (None for unlimited)
+REFINEMENT_TIME_BUDGET = None
+REFINEMENT_EVALUATION_BUDGET = None
 
 ##############
 # Parse args #
@@ -105,9 +140,33 @@ for i in range(0,NUM_WORKLOADS):
     workload_names[i] = workload_names[i][:-4]
 
 # Schedulers
+# NOTE: optional Seed and Params columns set randomized schedulers, see thread_allocation.row_params
 path = factors_dir + "/Schedulers/schedulers.csv"
 schedulers_df = pandas.read_csv(path)
 NUM_SCHEDULERS = len(schedulers_df) # number of rows
+# Check schedulers against the energy-model semantics
+for scheduler_name in schedulers_df["Name"]:
+    if not thread_allocation.supports(scheduler_name, ENERGY_MODEL_SEMANTICS):
+        utils.print_error("Scheduler " + scheduler_name + " requires ENERGY_MODEL_SEMANTICS = \"per-npu\"")
+        exit(1)
+if REFINEMENT is not None and ENERGY_MODEL_SEMANTICS != "per-npu":
+    utils.print_error("REFINEMENT requires ENERGY_MODEL_SEMANTICS = \"per-npu\"")
+    exit(1)
+
+#####################
+# Problem instances #
+#####################
+# Pre-compile each (hw_config, workload) cell once, shared by all schedulers and targets
+instances = [[
+        problem_instance.ProblemInstance(
+            hw_config_df=hw_config_df_list[hw_config_index],
+            workload_df=workload_df_list[workload_index],
+            runtime_df=runtime_df,
+            avg_power_df=avg_power_df,
+            semantics=ENERGY_MODEL_SEMANTICS,
+        )
+        for workload_index in range(0,NUM_WORKLOADS)]
+        for hw_config_index in range(0,NUM_NPU_ARRAYS)]
 
 ################
 # Sanity check #
@@ -117,7 +176,7 @@ NUM_SCHEDULERS = len(schedulers_df) # number of rows
 for hw_config_index in range(0,NUM_NPU_ARRAYS):
     hw_config = hw_config_df_list[hw_config_index]
     # Check if feasible
-    if utils.DEBUG_ON:
+    if utils.is_debug_on(__name__):
         if not utils.is_multinpu_placeable(hw_config):
             print("[ERROR] Design not placeable!:\n", hw_config_names[hw_config_index])
             exit(1)
@@ -142,32 +201,37 @@ outdir = "energy_model/experiment/Response/"
 # E_d = [[[[0. for _ in range(MAX_NPUS)]
 #                  for _ in range(NUM_NPU_ARRAYS)] for _ in range(NUM_WORKLOADS) ] for _ in range(NUM_SCHEDULERS)]
 
-# Total number of runs
-tot_runs = NUM_SCHEDULERS * NUM_NPU_ARRAYS * NUM_WORKLOADS * NUM_OPT_TARGETS * NUM_REPS
+# Evaluation cache, shared by all runs of this process
+cache = None
+if EVALUATION_CACHE_SIZE != 0:
+    cache = evaluation_cache.EvaluationCache(maxsize=EVALUATION_CACHE_SIZE)
+
 experiment_start = time.perf_counter_ns()
 
-# For optimization targets
-exp_plan = [dict() for _ in range(int(tot_runs / NUM_REPS))]
-plan_index = 0
-for optimize_by in optimize_by_list:
-    # Loop over schedulers
-    for scheduler_index, scheduler_row in schedulers_df.iterrows():
+# Targets of each run: all at once for shared schedulers, else one at a time
+def targets_of ( scheduler_row ):
+    if SHARE_TARGETS and thread_allocation.is_shared(scheduler_row):
+        return [optimize_by_list]
+    return [[optimize_by] for optimize_by in optimize_by_list]
+
+# Loop over schedulers
+exp_plan = []
+for scheduler_index, scheduler_row in schedulers_df.iterrows():
+    # For optimization targets
+    for targets in targets_of(scheduler_row):
         # Loop over hardware hw_configs
         for hw_config_index in range(0,NUM_NPU_ARRAYS):
             # Loop over workloads
             for workload_index in range(0,NUM_WORKLOADS):
                     # Generate experiment plan
-                    exp_plan[plan_index] = {
-                        "optimize_by"   : optimize_by,
+                    exp_plan.append({
+                        "targets"       : targets,
                         "scheduler_row" : scheduler_row,
                         "batch_size"    : int(scheduler_row.Batch_Size),
-                        "hw_config_df"  : hw_config_df_list[hw_config_index],
+                        "instance"      : instances[hw_config_index][workload_index],
                         "hw_config_name": hw_config_names[hw_config_index],
-                        "workload_df"   : workload_df_list[workload_index],
                         "workload_name" : workload_names[workload_index],
-                    }
-                    # Increment index
-                    plan_index += 1
+                    })
 
 # Reshuffle for balance across processes
 # NOTE: Use constant seed across processes for completeness
@@ -180,120 +244,186 @@ exp_plan_slice = exp_plan [ process_index*batch_len : (process_index+1)*batch_le
 
 # For repetitions
 this_run = 0
-tot_runs_slice = ceil(tot_runs / num_processes)
-filepaths = ["" for _ in range(len(exp_plan_slice))]
+tot_runs_slice = len(exp_plan_slice) * NUM_REPS
+filepaths = set()
 for rep in range(1,NUM_REPS+1):
     # For each experiment in slice
     for exp_index in range(len(exp_plan_slice)):
         # Unpack dict
-        optimize_by    = exp_plan_slice[exp_index]["optimize_by"]
+        targets        = exp_plan_slice[exp_index]["targets"]
         scheduler_row  = exp_plan_slice[exp_index]["scheduler_row"]
         batch_size     = exp_plan_slice[exp_index]["batch_size"]
-        hw_config_df   = exp_plan_slice[exp_index]["hw_config_df"]
+        instance       = exp_plan_slice[exp_index]["instance"]
         hw_config_name = exp_plan_slice[exp_index]["hw_config_name"]
-        workload_df    = exp_plan_slice[exp_index]["workload_df"]
         workload_name  = exp_plan_slice[exp_index]["workload_name"]
 
         # Print
         this_run += 1
         if batch_size != 0:
-            utils.print_info(f"[{process_index}] [{this_run}/{tot_runs_slice}]: target {optimize_by}, rep {rep}, {scheduler_row.Name}-{batch_size}, {hw_config_name}, {workload_name}")
+            utils.print_info(f"[{process_index}] [{this_run}/{tot_runs_slice}]: target {','.join(targets)}, rep {rep}, {scheduler_row.Name}-{batch_size}, {hw_config_name}, {workload_name}")
         else:
-            utils.print_info(f"[{process_index}] [{this_run}/{tot_runs_slice}]: target {optimize_by}, rep {rep}, {scheduler_row.Name}, {hw_config_name}, {workload_name}")
+            utils.print_info(f"[{process_index}] [{this_run}/{tot_runs_slice}]: target {','.join(targets)}, rep {rep}, {scheduler_row.Name}, {hw_config_name}, {workload_name}")
 
         # continue # DEBUG: for a dry run
 
+        # Budget of this run per target, also records evaluations and gap
+        budgets = [search_budget.SearchBudget(
+                time_limit_s=SEARCH_TIME_BUDGET,
+                max_evaluations=SEARCH_EVALUATION_BUDGET,
+            ) for _ in targets]
+        # Refinement per target, also records objectives before and after
+        refinements = None
+        if REFINEMENT is not None:
+            refinements = [local_search.LocalSearch(
+                    strategy=REFINEMENT,
+                    time_limit_s=REFINEMENT_TIME_BUDGET,
+                    max_evaluations=REFINEMENT_EVALUATION_BUDGET,
+                ) for _ in targets]
+
+        # Non-dominated schedules of Pareto-Frontier runs, written on their own
+        frontier = None
+        if scheduler_row["Name"] == "Pareto-Frontier":
+            frontier = pareto.ParetoArchive()
+
         # Populate allocation matrix S
         ######################################
         # Latency measure: start
         # Get time
         time_start = time.perf_counter_ns()
-        S = thread_allocation.thread_allocation (
+        S_list = thread_allocation.thread_allocation_multi (
             scheduler_row=scheduler_row,
-            hw_config_df=hw_config_df,
-            workload_df=workload_df,
-            runtime_df=runtime_df,
-            avg_power_df=avg_power_df,
-            opt_target=optimize_by
+            instance=instance,
+            opt_targets=targets,
+            cache=cache,
+            num_workers=EXHAUSTIVE_WORKERS,
+            budgets=budgets,
+            frontier=frontier,
         )
         # Get time
         time_end = time.perf_counter_ns()
-        # Save scheduler runtime
-        sched_runtime = time_end - time_start
+        # Save search runtime, shared by all targets, without refinements
+        search_runtime = time_end - time_start
         # Latency measure: end
         ######################################
 
-        #  Check schedule validity
-        if not utils.is_schedule_legal (
-                    len_d=len(hw_config_df),
-                    len_w=len(workload_df),
-                    schedule=S
-                ):
-            utils.print_error("Illegal schedule:")
-            [print(*line) for line in S]
-
-        # Interactive rus
-        if INTERACTIVE:
-            utils.print_info("Press any key to continue...")
-            input()
-
-        # Call to simulation
-        T_tot  ,  \
-        E_comp ,  \
-        E_idle  = \
-            energy_model.compute_energy_model(
-                        hw_config_df,
-                        workload_df,
-                        S,
-                        runtime_df,
-                        avg_power_df,
-                        compute_Ttot=True,
-                        compute_Ecompute=True,
-                        compute_E_idle=True,
-                    )
-
-        ################
-        # Save to file #
-        ################
-
-        # Target file
-        filepaths[exp_index] = outdir + "multi_npu_data.by" + optimize_by + "_" + str(process_index) + ".csv"
-
-        # Check if file exists
-        if not pathlib.Path(filepaths[exp_index]).is_file():
-            # Overwrite header to file
-            with open(filepaths[exp_index], "w") as fd:
-                # Write header
-                fd.write("Scheduler;Workload;NPUarray;Scheduler_runtime(ns);T_tot(s);E_compute(mJ);E_idle(mJ);E_tot(mJ)\n")
-
-        # Append on file
-        with open(filepaths[exp_index], "a") as fd:
-            # Prepare line with factor combinations
-            scheduler_name = scheduler_row["Name"]
-            if scheduler_row["Name"] == "Batched":
-                # Append batch size
-                scheduler_name += "-" + str(int(scheduler_row["Batch_Size"]))
-
-            # Concat all factor and response values
-            concat_line = scheduler_name + ";" + \
-                        workload_name + ";" + \
-                        hw_config_name + ";" + \
-                        str(sched_runtime) + ";" + \
-                        str(T_tot ) + ";" + \
-                        str(E_comp) + ";" + \
-                        str(E_idle) + ";" + \
-                        str(E_comp + E_idle) + "\n"
-
-            # Write to file
-            fd.write(concat_line)
+        # Refinement per target, timed on its own
+        if refinements is not None:
+            for S, optimize_by, refinement in zip(S_list, targets, refinements):
+                refinement.run(instance, S, optimize_by)
+
+        # One row per target
+        for target_index, (S, optimize_by, budget) in enumerate(zip(S_list, targets, budgets)):
+            #  Check schedule validity
+            if not utils.is_schedule_legal (
+                        len_d=instance.LEN_D,
+                        len_w=instance.LEN_W,
+                        schedule=S
+                    ):
+                utils.print_error(f"Illegal schedule: {S}")
+
+            # Interactive rus
+            if INTERACTIVE:
+                utils.print_info("Press any key to continue...")
+                input()
+
+            # Call to simulation, all objectives in a single pass
+            evaluation = energy_model.evaluate(
+                            instance,
+                            S,
+                        )
+
+            ################
+            # Save to file #
+            ################
+
+            # Target file
+            filepath = outdir + "multi_npu_data.by" + optimize_by + "_" + str(process_index) + ".csv"
+            filepaths.add(filepath)
+
+            # Response columns, per run and target:
+            #   Scheduler_runtime(ns)      : runtime attributed to this target, i.e. its share of the search
+            #                                (Shared_search_runtime(ns) / Shared_targets) plus its own refinement
+            #   Shared_targets             : number of targets served by the same search (1 if not shared)
+            #   Shared_search_runtime(ns)  : runtime of the search, repeated on the row of each target it served,
+            #                                hence to be counted once per run across the by<target> files
+            #   Evaluations                : schedules scored by the search, see search_budget,
+            #                                NA for schedulers not in thread_allocation.BUDGETED
+            #   Gap                        : relative optimality gap, see search_budget,
+            #                                NA if the scheduler proves no lower bound (heuristics)
+            #   Objective_before, Objective_after, Refinement_runtime(ns) : see local_search, NaN and 0 if disabled
+            #   T_tot(s), E_compute(mJ), E_idle(mJ), E_tot(mJ) : evaluation of the committed schedule
+            # Check if file exists
+            if not pathlib.Path(filepath).is_file():
+                # Overwrite header to file
+                with open(filepath, "w") as fd:
+                    # Write header
+                    fd.write("Scheduler;Workload;NPUarray;Scheduler_runtime(ns);Shared_targets;Shared_search_runtime(ns);Evaluations;Gap;Objective_before;Objective_after;Refinement_runtime(ns);T_tot(s);E_compute(mJ);E_idle(mJ);E_tot(mJ)\n")
+
+            # Append on file
+            with open(filepath, "a") as fd:
+                # Prepare line with factor combinations
+                scheduler_name = scheduler_row["Name"]
+                if scheduler_row["Name"] in ["Batched", "Batched-Carry"]:
+                    # Append batch size
+                    scheduler_name += "-" + str(int(scheduler_row["Batch_Size"]))
+
+                # Refinement outcome, NaN objectives if disabled
+                refinement = local_search.LocalSearch() if refinements is None else refinements[target_index]
+                # Runtime of this target: its share of the search, then its own refinement
+                sched_runtime = search_runtime // len(targets) + refinement.runtime_ns
+
+                # Search accounting, NA if not tracked
+                evaluations = str(budget.evaluations) if scheduler_row["Name"] in thread_allocation.BUDGETED else "NA"
+                gap = "NA" if math.isnan(budget.gap) else str(budget.gap)
+
+                # Concat all factor and response values
+                concat_line = scheduler_name + ";" + \
+                            workload_name + ";" + \
+                            hw_config_name + ";" + \
+                            str(sched_runtime) + ";" + \
+                            str(len(targets)) + ";" + \
+                            str(search_runtime) + ";" + \
+                            evaluations + ";" + \
+                            gap + ";" + \
+                            str(refinement.objective_before) + ";" + \
+                            str(refinement.objective_after) + ";" + \
+                            str(refinement.runtime_ns) + ";" + \
+                            str(evaluation.T_tot    ) + ";" + \
+                            str(evaluation.E_compute) + ";" + \
+                            str(evaluation.E_idle   ) + ";" + \
+                            str(evaluation.E_tot    ) + "\n"
+
+                # Write to file
+                fd.write(concat_line)
+
+        # Frontier of this run, one row per non-dominated schedule, sorted by T_tot
+        # NOTE: objectives in the per-npu semantics, as scored by the search (see energy_model)
+        if frontier is not None:
+            frontier.sort()
+            filepath = outdir + "pareto_frontier_" + str(process_index) + ".csv"
+            filepaths.add(filepath)
+            if not pathlib.Path(filepath).is_file():
+                with open(filepath, "w") as fd:
+                    fd.write("Workload;NPUarray;Rep;T_tot(s);E_compute(mJ);E_idle(mJ);E_tot(mJ);Schedule\n")
+            with open(filepath, "a") as fd:
+                for (T_tot, E_comp, E_idle), S in zip(frontier.points.tolist(), frontier.payloads):
+                    fd.write(workload_name + ";" + \
+                            hw_config_name + ";" + \
+                            str(rep) + ";" + \
+                            str(T_tot) + ";" + \
+                            str(E_comp) + ";" + \
+                            str(E_idle) + ";" + \
+                            str(E_comp + E_idle) + ";" + \
+                            " ".join(map(str, S.tolist())) + "\n")
 
 # End time
 experiment_end = time.perf_counter_ns()
 from datetime import timedelta
 elapsed_seconds = (experiment_end - experiment_start) / 1e9
 utils.print_info(f"Total experiment runtime {timedelta(seconds=elapsed_seconds)}")
+if cache is not None:
+    utils.print_info(f"Evaluation cache: {cache.hits} hits, {cache.misses} misses (hit ratio {cache.hit_ratio:.3f})")
 
 # Print
-for optimize_by in optimize_by_list:
-    utils.print_info(f"Data available at {filepaths}")
+utils.print_info(f"Data available at {sorted(filepaths)}")
 
@@ -4,23 +4,25 @@
 from sys import maxsize
 
 from energy_sim import utils
+from energy_sim import problem_instance
+
+# Tracing
+log = utils.get_log(__name__)
+debug = utils.get_debug(__name__)
 
 def thread_allocation_AA (
-                            hw_config_df,
-                            workload_df,
-                            S: list[list[int]],
-                            runtime_df,
-                            avg_power_df,
+                            instance: problem_instance.ProblemInstance,
+                            S,
                         ):
 
     # s_{j,d} = 1,  \ \textrm{if} \ d = argmin(p(a_d,m_j) \cdot t(a_d,m_j))
     # In case of multiple NPUs with the same architecture value, round-robin is applied.
 
     # Rename inputs to model symbols
-    A = hw_config_df["ARCH"].values
-    M = workload_df["Model"].values
-    t = runtime_df
-    p = avg_power_df
+    A = instance.A
+    M = instance.M
+    # Single-thread energy p[A[d],M[thread]] * t[A[d],M[thread]]
+    e = instance.energy.tolist()
 
     # Count how many NPUs we have with same ARCH
     arch_dict = {
@@ -33,11 +35,11 @@ def thread_allocation_AA (
         arch_dict[arch] += 1
 
     # Print
-    utils.print_debug(arch_dict)
+    debug("%s", arch_dict)
 
     # Number of NPUs
-    LEN_D = len(hw_config_df)
-    LEN_W = len(workload_df)
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
 
     # Number of threads before reconsidering an NPU
     # Using LEN_D effectively achieves round-robin even if that NPU is busy
@@ -47,7 +49,7 @@ def thread_allocation_AA (
 
     # For each thread
     need_allocation = [True for _ in range(LEN_W)]
-    for thread_index, row_w in workload_df.iterrows():
+    for thread_index in range(LEN_W):
 
         # Loop until this thread gets allocated
         while (need_allocation[thread_index]):
@@ -57,13 +59,13 @@ def thread_allocation_AA (
             energy_running_min = maxsize
 
             # For each NPU
-            for d_index, row_d in hw_config_df.iterrows():
+            for d_index in range(LEN_D):
                 # Print
-                utils.print_debug(f"busy_counters {busy_counters}")
+                debug("busy_counters %s", busy_counters)
 
                 # Free NPUs each NUM_THREADS_FREE threads
                 if busy_counters[d_index] == NUM_THREADS_FREE:
-                    utils.print_debug(f"[{thread_index},{d_index}] Free NPU {d_index}")
+                    debug("[%s,%s] Free NPU %s", thread_index, d_index, d_index)
                     # Free NPU, reset busy counter
                     busy_counters[d_index] = 0
 
@@ -72,20 +74,16 @@ def thread_allocation_AA (
                     # Increment counter
                     busy_counters[d_index] += 1
                     # Skip this NPU
-                    utils.print_debug(f"[{thread_index},{d_index}] Skipping NPU {d_index}")
+                    debug("[%s,%s] Skipping NPU %s", thread_index, d_index, d_index)
                 else:
-                    utils.print_debug(f"[{thread_index},{d_index}] Evaluating NPU {d_index}")
-                    # Extract runtime
-                    runtime = t.loc[(t["ARCH"] == A[d_index]) & (t["Model"] == M[thread_index])]["Runtime (s)"].values[0]
-                    # Extract power
-                    power_ps = avg_power_df.loc[(p["ARCH"] == A[d_index]) & (p["Model"] == M[thread_index])]["Power PS (mW)"].values[0]
-                    power_pl = p.loc[(p["ARCH"] == A[d_index]) & (p["Model"] == M[thread_index]) ]["Power PL (mW)"].values[0]
-                    energy_tot = (power_pl + power_ps) * runtime
+                    debug("[%s,%s] Evaluating NPU %s", thread_index, d_index, d_index)
+                    # Extract energy
+                    energy_tot = e[thread_index][d_index]
 
                     # Compute running minimum with round robin
                     if energy_tot < energy_running_min:
-                        utils.print_log(f"{A[d_index]} {M[thread_index]} ")
-                        utils.print_debug(f"Updating running minimum from {energy_running_min} to {energy_tot}")
+                        log("%s %s ", A[d_index], M[thread_index])
+                        debug("Updating running minimum from %s to %s", energy_running_min, energy_tot)
 
                         # Update
                         energy_running_min = energy_tot
@@ -95,15 +93,15 @@ def thread_allocation_AA (
             # Allocation #
             ##############
             # Allocate thread
-            S[thread_index][d_argmin] = 1
+            S[thread_index] = d_argmin
             # Mark this NPU as busy, increment counter
             busy_counters[d_argmin] += 1
             # This thread is allocated
             need_allocation[thread_index] = False
 
             # Print
-            utils.print_debug(f"d_argmin      {d_argmin}")
-            utils.print_debug(f"busy_counters {busy_counters}")
-            utils.print_debug(f"need_allocation {need_allocation}")
+            debug("d_argmin      %s", d_argmin)
+            debug("busy_counters %s", busy_counters)
+            debug("need_allocation %s", need_allocation)
 
 
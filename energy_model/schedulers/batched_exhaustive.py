@@ -1,9 +1,18 @@
 # Description:
 #   Batched, locally optimal scheduler.
+#   With carry, each batch is optimized on top of the per-NPU load placed by earlier batches,
+#   at the same per-batch cost. The load only decomposes in the per-npu semantics,
+#   which the instance must then follow.
+#   Without carry, batches are independent of the target, hence a single pass serves several targets.
 
 import math
 from energy_sim import utils
+from energy_sim import energy_model
 from schedulers import exhaustive
+from energy_sim import problem_instance
+
+# Tracing
+log = utils.get_log(__name__)
 
 # Batch size
 # TODO: either
@@ -12,56 +21,96 @@ from schedulers import exhaustive
 # batch_size = 4
 
 def thread_allocation_BE (
-                            hw_config_df,
-                            workload_df,
-                            S: list[list[int]],
+                            instance: problem_instance.ProblemInstance,
+                            S,
                             batch_size: int,
-                            runtime_df,     # t(a,m)
-                            avg_power_df,   # p(a,m)
-                            compute_Ttot: bool,
-                            compute_Ecompute: bool,
-                            compute_E_idle: bool,
                             opt_target: str,
+                            cache = None,       # Optional evaluation_cache.EvaluationCache
+                            num_workers: int = 1, # Number of worker processes, for large batches
+                            carry: bool = False,  # Optimize each batch against the load of earlier batches
                         ):
 
+    # Carry-over: per-npu semantics only
+    if carry:
+        assert(instance.semantics == "per-npu")
 
     # Pre-allocate output arrays
-    LEN_D = len(hw_config_df)
-    LEN_W = len(workload_df)
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
     NUM_B = math.ceil(LEN_W / batch_size)
 
     # Debug
-    utils.print_log(f"LEN_D: {LEN_D}:")
-    utils.print_log(f"LEN_W: {LEN_W}:")
-    utils.print_log(f"batch_size: {batch_size}:")
-    utils.print_log(f"NUM_B: {NUM_B}:")
+    log("LEN_D: %s:", LEN_D)
+    log("LEN_W: %s:", LEN_W)
+    log("batch_size: %s:", batch_size)
+    log("NUM_B: %s:", NUM_B)
+
+    # Tracing, hoisted out of the loop
+    log_on = log.on
+
+    # Load placed by earlier batches
+    base = None
 
     # For each batch
     for batch_index in range(0,NUM_B):
         # Select batch
         index_low = batch_size*batch_index
         index_high = batch_size*(batch_index+1)
-        batch_workload_df = workload_df [ index_low : index_high ]
+        batch_instance = instance.take(slice(index_low, index_high))
 
         # Print
-        utils.print_log(f"index_low: {index_low}")
-        utils.print_log(f"index_high: {index_high}")
-        utils.print_log(f"batch_workload_df:\n{batch_workload_df}")
+        if log_on:
+            log("index_low: %s", index_low)
+            log("index_high: %s", index_high)
+            log("batch_instance: %s", batch_instance)
 
-        # Call exhaustive version with a batch of the workload and the corresponding section of the allocation matrix S
+        # Call exhaustive version with a batch of the workload and the corresponding section (view) of the assignment array S
         exhaustive.thread_allocation_E(
-                hw_config_df,
-                batch_workload_df,
+                batch_instance,
                 S[index_low : index_high],
-                runtime_df,
-                avg_power_df,
-                compute_Ttot=compute_Ttot,
-                compute_Ecompute=compute_Ecompute,
-                compute_E_idle=compute_E_idle,
                 opt_target=opt_target,
+                cache=cache,
+                num_workers=num_workers,
+                base=base,
             )
 
+        # Carry this batch's load over to the next
+        if carry:
+            batch_load = energy_model.load_of(batch_instance, S[index_low : index_high])
+            base = batch_load if base is None else base + batch_load
+            if log_on:
+                log("base: %s", base)
+
         # Print
-        utils.print_log(f"S: ")
-        if utils.LOG_ON:
-            [print(*line) for line in S]
+        if log_on:
+            log("S: %s", S)
+
+# Single pass for several targets, committing the schedule of opt_targets[i] on S_list[i]
+# NOTE: with carry, later batches depend on the target, hence it is not supported
+def thread_allocation_BE_multi (
+                            instance: problem_instance.ProblemInstance,
+                            S_list: list,       # Assignment arrays, one per target
+                            batch_size: int,
+                            opt_targets: list,  # Optimization targets
+                            cache = None,       # Optional evaluation_cache.EvaluationCache
+                            num_workers: int = 1, # Number of worker processes, for large batches
+                        ):
+
+    # Pre-allocate output arrays
+    LEN_W = instance.LEN_W
+    NUM_B = math.ceil(LEN_W / batch_size)
+
+    # Debug
+    log("batch_size: %s, NUM_B: %s, opt_targets: %s", batch_size, NUM_B, opt_targets)
+
+    # For each batch, search once for all targets
+    for batch_index in range(0,NUM_B):
+        index_low = batch_size*batch_index
+        index_high = batch_size*(batch_index+1)
+        exhaustive.thread_allocation_E_multi(
+                instance.take(slice(index_low, index_high)),
+                [S[index_low : index_high] for S in S_list],
+                opt_targets=opt_targets,
+                cache=cache,
+                num_workers=num_workers,
+            )
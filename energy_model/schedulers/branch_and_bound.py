@@ -0,0 +1,247 @@
+# Description:
+#   Branch-and-bound, optimal scheduler.
+#   Threads are allocated depth-first, longest first, trying NPUs in index order.
+#   Subtrees whose admissible lower bound cannot improve on the incumbent are pruned,
+#   the incumbent being seeded by the greedy scheduler.
+#   Symmetric subtrees are skipped: threads of the same model, and empty NPUs of the same ARCH,
+#   are interchangeable.
+#   The node is a schedule_state.ScheduleState, allocated and deallocated along the search.
+#   The last threads of each surviving subtree are completed in a single batched evaluation.
+#   With a search_budget.SearchBudget, the search stops once the budget is exhausted, a last
+#   leaf block being truncated to the evaluations left; the lower bound on the optimum is then
+#   the least bound of the subtrees left open.
+#   Nodes are bounded and scored in the per-npu semantics, which the instance must follow.
+
+import itertools
+import numpy
+from energy_sim import utils
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import problem_instance
+from energy_sim import schedule_state
+from schedulers import greedy
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Maximum number of completions scored per batched leaf evaluation
+LEAF_BLOCK_SIZE = 1 << 12
+# Relative slack on pruning, to absorb round-off between bounds and evaluations
+PRUNE_TOLERANCE = 1e-9
+
+# Lower bounds at a node, with N[d], t_sum[d], e_sum[d] of the threads allocated so far
+# and R threads left:
+#   kmin[d]  = min(k[d, max(N[d],1) : N[d]+R+1]), since k is not monotone in general
+#   kglob[d] = min(k[d, 1 : LEN_W+1])
+#   T_tot   >= max[d](kmin[d] * t_sum[d])
+#               (current per-NPU load)
+#   T_tot   >= (sum[d](kmin[d] * t_sum[d]) + sum[left](min[d](kglob[d] * t[j,d]))) / LEN_D
+#               (aggregate capacity: sum[d](T[d]) <= LEN_D * T_tot)
+#   T_tot   >= (sum[d](t_sum[d]) + sum[left](min[d](t[j,d]))) / sum[d](1 / kglob[d])
+#               (remaining work over aggregate speed)
+#   E_comp  >= sum[d](kmin[d] * e_sum[d]) + sum[left](min[d](kglob[d] * e[j,d]))
+#               (minimum remaining energy per thread)
+#   E_idle  >= 0
+# NOTE: E_idle is not monotone along a branch, hence it is only pruned by its trivial bound
+
+# Suffix sums: suffix[i] = sum[j >= i](values[j])
+def suffix_sums ( values ) -> list:
+    return numpy.concatenate([numpy.cumsum(values[::-1])[::-1], [0.]]).tolist()
+
+def thread_allocation_BB (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+                        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+
+    # Search order: longest threads first, threads of the same model adjacent
+    order = numpy.lexsort((instance.model_of_thread, -instance.runtime.min(axis=1)))
+    instance = instance.take(order)
+
+    # Debug
+    log("LEN_D: %s:", LEN_D)
+    log("LEN_W: %s:", LEN_W)
+
+    ###############
+    # Pre-compute #
+    ###############
+    # Nested lists, for fast scalar access
+    arch_ids = instance.arch_ids.tolist()
+    k = instance.k
+    # Threads of the same model as the previous one are allocated in non-decreasing NPU order
+    model_of_thread = instance.model_of_thread.tolist()
+    same_model = [thread_index > 0 and model_of_thread[thread_index] == model_of_thread[thread_index-1]
+                    for thread_index in range(LEN_W)]
+
+    # kmin[d][n][R]
+    k_min = [[None for _ in range(LEN_W+1)] for _ in range(LEN_D)]
+    for d in range(LEN_D):
+        for n in range(LEN_W+1):
+            low = max(n, 1)
+            running = numpy.minimum.accumulate(k[d, low : LEN_W+1]).tolist()
+            k_min[d][n] = [running[n+R-low] if n+R >= low else 0. for R in range(LEN_W-n+1)]
+
+    # kglob[d]
+    k_glob = k[:, 1 : LEN_W+1].min(axis=1) if LEN_W > 0 else numpy.ones(LEN_D)
+    # Remaining-thread bounds, as suffix sums over threads
+    suffix_kt = suffix_sums((instance.runtime * k_glob).min(axis=1))
+    suffix_t  = suffix_sums(instance.runtime.min(axis=1))
+    suffix_ke = suffix_sums((instance.energy * k_glob).min(axis=1))
+    # Aggregate speed sum[d](1 / kglob[d]), zero disables the bound
+    speed = float((1. / k_glob).sum()) if (k_glob > 0).all() else 0.
+
+    #####################
+    # Leaf-block tables #
+    #####################
+    # Complete the last LEAF_THREADS threads at once, over all LEN_D^LEAF_THREADS completions
+    LEAF_THREADS = 0
+    while LEAF_THREADS < LEN_W and LEN_D ** (LEAF_THREADS+1) <= LEAF_BLOCK_SIZE:
+        LEAF_THREADS += 1
+    FRONTIER = LEN_W - LEAF_THREADS
+    Y = numpy.array(
+            list(itertools.product(range(LEN_D), repeat=LEAF_THREADS)),
+            dtype=numpy.intp,
+        ).reshape(LEN_D ** LEAF_THREADS, LEAF_THREADS)
+    NUM_Y = len(Y)
+    # Per-NPU counts, runtime and energy of each completion {NUM_Y x LEN_D}
+    bins = (numpy.arange(NUM_Y)[:,None] * LEN_D + Y).ravel()
+    leaf_threads = numpy.arange(FRONTIER, LEN_W)
+    N_leaf = numpy.bincount(bins, minlength=NUM_Y * LEN_D).reshape(NUM_Y, LEN_D)
+    t_leaf = numpy.bincount(bins, weights=instance.runtime[leaf_threads, Y].ravel(), minlength=NUM_Y * LEN_D).reshape(NUM_Y, LEN_D)
+    e_leaf = numpy.bincount(bins, weights=instance.energy[leaf_threads, Y].ravel(), minlength=NUM_Y * LEN_D).reshape(NUM_Y, LEN_D)
+    npus = numpy.arange(LEN_D)
+
+    log("LEAF_THREADS: %s, FRONTIER: %s", LEAF_THREADS, FRONTIER)
+
+    ##################
+    # Seed incumbent #
+    ##################
+    if budget is not None:
+        budget.start()
+    S_seed = schedule.empty_schedule(LEN_W)
+    greedy.thread_allocation_G(instance, S_seed, opt_target=opt_target)
+    incumbent = energy_model.evaluate_per_npu(instance, S_seed).objective(opt_target)
+    best_schedule = S_seed
+    log("Greedy incumbent: %s", incumbent)
+
+    ##########
+    # Search #
+    ##########
+    # Node state, with aliases of its accumulators (updated in place)
+    state = schedule_state.ScheduleState(instance)
+    X = state.X
+    N = state.N
+    t_sum = state.t_sum
+    e_sum = state.e_sum
+    num_nodes = 0
+    num_pruned = 0
+    num_leaf_blocks = 0
+    # Anytime state: whether the budget ran out, and the least bound of the subtrees left open
+    stopped = False
+    open_bound = float("inf")
+
+    # Lower bound on the target, at a node with R threads left
+    def lower_bound ( thread_index: int ) -> float:
+        if opt_target == "E_idle":
+            return 0.
+        R = LEN_W - thread_index
+        k_node = [k_min[d][N[d]][R] for d in range(LEN_D)]
+        E_comp = sum(k_node[d] * e_sum[d] for d in range(LEN_D)) + suffix_ke[thread_index]
+        if opt_target != "T_tot":
+            return E_comp
+        T_tot = max(k_node[d] * t_sum[d] for d in range(LEN_D))
+        T_tot = max(T_tot, (sum(k_node[d] * t_sum[d] for d in range(LEN_D)) + suffix_kt[thread_index]) / LEN_D)
+        if speed != 0.:
+            T_tot = max(T_tot, (sum(t_sum) + suffix_t[thread_index]) / speed)
+        return T_tot
+
+    # Score all completions of the current node at once
+    def leaf_block ( bound: float ):
+        nonlocal incumbent, best_schedule, stopped, open_bound
+        # Truncate the block to the evaluations left, leaving the node open
+        num_y = NUM_Y
+        if budget is not None:
+            remaining = budget.remaining_evaluations
+            if remaining is not None and remaining < NUM_Y:
+                num_y = remaining
+                stopped = True
+                open_bound = min(open_bound, bound)
+            budget.charge(num_y)
+        k_N = k[npus, numpy.array(N) + N_leaf[:num_y]]
+        T = (numpy.array(t_sum) + t_leaf[:num_y]) * k_N
+        E = (numpy.array(e_sum) + e_leaf[:num_y]) * k_N
+        T_tot = T.max(axis=1)
+        E_comp = E.sum(axis=1)
+        E_idle = ((T_tot[:,None] - T) * instance.power_idle).sum(axis=1)
+        objective = energy_model.objective_by(
+                opt_target=opt_target,
+                T_tot=T_tot,
+                E_comp=E_comp,
+                E_idle=E_idle,
+            )
+        argmin = int(numpy.argmin(objective))
+        if objective[argmin] < incumbent:
+            incumbent = float(objective[argmin])
+            best_schedule = numpy.array(X[:FRONTIER] + Y[argmin].tolist(), dtype=schedule.SCHEDULE_DTYPE)
+            log("New incumbent: %s", incumbent)
+
+    # Depth-first, in NPU index order
+    def branch ( thread_index: int ):
+        nonlocal num_nodes, num_pruned, num_leaf_blocks, stopped, open_bound
+        num_nodes += 1
+
+        # Prune
+        bound = lower_bound(thread_index)
+        if bound * (1. - PRUNE_TOLERANCE) >= incumbent:
+            num_pruned += 1
+            return
+
+        # Out of budget: leave this subtree open
+        if stopped or (budget is not None and budget.exhausted):
+            stopped = True
+            open_bound = min(open_bound, bound)
+            return
+
+        # Complete in batch
+        if thread_index == FRONTIER:
+            num_leaf_blocks += 1
+            leaf_block(bound)
+            return
+
+        # Branch on target NPU
+        empty_archs = set()
+        d_low = X[thread_index-1] if same_model[thread_index] else 0
+        for d in range(d_low, LEN_D):
+            # Symmetry: empty NPUs of the same ARCH are interchangeable, try only the first
+            if N[d] == 0:
+                if arch_ids[d] in empty_archs:
+                    continue
+                empty_archs.add(arch_ids[d])
+
+            # Allocate
+            t_d, e_d = t_sum[d], e_sum[d]
+            state.assign(thread_index, d)
+
+            branch(thread_index + 1)
+
+            # Deallocate, restoring exact sums
+            state.unassign(thread_index, t_d, e_d)
+
+    branch(0)
+
+    # Debug
+    log("num_nodes: %s, num_pruned: %s, num_leaf_blocks: %s, incumbent: %s",
+            num_nodes, num_pruned, num_leaf_blocks, incumbent)
+    if budget is not None:
+        budget.close(incumbent, open_bound)
+
+    # Commit best schedule on S, in the caller's thread order
+    S[order] = best_schedule
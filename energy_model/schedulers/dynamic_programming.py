@@ -0,0 +1,314 @@
+# Description:
+#   Dynamic-programming, optimal scheduler.
+#   The model only depends on how many threads of each model each NPU gets, hence NPUs are
+#   allocated one at a time, the state being the per-model counts still to allocate:
+#       r[m]     : threads of model (m) not yet allocated, r in [0, model_counts]
+#       c[m]     : threads of model (m) allocated to NPU (d), c <= r
+#       T_d(c)   = k[d,sum(c)] * sum[m](c[m] * t[A[d],m])
+#       E_d(c)   = k[d,sum(c)] * sum[m](c[m] * p[A[d],m] * t[A[d],m])
+#   Recurrences, over NPUs d = 0 .. LEN_D-1:
+#       T_tot     : f[d+1][r-c] = min(max(f[d][r], T_d(c)))
+#       E_compute : f[d+1][r-c] = min(f[d][r] + E_d(c))
+#   E_idle and E_tot are not separable over NPUs, since they depend on the final T_tot:
+#       E_idle = P * T_tot - sum[d](p_d * T_d),  with P = sum[d](p_d)
+#       E_tot  = P * T_tot + sum[d](E_d - p_d * T_d)
+#   hence each state keeps the Pareto front of labels (T_max, z), with z the running sum above,
+#   minimizing P * T_max + z at the end. Labels that provably cannot beat an incumbent are pruned.
+#   With a search_budget.SearchBudget, the budget is checked before each stage (NPU), each
+#   charged its (state, count vector) transitions, and before each state of the Pareto-label DP.
+#   Out of budget, the best of the Greedy schedule and the known incumbents is committed, with
+#   the gap to energy_model.lower_bound.
+#   States are scored in the per-npu semantics, which the instance must follow.
+
+import itertools
+import numpy
+from energy_sim import utils
+from energy_sim import energy_model
+from energy_sim import problem_instance
+from schedulers import greedy
+from schedulers import symmetric_exhaustive
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Per-NPU runtime and energy of each count vector c {LEN_D x (model_counts+1)}
+def npu_tables ( instance: problem_instance.ProblemInstance ):
+    shape = tuple(count + 1 for count in instance.model_counts.tolist())
+    c = numpy.indices(shape).reshape(len(shape), -1)    # {LEN_M x NUM_C}
+    n = c.sum(axis=0)
+    k_n = instance.k[:, n]                              # {LEN_D x NUM_C}
+    T = k_n * (instance.model_runtime.T @ c)
+    E = k_n * (instance.model_energy.T @ c)
+    return T.reshape((instance.LEN_D,) + shape), E.reshape((instance.LEN_D,) + shape)
+
+# Transitions per stage, i.e. pairs of count vectors c <= r
+def stage_transitions ( instance: problem_instance.ProblemInstance ) -> int:
+    pairs = 1
+    for count in instance.model_counts.tolist():
+        pairs *= (count + 1) * (count + 2) // 2
+    return pairs
+
+# Whether a stage of this many transitions fits in the budget, charging it if so
+def charge_stage ( budget, num_transitions: int ) -> bool:
+    if budget is None:
+        return True
+    remaining = budget.remaining_evaluations
+    if budget.exhausted or (remaining is not None and remaining < num_transitions):
+        return False
+    budget.charge(num_transitions)
+    return True
+
+# Vectorized DP for separable targets (T_tot, E_compute)
+# Returns the count matrix C {LEN_D x LEN_M} of an optimal schedule, None if out of budget
+def solve_separable (
+            instance: problem_instance.ProblemInstance,
+            values,             # Per-NPU value of each count vector {LEN_D x (model_counts+1)}
+            combine,            # numpy.maximum or numpy.add
+            budget = None,      # Optional search_budget.SearchBudget
+        ) -> numpy.ndarray:
+
+    LEN_D = instance.LEN_D
+    counts = tuple(instance.model_counts.tolist())
+    shape = tuple(count + 1 for count in counts)
+    grid = list(itertools.product(*[range(size) for size in shape]))
+
+    # f[r]: best value over the NPUs so far, with r threads left
+    f = numpy.full(shape, numpy.inf)
+    f[counts] = 0.
+    choices = []
+    num_transitions = stage_transitions(instance)
+    for d in range(LEN_D):
+        if not charge_stage(budget, num_transitions):
+            log("[solve_separable] out of budget at d: %s", d)
+            return None
+        g = numpy.full(shape, numpy.inf)
+        choice = numpy.zeros(shape, dtype=numpy.intp)
+        for c_index, c in enumerate(grid):
+            # States r >= c move to r - c
+            source = f[tuple(slice(c_m, None) for c_m in c)]
+            target = tuple(slice(0, size - c_m) for size, c_m in zip(shape, c))
+            candidate = combine(source, values[d][c])
+            better = candidate < g[target]
+            g[target] = numpy.where(better, candidate, g[target])
+            choice[target] = numpy.where(better, c_index, choice[target])
+        f = g
+        choices.append(choice)
+
+    # Backtrack from the empty state
+    log("[solve_separable] optimum: %s", f[(0,) * len(shape)])
+    C = numpy.zeros((LEN_D, len(shape)), dtype=numpy.intp)
+    r = (0,) * len(shape)
+    for d in range(LEN_D-1, -1, -1):
+        C[d] = grid[choices[d][r]]
+        r = tuple(r_m + c_m for r_m, c_m in zip(r, C[d].tolist()))
+    return C
+
+# Minimum of an additive value over NPUs d .. LEN_D-1, for each count vector r left
+#   h[d][r] = min(values[d][c] + h[d+1][r-c]), with h[LEN_D][0] = 0
+# Returns None if out of budget
+def future_minimum (
+            instance: problem_instance.ProblemInstance,
+            values,             # Per-NPU value of each count vector {LEN_D x (model_counts+1)}
+            budget = None,      # Optional search_budget.SearchBudget
+        ) -> list:
+
+    counts = tuple(instance.model_counts.tolist())
+    shape = tuple(count + 1 for count in counts)
+    grid = list(itertools.product(*[range(size) for size in shape]))
+
+    h = numpy.full(shape, numpy.inf)
+    h[(0,) * len(shape)] = 0.
+    future = [h]
+    num_transitions = stage_transitions(instance)
+    for d in range(instance.LEN_D-1, -1, -1):
+        if not charge_stage(budget, num_transitions):
+            return None
+        g = numpy.full(shape, numpy.inf)
+        for c in grid:
+            # States r >= c, from r - c
+            target = tuple(slice(c_m, None) for c_m in c)
+            source = h[tuple(slice(0, size - c_m) for size, c_m in zip(shape, c))]
+            g[target] = numpy.minimum(g[target], values[d][c] + source)
+        h = g
+        future.append(h)
+    return future[::-1]
+
+# Pareto-label DP for non-separable targets (E_idle, E_tot)
+#   z_d(c) = weight_E * E_d(c) - p_d * T_d(c), minimize P * T_max + sum[d](z_d)
+# Labels are pruned against an incumbent with admissible bounds on the NPUs left (d ..):
+#   P * T_max + z_fut >= P * T_max + min(z_fut)
+#   P * T_max - sum[d..](p_d * T_d) >= (P - P_fut) * T_max, since T_d <= T_max
+# Returns the count matrix C {LEN_D x LEN_M} of an optimal schedule, None if out of budget
+def solve_pareto (
+            instance: problem_instance.ProblemInstance,
+            T,                  # Per-NPU runtime of each count vector
+            E,                  # Per-NPU energy of each count vector
+            weight_E: float,    # Weight of E_d in z: 0. for E_idle, 1. for E_tot
+            incumbent: float,   # Objective of a known schedule
+            C_incumbent,        # Count matrix of a known schedule
+            budget = None,      # Optional search_budget.SearchBudget
+        ) -> numpy.ndarray:
+
+    LEN_D = instance.LEN_D
+    p_idle = instance.power_idle.tolist()
+    P = sum(p_idle)
+    counts = tuple(instance.model_counts.tolist())
+    z = weight_E * E - instance.power_idle.reshape((LEN_D,) + (1,) * len(counts)) * T
+
+    # Bounds on the NPUs left
+    z_future = future_minimum(instance, z, budget)
+    if z_future is None:
+        return None
+    E_future = future_minimum(instance, weight_E * E, budget)
+    if E_future is None:
+        return None
+    P_future = [sum(p_idle[d:]) for d in range(LEN_D+1)]
+    # Relative slack, to absorb round-off between bounds and evaluations
+    threshold = incumbent + 1e-9 * abs(incumbent)
+
+    # labels[r]: Pareto front of (T_max, z, back-pointer), sorted by T_max
+    # back-pointer: (previous state, index in its front, c)
+    full = {counts: [(0., 0., None)]}
+    fronts = [full]
+    num_pruned = 0
+    for d in range(LEN_D):
+        T_d = T[d].tolist()
+        z_d = z[d].tolist()
+        z_next = z_future[d+1]
+        E_next = E_future[d+1]
+        P_next = P_future[d+1]
+        last = (d == LEN_D-1)
+        candidates = {}
+        for r, labels in fronts[-1].items():
+            # Transitions from this state
+            num_transitions = len(labels)
+            if not last:
+                for r_m in r:
+                    num_transitions *= r_m + 1
+            if not charge_stage(budget, num_transitions):
+                log("[solve_pareto] out of budget at d: %s", d)
+                return None
+            # The last NPU takes all threads left
+            sub_vectors = [r] if last else itertools.product(*[range(r_m + 1) for r_m in r])
+            for c in sub_vectors:
+                T_c = T_d
+                z_c = z_d
+                for c_m in c:
+                    T_c = T_c[c_m]
+                    z_c = z_c[c_m]
+                state = tuple(r_m - c_m for r_m, c_m in zip(r, c))
+                z_bound = float(z_next[state])
+                E_bound = float(E_next[state])
+                entries = None
+                for label_index, (T_max, z_sum, _) in enumerate(labels):
+                    T_max = T_max if T_max > T_c else T_c
+                    z_sum = z_sum + z_c
+                    # Prune
+                    if (P * T_max + z_sum + z_bound > threshold or
+                        (P - P_next) * T_max + z_sum + E_bound > threshold):
+                        num_pruned += 1
+                        continue
+                    if entries is None:
+                        entries = candidates.setdefault(state, [])
+                    entries.append((T_max, z_sum, (r, label_index, c)))
+        # Keep non-dominated labels: increasing T_max, strictly decreasing z
+        front = {}
+        for state, entries in candidates.items():
+            entries.sort(key=lambda label: (label[0], label[1]))
+            kept = []
+            for label in entries:
+                if len(kept) == 0 or label[1] < kept[-1][1]:
+                    kept.append(label)
+            front[state] = kept
+        fronts.append(front)
+        log("[solve_pareto] d: %s, states: %s, labels: %s, pruned: %s",
+                d, len(front), sum(len(kept) for kept in front.values()), num_pruned)
+
+    # Best final label, if any beats the incumbent
+    final = fronts[-1].get((0,) * len(counts), [])
+    values = [P * T_max + z_sum for T_max, z_sum, _ in final]
+    if len(values) == 0 or min(values) >= incumbent:
+        log("[solve_pareto] optimum: %s (incumbent)", incumbent)
+        return C_incumbent
+    label_index = int(numpy.argmin(values))
+    log("[solve_pareto] optimum: %s", values[label_index])
+
+    # Backtrack
+    C = numpy.zeros((LEN_D, len(counts)), dtype=numpy.intp)
+    state = (0,) * len(counts)
+    for d in range(LEN_D-1, -1, -1):
+        previous, label_index, c = fronts[d+1][state][label_index][2]
+        C[d] = c
+        state = previous
+    return C
+
+def thread_allocation_DP (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            budget = None,      # Optional search_budget.SearchBudget
+                        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # Debug
+    log("LEN_D: %s, models: %s, model_counts: %s", instance.LEN_D, instance.models, instance.model_counts)
+
+    # Per-NPU tables
+    if budget is not None:
+        budget.start()
+    T, E = npu_tables(instance)
+
+    # Solve by target, C is None if out of budget
+    C_incumbent = None
+    if opt_target == "T_tot":
+        C = solve_separable(instance, T, numpy.maximum, budget)
+    elif opt_target == "E_compute":
+        C = solve_separable(instance, E, numpy.add, budget)
+    elif opt_target in ["E_idle", "E_tot"]:
+        # Incumbent: best of the T_tot-optimal and E_compute-optimal schedules
+        incumbent = float("inf")
+        for C_seed in [
+                    solve_separable(instance, T, numpy.maximum, budget),
+                    solve_separable(instance, E, numpy.add, budget),
+                ]:
+            if C_seed is None:
+                continue
+            value = energy_model.evaluate_counts(instance, C_seed).objective(opt_target)
+            if value < incumbent:
+                incumbent, C_incumbent = value, C_seed
+        C = None
+        if C_incumbent is not None:
+            C = solve_pareto(
+                    instance,
+                    T,
+                    E,
+                    weight_E=(1. if opt_target == "E_tot" else 0.),
+                    incumbent=incumbent,
+                    C_incumbent=C_incumbent,
+                    budget=budget,
+                )
+    else:
+        # Print and error out
+        utils.print_error("Unsupported optimization target " + opt_target)
+        exit(1)
+
+    # Out of budget: best of Greedy and the known incumbent
+    complete = C is not None
+    if not complete:
+        greedy.thread_allocation_G(instance, S, opt_target)
+        C = energy_model.count_matrix(instance, S)
+        if C_incumbent is not None:
+            value = energy_model.evaluate_counts(instance, C).objective(opt_target)
+            if energy_model.evaluate_counts(instance, C_incumbent).objective(opt_target) < value:
+                C = C_incumbent
+
+    # Exact if complete, else the gap to the lower bound
+    if budget is not None:
+        value = energy_model.evaluate_counts(instance, C).objective(opt_target)
+        budget.close(value, value if complete else energy_model.lower_bound(instance, opt_target))
+
+    # Commit count matrix on S
+    log("C: %s", C)
+    symmetric_exhaustive.expand(instance, C, S)
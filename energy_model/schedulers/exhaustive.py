@@ -1,133 +1,244 @@
 # Description:
 #   Exhaustive, optimal scheduler.
-#   This is implementation does not need to be optimized for efficiency.
+#   All |D|^|W| schedules are streamed and scored in fixed-size batched evaluations,
+#   keeping only the incumbent, so that memory does not grow with the search space.
+#   Blocks of schedules are decoded from their indices with mixed-radix arithmetic.
+#   Large searches can be partitioned by assignment prefix, and run in a process pool.
+#   With a search_budget.SearchBudget, the search stops once the budget is exhausted,
+#   committing the incumbent and a lower bound on the schedules left.
+#   A single search can serve several optimization targets, scoring each block once.
 
-import sys
-import energy_sim
 import itertools
+import concurrent.futures
+import numpy
 from energy_sim import utils
+from energy_sim import schedule
 from energy_sim import energy_model
 from energy_sim import thread_allocation
+from energy_sim import problem_instance
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Number of schedules per batched evaluation
+# NOTE: bounds memory to O(BLOCK_SIZE * LEN_W), trading off per-block overheads
+BLOCK_SIZE = 1 << 16
+# Minimum number of schedules to search in parallel, below this pool overheads dominate
+PARALLEL_MIN_SCHEDULES = 1 << 16
+# Number of prefix partitions per worker, for load balance
+PARTITIONS_PER_WORKER = 4
+
+# Process pool, shared across calls
+_pool = None
+_pool_workers = 0
+
+def get_pool ( num_workers: int ) -> concurrent.futures.ProcessPoolExecutor:
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != num_workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers)
+        _pool_workers = num_workers
+    return _pool
+
+# Decode schedule indices into assignment arrays, in mixed radix LEN_D
+# Thread 0 is the most significant digit, i.e. indices follow the enumeration order of
+# itertools.product(range(LEN_D), repeat=LEN_W)
+def decode (
+            indices,            # Schedule indices, in [0, LEN_D^LEN_W)
+            len_d: int,
+            len_w: int,
+        ) -> numpy.ndarray:
+    place_values = len_d ** numpy.arange(len_w-1, -1, -1, dtype=numpy.int64)
+    return ((indices[:,None] // place_values) % len_d).astype(schedule.SCHEDULE_DTYPE)
+
+# Search all schedules starting with a fixed assignment prefix
+# Returns, per target, the minimum and the first schedule achieving it, in enumeration order,
+# and the number of evaluated schedules
+def search_partition (
+            instance: problem_instance.ProblemInstance,
+            opt_targets: list,  # Optimization targets
+            prefix: tuple,      # Target NPUs of the first len(prefix) threads
+            cache = None,       # Optional evaluation_cache.EvaluationCache
+            base = None,        # Optional energy_model.Load of threads allocated beforehand
+            budget = None,      # Optional search_budget.SearchBudget
+        ):
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    LEN_P = len(prefix)
+    LEN_T = len(opt_targets)
+    # Schedule indices must fit in int64
+    assert(LEN_D ** LEN_W < 2**63)
+
+    ##############################
+    # Stream all legal schedules #
+    ##############################
+    # Schedules with this prefix span a contiguous index range
+    partition_size = LEN_D ** (LEN_W - LEN_P)
+    index_low = 0
+    for d in prefix:
+        index_low = index_low * LEN_D + d
+    index_low *= partition_size
+    index_high = index_low + partition_size
+
+    # Evaluate in blocks of BLOCK_SIZE schedules, keeping only the incumbents
+    # NOTE: with a cache, equivalent schedules are evaluated only once.
+    #       Cache keys do not cover the base load, hence the cache is bypassed with one.
+    #       In the baseline semantics, keys are the schedules themselves, which this enumeration
+    #       never repeats, hence the cache is bypassed as well.
+    if base is not None:
+        evaluate_batch = lambda instance, X: energy_model.evaluate_batch(instance, X, base=base)
+    elif cache is not None and instance.semantics != "baseline":
+        evaluate_batch = cache.evaluate_batch
+    else:
+        evaluate_batch = energy_model.evaluate_batch
+    running_min = [float("inf")] * LEN_T
+    best_schedule = [None] * LEN_T
+    num_blocks = 0
+    num_evaluations = 0
+    for block_low in range(index_low, index_high, BLOCK_SIZE):
+        # Decode next block {BLOCK_SIZE x LEN_W}
+        block_high = min(block_low + BLOCK_SIZE, index_high)
+        # Truncate to the evaluations left, scoring at least one schedule
+        if budget is not None and budget.remaining_evaluations is not None:
+            block_high = min(block_high, block_low + max(budget.remaining_evaluations, 1))
+        block = decode(numpy.arange(block_low, block_high, dtype=numpy.int64), LEN_D, LEN_W)
+        num_blocks += 1
+        num_evaluations += block_high - block_low
+
+        # Evaluate block at once, on all objectives
+        T_tot, E_comp, E_idle = evaluate_batch(
+                    instance,
+                    block,      # Assignment arrays
+                )
+
+        # Minimize by each target
+        for target_index, opt_target in enumerate(opt_targets):
+            block_min, block_argmin = thread_allocation.argmin_by(
+                    opt_target=opt_target,
+                    T_tot=T_tot,
+                    E_comp=E_comp,
+                    E_idle=E_idle,
+                )
+
+            # New incumbent, ties resolve to the first schedule in enumeration order
+            if block_min < running_min[target_index]:
+                running_min[target_index] = block_min
+                best_schedule[target_index] = block[block_argmin].copy()
+
+        # Stop on budget
+        if budget is not None and budget.charge(block_high - block_low):
+            break
+
+    # Debug
+    log("prefix: %s, num_blocks: %s, running_min: %s", prefix, num_blocks, running_min)
+
+    # Return values
+    return running_min, best_schedule, num_evaluations
 
 def thread_allocation_E (
-                            hw_config_df,
-                            workload_df,
+                            instance: problem_instance.ProblemInstance,
                             S,
-                            runtime_df,     # t(a,m)
-                            avg_power_df,   # p(a,m)
-                            compute_Ttot: bool,
-                            compute_Ecompute: bool,
-                            compute_E_idle: bool,
                             opt_target: str,    # Optimization target
+                            cache = None,       # Optional evaluation_cache.EvaluationCache
+                            num_workers: int = 1, # Number of worker processes
+                            base = None,        # Optional energy_model.Load of threads allocated beforehand
+                            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+                        ):
+    thread_allocation_E_multi(
+            instance=instance,
+            S_list=[S],
+            opt_targets=[opt_target],
+            cache=cache,
+            num_workers=num_workers,
+            base=base,
+            budgets=None if budget is None else [budget],
+        )
+
+# Single search for several targets, committing the best schedule of opt_targets[i] on S_list[i]
+def thread_allocation_E_multi (
+                            instance: problem_instance.ProblemInstance,
+                            S_list: list,       # Assignment arrays, one per target
+                            opt_targets: list,  # Optimization targets
+                            cache = None,       # Optional evaluation_cache.EvaluationCache
+                            num_workers: int = 1, # Number of worker processes
+                            base = None,        # Optional energy_model.Load of threads allocated beforehand
+                            budgets = None,     # Optional search_budget.SearchBudget per target, for anytime search
                         ):
 
     # Pre-allocate output arrays
-    LEN_D = len(hw_config_df)
-    LEN_W = len(workload_df)
-    # Preallocate all legal schedules (careful, this grows exponentially)
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    # Number of legal schedules (careful, this grows exponentially)
     MAX_SCHEDULES = LEN_D ** LEN_W
-    T_tot  = [0. for _ in range(MAX_SCHEDULES)]
-    E_comp  = [0. for _ in range(MAX_SCHEDULES)]
-    E_idle = [0. for _ in range(MAX_SCHEDULES)]
 
     # Debug
-    utils.print_log(f"LEN_D: {LEN_D}:")
-    utils.print_log(f"LEN_W: {LEN_W}:")
-    utils.print_log(f"MAX_SCHEDULES: {MAX_SCHEDULES}:")
-
-    ################################
-    # Generate all legal schedules #
-    ################################
-
-    legal_schedules = [[[0 for _ in range(LEN_D)] for _ in range(LEN_W)] for _ in range(MAX_SCHEDULES)]
-    # # For each thread t
-    # for thread_index in range(0,LEN_W):
-    #     # Reset counter
-    #     schedule_index = 0
-    # For each NPU d
-    legal_rows = [[0 for _ in range(LEN_D)] for _ in range(LEN_D)]
-    for d in range(0,LEN_D):
-        legal_rows[d][d] = 1
-    utils.print_log(f"legal_rows {legal_rows}")
-
-    values = [value for value in range(LEN_D)]
-    # combination length -> number of NPUs
-    target_length = LEN_W
-    # All possible permutation combinations
-    combinations = list(itertools.product(values, repeat=target_length))
-    assert(len(combinations) != 0)
-
-    # For each combination
-    schedule_index = 0
-    for combo in combinations:
-        utils.print_log(f"combo {combo}")
-        thread_index = 0
-        for npu_index in combo:
-            # Allocate to NPU d
-            legal_schedules[schedule_index][thread_index] = legal_rows[npu_index]
-            thread_index += 1
-        # Increment counter
-        schedule_index += 1
+    log("LEN_D: %s:", LEN_D)
+    log("LEN_W: %s:", LEN_W)
+    log("MAX_SCHEDULES: %s:", MAX_SCHEDULES)
+    log("opt_targets: %s:", opt_targets)
+
+    # The global lower bound does not cover a base load
+    assert(budgets is None or base is None)
+    # The first budget drives the search
+    budget = None if budgets is None else budgets[0]
+
+    if budget is not None:
+        budget.start()
+
+    # Serial search
+    # NOTE: the budget is process-local, hence anytime searches run serially,
+    #       while an unlimited budget only counts evaluations
+    if num_workers <= 1 or MAX_SCHEDULES < PARALLEL_MIN_SCHEDULES or (budget is not None and budget.limited):
+        running_min, best_schedule, _ = search_partition(instance, opt_targets, (), cache, base, budget)
+
+    # Parallel search, partitioned by prefix
+    # NOTE: the cache is process-local, hence not used by workers
+    else:
+        # Shortest prefix with enough partitions
+        LEN_P = 1
+        while LEN_P < LEN_W and LEN_D ** LEN_P < num_workers * PARTITIONS_PER_WORKER:
+            LEN_P += 1
+        prefixes = list(itertools.product(range(LEN_D), repeat=LEN_P))
+        log("num_workers: %s, LEN_P: %s, partitions: %s", num_workers, LEN_P, len(prefixes))
+
+        # Local bests and evaluation counts, in prefix order
+        results = get_pool(num_workers).map(
+                search_partition,
+                itertools.repeat(instance),
+                itertools.repeat(opt_targets),
+                prefixes,
+                itertools.repeat(None),
+                itertools.repeat(base),
+            )
+
+        # Deterministic reduction: ties resolve to the first partition in enumeration order,
+        # hence to the same schedule as the serial search
+        running_min = [float("inf")] * len(opt_targets)
+        best_schedule = [None] * len(opt_targets)
+        for local_min, local_best, local_evaluations in results:
+            for target_index in range(len(opt_targets)):
+                if local_min[target_index] < running_min[target_index]:
+                    running_min[target_index] = local_min[target_index]
+                    best_schedule[target_index] = local_best[target_index]
+            if budget is not None:
+                budget.charge(local_evaluations)
+
+    # Lower bound: the incumbent if all schedules were scored, else the global bound
+    if budget is not None:
+        for target_index, opt_target in enumerate(opt_targets):
+            budgets[target_index].follow(budget)
+            if budget.evaluations >= MAX_SCHEDULES:
+                budgets[target_index].close(running_min[target_index], running_min[target_index])
+            else:
+                budgets[target_index].close(running_min[target_index], energy_model.lower_bound(instance, opt_target))
 
     # Debug
-    if utils.DEBUG_ON:
-        # for schedule_index in range(0,MAX_SCHEDULES):
-        #     utils.print_log(f"{schedule_index}:")
-        #     [print(*line) for line in legal_schedules[schedule_index]]
-        for schedule_index in range(0,MAX_SCHEDULES):
-            # Check schedule legality
-            if not utils.is_schedule_legal (
-                        len_d=LEN_D,
-                        len_w=LEN_W,
-                        schedule=legal_schedules[schedule_index]
-                    ):
-                utils.print_error("Illegal schedule:")
-                [print(*line) for line in legal_schedules[schedule_index]]
-                exit(1)
-            # Print
-            utils.print_log(f"legal_schedules[{schedule_index}]:")
-            if utils.LOG_ON:
-                [print(*line) for line in legal_schedules[schedule_index]]
-
-    # For each possible schedule
-    running_min = sys.maxsize
-    best_index = 0
-    for schedule_index in range(0,MAX_SCHEDULES):
-        # Compute energy
-        T_tot  [schedule_index] ,  \
-        E_comp  [schedule_index] ,  \
-        E_idle [schedule_index]  = \
-            energy_model.compute_energy_model(
-                        hw_config_df,   # D array
-                        workload_df,    # W array (up to this thread)
-                        legal_schedules[schedule_index], # Allocation matrix (running copy)
-                        runtime_df,     # t(a,m)
-                        avg_power_df,   # p(a,m)
-                        compute_Ttot=compute_Ttot,
-                        compute_Ecompute=compute_Ecompute,
-                        compute_E_idle=compute_E_idle,
-                    )
-
-        # Print
-        utils.print_log(f"Evaluating schedule:")
-        if utils.LOG_ON:
-            [print(*line) for line in legal_schedules[schedule_index]]
-
-        # Update running min and argmin
-        running_min, best_index = thread_allocation.running_argmin_by(
-            opt_target=opt_target,
-            running_min=running_min,
-            running_argmin=best_index,
-            argmin_index=schedule_index,
-            T_tot=T_tot[schedule_index],
-            E_comp=E_comp[schedule_index],
-            E_idle=E_idle[schedule_index],
-        )
-
-        # PMS...
-        for i in range(0, len(S)):
-            for j in range(0, len(S[0])):
-                S[i][j] = legal_schedules[best_index][i][j]
-
-
+    log("running_min: %s", running_min)
 
+    # Commit best schedules on S_list
+    for S, best in zip(S_list, best_schedule):
+        assert(best is not None)
+        S[:] = best
@@ -0,0 +1,144 @@
+# Description:
+#   Genetic-algorithm scheduler.
+#   Individuals are assignment arrays, and a whole population {POPULATION_SIZE x LEN_W} is scored
+#   in one energy_model.evaluate_batch call per generation. Each generation:
+#       1. keeps the ELITISM fittest individuals unchanged
+#       2. fills the rest with children of parents picked by binary tournaments, with uniform
+#          crossover at CROSSOVER_RATE, then per-thread mutation to a random NPU at MUTATION_RATE
+#   until the generation or wall-clock budget is exhausted, i.e. TIME_LIMIT_S or the search
+#   budget's limits if set. The initial population holds the Greedy schedule, and random ones.
+#   Fitness is the optimization target, or a weighted mix of T_tot and E_tot normalized to the
+#   Greedy schedule. The fittest individual is committed.
+
+import time
+import numpy
+from energy_sim import utils
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import problem_instance
+from schedulers import greedy
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Defaults
+POPULATION_SIZE = 256
+CROSSOVER_RATE = 0.9    # Probability of crossover per child
+MUTATION_RATE = None    # Probability of mutation per thread, None for 1/LEN_W
+ELITISM = 2             # Individuals carried over unchanged
+MAX_GENERATIONS = 500
+TIME_LIMIT_S = 0.5      # Wall-clock budget (s)
+
+# Fitness of a population, lower is better
+#   weight None : the optimization target
+#   weight w    : w * T_tot / T_ref + (1-w) * E_tot / E_ref
+def fitness (
+            T_tot,
+            E_comp,
+            E_idle,
+            opt_target: str,
+            weight: float = None,
+            reference: tuple = None,    # (T_ref, E_ref), for a weighted mix
+        ):
+    if weight is None:
+        return energy_model.objective_by(
+                opt_target=opt_target,
+                T_tot=T_tot,
+                E_comp=E_comp,
+                E_idle=E_idle,
+            )
+    T_ref, E_ref = reference
+    return weight * T_tot / T_ref + (1 - weight) * (E_comp + E_idle) / E_ref
+
+def thread_allocation_GA (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            weight: float = None, # Weight of T_tot in a T_tot/E_tot mix, None for the target only
+                            population_size: int = POPULATION_SIZE,
+                            crossover_rate: float = CROSSOVER_RATE,
+                            mutation_rate: float = MUTATION_RATE,
+                            elitism: int = ELITISM,
+                            max_generations: int = MAX_GENERATIONS,
+                            time_limit_s: float = TIME_LIMIT_S, # Wall-clock budget (s), unless set by budget, None for unlimited
+                            seed = None,        # Seed, None for fresh entropy
+                            budget = None,      # Optional search_budget.SearchBudget, bounds and records evaluations
+                        ):
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    NUM_P = population_size
+    NUM_E = min(elitism, NUM_P)
+    if mutation_rate is None:
+        mutation_rate = 1. / max(LEN_W, 1)
+    if budget is not None:
+        budget.start()
+    time_start = time.perf_counter_ns()
+    # Wall-clock budget, the search budget's if set
+    time_limit_ns = None if time_limit_s is None else int(time_limit_s * 1e9)
+    if budget is not None and budget.time_limit_ns is not None:
+        time_limit_ns = budget.time_limit_ns
+    rng = numpy.random.default_rng(seed)
+
+    # Initial population: Greedy, then random schedules
+    greedy.thread_allocation_G(instance, S, opt_target)
+    population = rng.integers(LEN_D, size=(NUM_P, LEN_W)).astype(schedule.SCHEDULE_DTYPE)
+    population[0] = S
+    reference = None
+    if weight is not None:
+        evaluation = energy_model.evaluate(instance, S)
+        reference = (evaluation.T_tot or 1., evaluation.E_tot or 1.)
+
+    # Debug
+    log("LEN_D: %s, LEN_W: %s, NUM_P: %s, NUM_E: %s, mutation_rate: %s", LEN_D, LEN_W, NUM_P, NUM_E, mutation_rate)
+
+    # Score the whole population at once
+    def evaluate ( population ):
+        if budget is not None:
+            budget.charge(len(population))
+        return fitness(*energy_model.evaluate_batch(instance, population), opt_target, weight, reference)
+    scores = evaluate(population)
+
+    generation = 0
+    for generation in range(max_generations):
+        # Stop on budget
+        if time_limit_ns is not None and time.perf_counter_ns() - time_start >= time_limit_ns:
+            break
+        if budget is not None and budget.exhausted:
+            break
+
+        # Elites, fittest first
+        ranking = numpy.argsort(scores, kind="stable")
+        elites = population[ranking[:NUM_E]]
+
+        # Parents, by binary tournaments
+        NUM_C = NUM_P - NUM_E
+        contenders = rng.integers(NUM_P, size=(2, 2, NUM_C))
+        parents = numpy.where(
+                scores[contenders[:,0]] <= scores[contenders[:,1]],
+                contenders[:,0],
+                contenders[:,1],
+            )
+        mothers = population[parents[0]]
+        fathers = population[parents[1]]
+
+        # Uniform crossover, on a share of the children
+        crossed = rng.random(NUM_C) < crossover_rate
+        from_father = crossed[:,None] & (rng.random((NUM_C, LEN_W)) < 0.5)
+        children = numpy.where(from_father, fathers, mothers)
+
+        # Mutation to a random NPU
+        mutated = rng.random((NUM_C, LEN_W)) < mutation_rate
+        children[mutated] = rng.integers(LEN_D, size=int(mutated.sum()))
+
+        # Next generation
+        population = numpy.concatenate([elites, children])
+        scores = numpy.concatenate([scores[ranking[:NUM_E]], evaluate(children)])
+
+    # Debug
+    best = int(numpy.argmin(scores))
+    log("generations: %s, best: %s", generation, scores[best])
+
+    # Commit best schedule on S
+    S[:] = population[best]
@@ -1,96 +1,216 @@
 # Description:
 #   greedy scheduler
+#   Builds the schedule on a schedule_state.ScheduleState, so that each tentative placement
+#   is scored by its delta on the target in O(LEN_D), instead of re-evaluating the partial
+#   schedule on each NPU.
+#   Near-ties are re-scored with the arithmetic of energy_model.evaluate_batch, so that
+#   round-off breaks them as with a full evaluation.
+#   In the "baseline" semantics, threads are placed in order, hence the tentative thread (j)
+#   is always the last one on its NPU: T[d] grows by t[j,d] and E[d] becomes e[j,d] * k[d,j+1],
+#   again scored in O(LEN_D) per thread (see allocate_baseline).
 
-import sys
-import energy_sim
+import numpy
 from energy_sim import utils
 from energy_sim import energy_model
 from energy_sim import thread_allocation
+from energy_sim import problem_instance
+from energy_sim import schedule_state
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Relative tolerance of delta scores, well above their round-off
+TIE_RTOL = 1e-9
+
+# Objectives of a subset of tentative placements, as evaluate_batch computes them
+def score_exact (
+            candidates,     # Candidate NPUs {K}
+            T,              # Current T[d] {LEN_D}
+            E,              # Current E[d] {LEN_D}
+            T_new,          # T[d] with the thread on (d) {LEN_D}
+            E_new,          # E[d] with the thread on (d) {LEN_D}
+            p_idle,         # Idle power draw {LEN_D}
+        ):
+    rows = numpy.arange(len(candidates))
+    T_cand = numpy.tile(T, (len(candidates), 1))
+    E_cand = numpy.tile(E, (len(candidates), 1))
+    T_cand[rows, candidates] = T_new[candidates]
+    E_cand[rows, candidates] = E_new[candidates]
+    T_tot = T_cand.max(axis=1)
+    return T_tot, E_cand.sum(axis=1), ((T_tot[:,None] - T_cand) * p_idle).sum(axis=1)
+
+# NPU minimizing the target among tentative placements, breaking near-ties exactly
+def select (
+            opt_target: str,    # Optimization target
+            T,                  # Current T[d] {LEN_D}
+            E,                  # Current E[d] {LEN_D}
+            T_new,              # T[d] with the thread on (d) {LEN_D}
+            E_new,              # E[d] with the thread on (d) {LEN_D}
+            T_tot,              # T_tot with the thread on (d) {LEN_D}
+            E_comp,             # E_comp with the thread on (d) {LEN_D}
+            E_idle,             # E_idle with the thread on (d) {LEN_D}
+            p_idle,             # Idle power draw {LEN_D}
+        ) -> int:
+    objective = energy_model.objective_by(
+        opt_target=opt_target,
+        T_tot=T_tot,
+        E_comp=E_comp,
+        E_idle=E_idle,
+    )
+    running_min = objective.min()
+    ties = numpy.flatnonzero(objective <= running_min + TIE_RTOL * abs(running_min))
+    if len(ties) == 1:
+        return int(ties[0])
+    # Break near-ties exactly, in NPU order
+    _, tie_index = thread_allocation.argmin_by(
+        opt_target,
+        *score_exact(ties, T, E, T_new, E_new, p_idle),
+    )
+    return int(ties[tie_index])
+
+# Greedy in the baseline semantics, see energy_model.evaluate_baseline
+#   T[d] : sum[W[d]](t[A[d],:]), without k
+#   E[d] : p*t[A[d],M[j]] * k[d,j+1], with (j) the last thread on (d), 0 if none
+def allocate_baseline (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str
+                        ):
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    p_idle = instance.power_idle
+    p_idle_sum = p_idle.sum()
+
+    # Per-NPU state of the threads allocated so far
+    T = numpy.zeros(LEN_D)
+    E = numpy.zeros(LEN_D)
+
+    # Tracing, hoisted out of the loop
+    log_on = log.on
+
+    # One thread at the time
+    for thread_index in range(LEN_W):
+        # T[d] and E[d] with this thread tentatively allocated on each NPU (d) {LEN_D}
+        T_new = T + instance.runtime[thread_index]
+        E_new = instance.energy[thread_index] * instance.k[:, thread_index+1]
+
+        # Largest T of the NPUs other than (d)
+        d_max = int(T.argmax())
+        T_others = numpy.full(LEN_D, T[d_max])
+        T_others[d_max] = numpy.delete(T, d_max).max() if LEN_D > 1 else 0.
+
+        # Totals with this thread on (d)
+        T_tot = numpy.maximum(T_new, T_others)
+        E_comp = E.sum() + (E_new - E)
+        E_idle = T_tot * p_idle_sum - ((p_idle * T).sum() + p_idle * (T_new - T))
+
+        # Minimize by target
+        argmin_d = select(opt_target, T, E, T_new, E_new, T_tot, E_comp, E_idle, p_idle)
+
+        # Debug
+        if log_on:
+            log("[greedy] T_tot : %s", T_tot)
+            log("[greedy] E_comp : %s", E_comp)
+            log("[greedy] E_idle: %s", E_idle)
+
+        # Commit argmin on S, and on the state
+        S[thread_index] = argmin_d
+        T[argmin_d] = T_new[argmin_d]
+        E[argmin_d] = E_new[argmin_d]
+
+        # Debug
+        if log_on:
+            log("[greedy] argmin_d: %s", argmin_d)
+            log("[greedy] S[0 : thread_index+1]: %s", S[0 : thread_index+1])
+
+# Greedy re-evaluating the partial schedule on each NPU, in the semantics of the instance
+# NOTE: O(LEN_W^2 * LEN_D), reference for the incremental versions
+def allocate_exact (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str
+                        ):
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+
+    # Tracing, hoisted out of the loop
+    log_on = log.on
+
+    # One thread at the time
+    for thread_index in range(LEN_W):
+        # Tentative allocations of this thread on each DPU {LEN_D x thread_index+1}
+        X_ = numpy.tile(S[0 : thread_index+1], (LEN_D, 1))
+        X_[:, thread_index] = numpy.arange(LEN_D)
+
+        # Compute runtime (T_tot) and energy (E_comp) with running schedules
+        T_tot, E_comp, E_idle = energy_model.evaluate_batch(
+                    instance.take(slice(0, thread_index+1)),    # W array (up to this thread)
+                    X_,             # Assignment arrays (running copies)
+                )
+
+        # Minimize by target
+        _, argmin_d = thread_allocation.argmin_by(
+            opt_target=opt_target,
+            T_tot=T_tot,
+            E_comp=E_comp,
+            E_idle=E_idle,
+        )
+
+        # Commit argmin on S
+        S[thread_index] = argmin_d
+
+        # Debug
+        if log_on:
+            log("[greedy] argmin_d: %s", argmin_d)
+            log("[greedy] S[0 : thread_index+1]: %s", S[0 : thread_index+1])
 
 def thread_allocation_G (
-                            hw_config_df,
-                            workload_df,
-                            S: list[list[int]],
-                            runtime_df,
-                            avg_power_df,
-                            compute_Ttot: bool,
-                            compute_Ecompute: bool,
-                            compute_E_idle: bool,
+                            instance: problem_instance.ProblemInstance,
+                            S,
                             opt_target: str
                         ):
     # s_{d,t} = 1, \ \textrm{where} \
     #     d = \underset{d \in D}{argmin} (E_{tot}(S'))
 
     # Print workload
-    utils.print_log(f"[greedy] {workload_df.Model.to_numpy()}")
+    log("[greedy] %s", instance.M)
+
+    # Baseline semantics
+    if instance.semantics == "baseline":
+        allocate_baseline(instance, S, opt_target)
+        return
+
+    # Pre-compute lengths
+    LEN_W = instance.LEN_W
+    p_idle = instance.power_idle
 
-    # Pre-allocate output arrays
-    LEN_D = len(hw_config_df)
-    # LEN_W = len(workload_df)
-    T_tot  = [0. for _ in range(LEN_D)]
-    E_comp = [0. for _ in range(LEN_D)]
-    E_idle = [0. for _ in range(LEN_D)]
+    # Incrementally-evaluated schedule of the threads allocated so far
+    state = schedule_state.ScheduleState(instance)
+
+    # Tracing, hoisted out of the loop
+    log_on = log.on
 
     # One thread at the time
-    for thread_index, row in workload_df.iterrows():
-        # Init running minimum
-        argmin_d = 0
-        running_min = sys.maxsize
-
-        # Prepare running copy of schedule S
-        S_ = [[0 for _ in range(LEN_D)] for _ in range(thread_index+1)]
-        for i in range(0,thread_index+1):
-            for j in range(LEN_D):
-                S_[i][j] = S[i][j]
-
-        # For each DPU
-        for d_index, row in hw_config_df.iterrows():
-            # Tentative allocation of this thread on current DPU
-            S_[thread_index][d_index] = 1
-            utils.print_log(f"Tentative [{thread_index},{d_index}] S_:")
-            if utils.LOG_ON:
-                [print(*line) for line in S_]
-
-            # Compute runtime (T_tot) and energy (E_comp) with running schedule
-            T_tot  [d_index] ,  \
-            E_comp [d_index] ,  \
-            E_idle [d_index]  = \
-                energy_model.compute_energy_model(
-                            hw_config_df,   # D array
-                            workload_df[0 : thread_index+1],    # W array (up to this thread)
-                            S_,             # Allocation matrix (running copy)
-                            runtime_df,     # t(a,m)
-                            avg_power_df,   # p(a,m)
-                            compute_Ttot=compute_Ttot,
-                            compute_Ecompute=compute_Ecompute,
-                            compute_E_idle=compute_E_idle,
-                        )
-
-            # Update running min and argmin
-            running_min, argmin_d = thread_allocation.running_argmin_by(
-                opt_target=opt_target,
-                running_min=running_min,
-                argmin_index=d_index,
-                running_argmin=argmin_d,
-                T_tot=T_tot[d_index],
-                E_comp=E_comp[d_index],
-                E_idle=E_idle[d_index],
-            )
-
-            # Deallocate
-            S_[thread_index][d_index] = 0
+    for thread_index in range(LEN_W):
+        # Totals with this thread tentatively allocated on each NPU (d) {LEN_D}
+        T_new, E_new, T_tot, E_comp, E_idle = (numpy.array(values) for values in state.placements(thread_index))
+
+        # Minimize by target
+        argmin_d = select(opt_target, numpy.array(state.T), numpy.array(state.E), T_new, E_new, T_tot, E_comp, E_idle, p_idle)
 
         # Debug
-        utils.print_log(f"[greedy] T_tot : {T_tot}")
-        utils.print_log(f"[greedy] E_comp : {E_comp}")
-        utils.print_log(f"[greedy] E_idle: {E_idle}")
+        if log_on:
+            log("[greedy] T_tot : %s", T_tot)
+            log("[greedy] E_comp : %s", E_comp)
+            log("[greedy] E_idle: %s", E_idle)
 
-        # Commit argmin on S
-        S[thread_index][argmin_d] = 1
+        # Commit argmin on S, and on the state
+        S[thread_index] = argmin_d
+        state.assign(thread_index, argmin_d)
 
         # Debug
-        utils.print_log(f"[greedy] argmin_d: {argmin_d}")
-        utils.print_log("[greedy] S[0 : thread_index+1]:")
-        if utils.LOG_ON:
-            [print(*line) for line in S[0 : thread_index+1]]
-
+        if log_on:
+            log("[greedy] argmin_d: %s", argmin_d)
+            log("[greedy] S[0 : thread_index+1]: %s", S[0 : thread_index+1])
@@ -0,0 +1,64 @@
+# Description:
+#   LPT-style greedy scheduler (Longest Processing Time first).
+#   Threads are placed in decreasing order of expected runtime, i.e. their mean single-thread
+#   runtime over the NPUs, each on the NPU with the earliest projected finish time.
+#   The projected finish of a busy NPU depends on its own load and thread count, so every NPU is
+#   scored per thread, and scheduling costs O(LEN_W * LEN_D).
+#   NOTE: with k[n] < 1, sharing an NPU can finish earlier than an idle one.
+#   NOTE: the target is ignored, this heuristic balances T_tot.
+#   NOTE: finish times follow the per-npu semantics, which the instance must follow.
+
+import numpy
+from energy_sim import utils
+from energy_sim import problem_instance
+from energy_sim import schedule_state
+
+# Tracing
+log = utils.get_log(__name__)
+
+def thread_allocation_LPT (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+
+    # Running sums of single-thread runtimes t_sum[d], and thread counts N[d]
+    state = schedule_state.ScheduleState(instance)
+    t_sum = state.t_sum
+    N = state.N
+    # Per-thread, per-NPU runtimes and factors as nested lists, for fast scalar access
+    t = state.t
+    k = state.k
+
+    # Longest expected runtime first, ties keep the thread order
+    order = numpy.argsort(-instance.runtime.mean(axis=1), kind="stable").tolist()
+    log("order: %s", order)
+
+    # Tracing, hoisted out of the loop
+    log_on = log.on
+
+    for thread_index in order:
+        # Earliest projected finish, ties to the lowest NPU index
+        # NOTE: k[d][1] = 1, i.e. idle NPUs finish after the thread alone
+        t_thread = t[thread_index]
+        best_finish = float("inf")
+        best = None
+        for d in range(LEN_D):
+            finish = (t_sum[d] + t_thread[d]) * k[d][N[d] + 1]
+            if finish < best_finish:
+                best_finish = finish
+                best = d
+
+        # Commit on S
+        d = best
+        S[thread_index] = d
+        state.assign(thread_index, d)
+
+        # Debug
+        if log_on:
+            log("thread: %s, d: %s, finish: %s", thread_index, d, best_finish)
@@ -0,0 +1,219 @@
+# Description:
+#   Local-search refinement, usable after any scheduler.
+#   Explores the neighbourhood of a schedule by moving one thread to another NPU, or by swapping
+#   the NPUs of two threads, accepting improvements on the optimization target:
+#       "first" : apply the first improving neighbour found, then rescan
+#       "best"  : scan the whole neighbourhood, then apply the best improving neighbour
+#   until no neighbour improves, or the budget is exhausted.
+#   Neighbours are scored with a schedule_state.ScheduleState, i.e. with constant-time deltas,
+#   in the per-npu semantics, which the instance must follow. The objectives before and after
+#   are those of energy_model.evaluate, i.e. as reported for the schedule.
+
+import time
+# Import custom
+from energy_sim import utils
+from energy_sim import energy_model
+from energy_sim import schedule_state
+from energy_sim import search_budget
+from energy_sim import problem_instance
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Supported strategies
+STRATEGIES = [
+        "first",
+        "best",
+    ]
+
+# Relative improvement to accept a neighbour, above the round-off of incremental deltas
+IMPROVEMENT_RTOL = 1e-12
+# Evaluated neighbours between two refreshes of the state, flushing the round-off of
+# applying and undoing moves on its running totals
+REFRESH_PERIOD = 1024
+
+# Refinement settings, also records the outcome of its last run
+class LocalSearch:
+    __slots__ = (
+            "strategy",
+            "time_limit_s",
+            "max_evaluations",
+            "objective_before",
+            "objective_after",
+            "runtime_ns",
+            "evaluations",
+            "num_moves",
+        )
+
+    def __init__ (
+                self,
+                strategy: str = "first",        # Neighbourhood strategy, in STRATEGIES
+                time_limit_s: float = None,     # Wall-clock budget, None for unlimited
+                max_evaluations: int = None,    # Neighbours evaluated, None for unlimited
+            ):
+        if strategy not in STRATEGIES:
+            utils.print_error("Unsupported local search strategy " + strategy)
+            exit(1)
+        self.strategy = strategy
+        self.time_limit_s = time_limit_s
+        self.max_evaluations = max_evaluations
+        self.objective_before = float("nan")
+        self.objective_after = float("nan")
+        self.runtime_ns = 0
+        self.evaluations = 0
+        self.num_moves = 0
+
+    # Refine S in-place on the optimization target
+    def run (
+                self,
+                instance: problem_instance.ProblemInstance,
+                S,
+                opt_target: str,
+            ):
+        # Per-npu semantics only
+        assert(instance.semantics == "per-npu")
+        time_start = time.perf_counter_ns()
+        budget = search_budget.SearchBudget(
+                time_limit_s=self.time_limit_s,
+                max_evaluations=self.max_evaluations,
+            )
+
+        # Incremental state of S
+        state = schedule_state.ScheduleState(instance)
+        for thread_index, d in enumerate(S.tolist()):
+            state.assign(thread_index, d)
+        self.objective_before = energy_model.evaluate(instance, S).objective(opt_target)
+
+        # Improve until a local optimum, or out of budget
+        if self.strategy == "first":
+            self.num_moves = refine_first(instance, state, opt_target, budget)
+        else:
+            self.num_moves = refine_best(instance, state, opt_target, budget)
+
+        # Commit on S, from a freshly recomputed state
+        state.refresh()
+        S[:] = state.X
+        self.objective_after = energy_model.evaluate(instance, S).objective(opt_target)
+        self.evaluations = budget.evaluations
+        self.runtime_ns = time.perf_counter_ns() - time_start
+        log("%s", self)
+
+    def __repr__ ( self ) -> str:
+        return "LocalSearch(strategy={}, before={}, after={}, moves={}, evaluations={}, runtime_ns={})".format(
+                self.strategy, self.objective_before, self.objective_after,
+                self.num_moves, self.evaluations, self.runtime_ns)
+
+# Neighbours of a schedule, as lists of (thread, d) moves
+#   move : one thread to another NPU
+#   swap : two threads on different NPUs, skipping threads of the same model (a no-op)
+def neighbours (
+            instance: problem_instance.ProblemInstance,
+            state: schedule_state.ScheduleState,
+        ):
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    model_ids = instance.model_ids.tolist()
+    for thread_index in range(LEN_W):
+        for d in range(LEN_D):
+            if d != state.X[thread_index]:
+                yield [(thread_index, d)]
+    for thread_a in range(LEN_W):
+        for thread_b in range(thread_a + 1, LEN_W):
+            d_a = state.X[thread_a]
+            d_b = state.X[thread_b]
+            if d_a != d_b and model_ids[thread_a] != model_ids[thread_b]:
+                yield [(thread_a, d_b), (thread_b, d_a)]
+
+# Objective after applying a neighbour, leaving the state unchanged
+def evaluate_neighbour (
+            state: schedule_state.ScheduleState,
+            neighbour: list,
+            opt_target: str,
+        ) -> float:
+    undo = [(thread_index, state.X[thread_index]) for thread_index, _ in neighbour]
+    apply(state, neighbour)
+    objective = state.objective(opt_target)
+    apply(state, undo)
+    return objective
+
+# Apply a list of (thread, d) moves
+def apply (
+            state: schedule_state.ScheduleState,
+            neighbour: list,
+        ):
+    for thread_index, d in neighbour:
+        state.move(thread_index, d)
+
+# Recompute the state from scratch, returns its objective
+def refresh (
+            state: schedule_state.ScheduleState,
+            opt_target: str,
+        ) -> float:
+    state.refresh()
+    return state.objective(opt_target)
+
+# Whether a neighbour's objective improves on the current one
+def improves ( objective: float, current: float ) -> bool:
+    return objective < current - IMPROVEMENT_RTOL * abs(current)
+
+# First-improvement descent, returns the number of moves applied
+def refine_first (
+            instance: problem_instance.ProblemInstance,
+            state: schedule_state.ScheduleState,
+            opt_target: str,
+            budget: search_budget.SearchBudget,
+        ) -> int:
+    current = state.objective(opt_target)
+    num_moves = 0
+    improved = True
+    while improved:
+        improved = False
+        for neighbour in neighbours(instance, state):
+            objective = evaluate_neighbour(state, neighbour, opt_target)
+            exhausted = budget.charge(1)
+            if improves(objective, current):
+                apply(state, neighbour)
+                current = objective
+                num_moves += 1
+                improved = True
+                log("[first] %s: %s", neighbour, current)
+            if budget.evaluations % REFRESH_PERIOD == 0:
+                current = refresh(state, opt_target)
+            if exhausted:
+                return num_moves
+            # Rescan, since the neighbourhood changed
+            if improved:
+                break
+    return num_moves
+
+# Best-improvement descent, returns the number of moves applied
+def refine_best (
+            instance: problem_instance.ProblemInstance,
+            state: schedule_state.ScheduleState,
+            opt_target: str,
+            budget: search_budget.SearchBudget,
+        ) -> int:
+    current = state.objective(opt_target)
+    num_moves = 0
+    while True:
+        best_objective = current
+        best_neighbour = None
+        exhausted = False
+        for neighbour in neighbours(instance, state):
+            objective = evaluate_neighbour(state, neighbour, opt_target)
+            if improves(objective, best_objective):
+                best_objective = objective
+                best_neighbour = neighbour
+            if budget.charge(1):
+                exhausted = True
+                break
+            if budget.evaluations % REFRESH_PERIOD == 0:
+                current = refresh(state, opt_target)
+        # Apply the best neighbour found, even on a partial scan
+        if best_neighbour is not None:
+            apply(state, best_neighbour)
+            current = best_objective
+            num_moves += 1
+            log("[best] %s: %s", best_neighbour, current)
+        if best_neighbour is None or exhausted:
+            return num_moves
@@ -0,0 +1,137 @@
+# Description:
+#   Multi-objective, optimal scheduler.
+#   A single enumeration of the canonical count matrices (see symmetric_exhaustive.py) feeds a
+#   non-dominated archive over (T_tot, E_compute, E_idle). Every candidate is scored, then
+#   candidates dominated by the archive are filtered out, so that the archive only holds the
+#   frontier. The search space is not pruned: the cost is that of symmetric_exhaustive.py.
+#   The optimum of any target is then read off the frontier, which can also be reported.
+#   Count matrices are scored in the per-npu semantics, which the instance must follow.
+
+import numpy
+from energy_sim import utils
+from energy_sim import pareto
+from energy_sim import energy_model
+from energy_sim import problem_instance
+from energy_sim import schedule
+from schedulers import exhaustive
+from schedulers import symmetric_exhaustive
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Pareto frontier of all schedules, with count matrices {LEN_D x LEN_M} as payloads
+# Returns the archive, and whether all candidates were scored
+def pareto_frontier_counts (
+            instance: problem_instance.ProblemInstance,
+            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # NPU equivalence classes, by ARCH
+    classes, position = symmetric_exhaustive.npu_classes(instance)
+
+    # Score in chunks, archiving non-dominated points
+    if budget is not None:
+        budget.start()
+    candidates = symmetric_exhaustive.canonical(instance, classes)
+    archive = pareto.ParetoArchive()
+    complete = False
+    while True:
+        # Next chunk, truncated to the evaluations left
+        chunk_size = exhaustive.BLOCK_SIZE
+        if budget is not None and budget.remaining_evaluations is not None:
+            chunk_size = min(chunk_size, max(budget.remaining_evaluations, 1))
+        C = symmetric_exhaustive.next_chunk(instance, candidates, position, chunk_size)
+        if C is None:
+            complete = True
+            break
+
+        # Evaluate chunk at once, then archive
+        T_tot, E_comp, E_idle = energy_model.evaluate_counts_batch(instance, C)
+        archive.update(numpy.stack([T_tot, E_comp, E_idle], axis=1), C)
+
+        # Stop on budget
+        if budget is not None and budget.charge(len(C)):
+            break
+
+    # Debug
+    log("archive: %s, complete: %s", archive, complete)
+    return archive, complete
+
+# Expand the count matrices of an archive into assignment arrays {LEN_W}, sorted by T_tot
+def expand_archive (
+            instance: problem_instance.ProblemInstance,
+            archive: pareto.ParetoArchive,
+        ) -> pareto.ParetoArchive:
+    schedules = numpy.stack([schedule.empty_schedule(instance.LEN_W) for _ in range(len(archive))])
+    for index, C in enumerate(archive.payloads):
+        symmetric_exhaustive.expand(instance, C, schedules[index])
+    archive.payloads = schedules
+    archive.sort()
+    return archive
+
+# Pareto frontier of all schedules, with assignment arrays {LEN_W} as payloads, sorted by T_tot
+def pareto_frontier (
+            instance: problem_instance.ProblemInstance,
+            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+        ) -> pareto.ParetoArchive:
+    archive, _ = pareto_frontier_counts(instance, budget)
+    return expand_archive(instance, archive)
+
+def thread_allocation_P (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+                            frontier = None,    # Optional pareto.ParetoArchive, updated with the frontier found
+                        ):
+    thread_allocation_P_multi(
+            instance=instance,
+            S_list=[S],
+            opt_targets=[opt_target],
+            budgets=None if budget is None else [budget],
+            frontier=frontier,
+        )
+
+# Single frontier for several targets, committing the best schedule of opt_targets[i] on S_list[i]
+def thread_allocation_P_multi (
+                            instance: problem_instance.ProblemInstance,
+                            S_list: list,       # Assignment arrays, one per target
+                            opt_targets: list,  # Optimization targets
+                            budgets = None,     # Optional search_budget.SearchBudget per target, for anytime search
+                            frontier = None,    # Optional pareto.ParetoArchive, updated with the frontier found
+                        ):
+
+    # Frontier, in count matrices
+    # NOTE: the first budget drives the search
+    budget = None if budgets is None else budgets[0]
+    archive, complete = pareto_frontier_counts(instance, budget)
+
+    for target_index, opt_target in enumerate(opt_targets):
+        best = archive.argmin_by(opt_target)
+        log("frontier size: %s, %s best: %s", len(archive), opt_target, archive.points[best])
+
+        # Lower bound: the optimum if all candidates were scored, else the global bound
+        if budget is not None:
+            T_tot, E_comp, E_idle = archive.points[best].tolist()
+            optimum = energy_model.objective_by(
+                    opt_target=opt_target,
+                    T_tot=T_tot,
+                    E_comp=E_comp,
+                    E_idle=E_idle,
+                )
+            budgets[target_index].follow(budget)
+            if complete:
+                budgets[target_index].close(optimum, optimum)
+            else:
+                budgets[target_index].close(optimum, energy_model.lower_bound(instance, opt_target))
+
+        # Commit best schedule on S_list
+        symmetric_exhaustive.expand(instance, archive.payloads[best], S_list[target_index])
+
+    # Report the frontier, in assignment arrays
+    if frontier is not None:
+        archive = expand_archive(instance, archive)
+        frontier.update(archive.points, archive.payloads)
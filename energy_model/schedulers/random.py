@@ -3,16 +3,17 @@
 
 import random
 
+from energy_sim import problem_instance
+
 def thread_allocation_R (
-                            hw_config_df,
-                            workload_df, # unused
+                            instance: problem_instance.ProblemInstance,
                             S
                         ):
-    LEN_D = len(hw_config_df)
+    LEN_D = instance.LEN_D
     # For each row/thread
     for thread_index in range(0,len(S)):
         random_npu = random.randint(0, LEN_D-1)
-        S[thread_index][random_npu] = 1
+        S[thread_index] = random_npu
 
 
 
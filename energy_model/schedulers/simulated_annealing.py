@@ -0,0 +1,368 @@
+# Description:
+#   Simulated-annealing scheduler, with a wall-clock budget.
+#   Starts from the Greedy schedule, then proposes random moves (one thread to another NPU) and
+#   swaps (the NPUs of two threads), accepted by the Metropolis criterion:
+#       accept if delta <= 0, else with probability exp(-delta / temperature)
+#   The temperature decays with the fraction of the budget elapsed, from T_START to T_END
+#   (relative to the starting objective), along a geometric or linear cooling schedule.
+#   The budget is TIME_LIMIT_S, or the search budget's wall-clock and evaluation limits if set.
+#   The schedule is kept on a schedule_state.ScheduleState. Each proposal changes two NPUs only,
+#   hence its delta costs O(1) on top of the three largest NPU finish times, re-scanned in
+#   O(LEN_D) on acceptance. Proposals are scored one at a time while most are accepted, and in
+#   vectorized blocks once acceptances get rare: a block is scored against the current schedule,
+#   then the first accepted proposal is applied and the rest discarded.
+#   The best schedule seen is committed.
+#   Proposals are scored in the per-npu semantics, which the instance must follow.
+
+import math
+import time
+import random
+import numpy
+from energy_sim import utils
+from energy_sim import energy_model
+from energy_sim import problem_instance
+from energy_sim import schedule_state
+from schedulers import greedy
+
+# Tracing
+log = utils.get_log(__name__)
+
+# Supported cooling schedules, temperature at elapsed fraction (f) of the budget
+#   geometric : T_START * (T_END / T_START) ** f
+#   linear    : T_START + (T_END - T_START) * f
+COOLING_SCHEDULES = [
+        "geometric",
+        "linear",
+    ]
+
+# Defaults
+TIME_LIMIT_S = 0.5  # Wall-clock budget (s)
+COOLING = "geometric"
+T_START = 1e-2      # Initial temperature, relative to the starting objective
+T_END = 1e-5        # Final temperature, relative to the starting objective
+SWAP_PROBABILITY = 0.5 # Share of swaps among proposals
+
+# Proposals scored between budget checks, one at a time, capped at the evaluations left
+SCALAR_ROUND = 1 << 8
+# Proposals per vectorized block, about the expected number of proposals per acceptance
+MIN_BLOCK_SIZE = 1 << 6
+MAX_BLOCK_SIZE = 1 << 14
+# Smoothing of the acceptance rate estimate, per proposal
+RATE_SMOOTHING = 1e-3
+# Accepted proposals between exact recomputations of the accumulators, to flush round-off
+REFRESH_PERIOD = 1 << 10
+
+# Temperature at elapsed fraction of the budget
+def temperature (
+            cooling: str,
+            t_start: float,
+            t_end: float,
+            fraction: float,
+        ) -> float:
+    if cooling == "geometric":
+        return t_start * (t_end / t_start) ** fraction
+    elif cooling == "linear":
+        return t_start + (t_end - t_start) * fraction
+    else:
+        utils.print_error("Unsupported cooling schedule " + cooling)
+        exit(1)
+
+# Annealing state: a schedule_state.ScheduleState, with the objective of the current schedule
+#   top : the three NPUs with the largest T, padded with -1
+# NOTE: a proposal changes two NPUs, hence T_tot after it needs the largest T of the others
+class Annealer(schedule_state.ScheduleState):
+    __slots__ = (
+            "opt_target",
+            "model_ids",
+            "top",
+            "current",
+        )
+
+    def __init__ (
+                self,
+                instance: problem_instance.ProblemInstance,
+                opt_target: str,
+                S,
+            ):
+        super().__init__(instance)
+        self.opt_target = opt_target
+        self.model_ids = instance.model_ids.tolist()
+        for thread_index, d in enumerate(S):
+            self.assign(thread_index, int(d))
+        self.update_top()
+        self.current = self.objective(opt_target)
+
+    # Recompute accumulators and objective from X
+    def refresh ( self ):
+        super().refresh()
+        self.update_top()
+        self.current = self.objective(self.opt_target)
+
+    # Three largest T[d], ties in NPU order, in O(LEN_D)
+    def update_top ( self ):
+        T = self.T
+        first = second = third = -1
+        for d in range(self.LEN_D):
+            T_d = T[d]
+            if first == -1 or T_d > T[first]:
+                first, second, third = d, first, second
+            elif second == -1 or T_d > T[second]:
+                second, third = d, second
+            elif third == -1 or T_d > T[third]:
+                third = d
+        self.top = [first, second, third]
+
+    # Largest T of the NPUs other than p and q
+    def T_others ( self, p: int, q: int ) -> float:
+        for d in self.top:
+            if d == -1:
+                return 0.
+            if d != p and d != q:
+                return self.T[d]
+        return 0.
+
+    # Per-NPU state of p and q after a proposal: (N_p, t_p, e_p, N_q, t_q, e_q)
+    def sums ( self, a: int, b: int, is_swap: bool, p: int, q: int ):
+        t = self.t
+        e = self.e
+        if is_swap:
+            return (self.N[p], self.t_sum[p] - t[a][p] + t[b][p], self.e_sum[p] - e[a][p] + e[b][p],
+                    self.N[q], self.t_sum[q] + t[a][q] - t[b][q], self.e_sum[q] + e[a][q] - e[b][q])
+        N_p = self.N[p] - 1
+        if N_p == 0:
+            # Empty NPUs are exactly zero
+            t_p = e_p = 0.
+        else:
+            t_p = self.t_sum[p] - t[a][p]
+            e_p = self.e_sum[p] - e[a][p]
+        return (N_p, t_p, e_p,
+                self.N[q] + 1, self.t_sum[q] + t[a][q], self.e_sum[q] + e[a][q])
+
+    # Objective delta of a proposal
+    def delta ( self, p: int, q: int, N_p, t_p, e_p, N_q, t_q, e_q ) -> float:
+        T_p = t_p * self.k[p][N_p]
+        T_q = t_q * self.k[q][N_q]
+        T_tot = max(T_p, T_q, self.T_others(p, q))
+        if self.opt_target == "T_tot":
+            return T_tot - self.T[self.top[0]]
+        dE_comp = (e_p * self.k[p][N_p]) + (e_q * self.k[q][N_q]) - self.E[p] - self.E[q]
+        if self.opt_target == "E_compute":
+            return dE_comp
+        # E_idle = T_tot * sum(p_idle) - sum(p_idle * T)
+        dE_idle = (T_tot - self.T[self.top[0]]) * self.p_idle_sum \
+                - self.p_idle[p] * (T_p - self.T[p]) - self.p_idle[q] * (T_q - self.T[q])
+        if self.opt_target == "E_idle":
+            return dE_idle
+        return dE_comp + dE_idle
+
+    # Apply an accepted proposal, moving thread a to q, and thread b to p if a swap
+    def apply ( self, a: int, b: int, is_swap: bool, p: int, q: int, delta: float ):
+        self.move(a, q)
+        if is_swap:
+            self.move(b, p)
+        self.update_top()
+        self.current += delta
+
+def thread_allocation_SA (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            time_limit_s: float = TIME_LIMIT_S, # Wall-clock budget (s), unless set by budget, None for unlimited
+                            cooling: str = COOLING, # Cooling schedule, in COOLING_SCHEDULES
+                            t_start: float = T_START, # Initial temperature, relative to the starting objective
+                            t_end: float = T_END, # Final temperature, relative to the starting objective
+                            seed = None,        # Seed of the proposals, None for fresh entropy
+                            budget = None,      # Optional search_budget.SearchBudget, bounds and records proposals
+                        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_W = instance.LEN_W
+    if cooling not in COOLING_SCHEDULES:
+        utils.print_error("Unsupported cooling schedule " + cooling)
+        exit(1)
+    if budget is not None:
+        budget.start()
+    time_start = time.perf_counter_ns()
+    # Wall-clock budget, the search budget's if set
+    time_limit_ns = None if time_limit_s is None else int(time_limit_s * 1e9)
+    if budget is not None and budget.time_limit_ns is not None:
+        time_limit_ns = budget.time_limit_ns
+    # Evaluation budget, also bounding the cooling horizon if set
+    max_evaluations = None if budget is None else budget.max_evaluations
+    # NOTE: without a wall-clock budget, cooling only follows evaluations, hence runs are
+    #       reproducible from the seed
+    if time_limit_ns is None and not max_evaluations:
+        utils.print_error("Simulated annealing needs a wall-clock or evaluation budget")
+        exit(1)
+    # Vectorized and scalar generators, from the same seed
+    rng = numpy.random.default_rng(seed)
+    scalar_rng = random.Random(int(rng.integers(2**63)))
+
+    # Start from Greedy
+    greedy.thread_allocation_G(instance, S, opt_target)
+    if LEN_D < 2 or LEN_W < 1:
+        return
+
+    # Annealing state
+    state = Annealer(instance, opt_target, S)
+    best = state.current
+    best_X = list(state.X)
+    # Temperatures are relative to the starting objective
+    scale = abs(state.current) if state.current != 0 else 1.
+
+    # Model constants, for vectorized blocks
+    t = instance.runtime
+    e = instance.energy
+    k = instance.k
+    p_idle = instance.power_idle
+    model_ids = instance.model_ids
+
+    # Debug
+    log("LEN_D: %s, LEN_W: %s, start: %s, cooling: %s", LEN_D, LEN_W, state.current, cooling)
+
+    num_proposals = 0
+    num_accepted = 0
+    # Acceptance rate estimate
+    rate = 1.
+    while True:
+        # Stop on budget
+        fraction = 0.
+        if time_limit_ns is not None:
+            elapsed_ns = time.perf_counter_ns() - time_start
+            if elapsed_ns >= time_limit_ns:
+                break
+            fraction = elapsed_ns / time_limit_ns
+        if budget is not None and budget.exhausted:
+            break
+        # Evaluations left, None for unlimited
+        remaining = None if budget is None else budget.remaining_evaluations
+        if max_evaluations:
+            fraction = max(fraction, budget.evaluations / max_evaluations)
+        temp = scale * temperature(cooling, t_start, t_end, fraction)
+
+        # Expected proposals per acceptance
+        block_size = int(1. / max(rate, 1. / MAX_BLOCK_SIZE))
+
+        ##################################
+        # Frequent acceptance: scalar    #
+        ##################################
+        if block_size < MIN_BLOCK_SIZE:
+            num_round = 0
+            round_size = SCALAR_ROUND if remaining is None else min(SCALAR_ROUND, remaining)
+            for _ in range(round_size):
+                # Draw a move of thread a to NPU q, or a swap of threads a and b
+                a = scalar_rng.randrange(LEN_W)
+                p = state.X[a]
+                is_swap = scalar_rng.random() < SWAP_PROBABILITY
+                if is_swap:
+                    b = scalar_rng.randrange(LEN_W)
+                    q = state.X[b]
+                    # Swaps within an NPU, or of threads of the same model, are no-ops
+                    if p == q or state.model_ids[a] == state.model_ids[b]:
+                        continue
+                else:
+                    b = -1
+                    q = (p + scalar_rng.randrange(1, LEN_D)) % LEN_D
+                num_round += 1
+                delta = state.delta(p, q, *state.sums(a, b, is_swap, p, q))
+                accepted = delta <= 0. or scalar_rng.random() < math.exp(-delta / temp)
+                rate += RATE_SMOOTHING * (accepted - rate)
+                if accepted:
+                    state.apply(a, b, is_swap, p, q, delta)
+                    num_accepted += 1
+                    if num_accepted % REFRESH_PERIOD == 0:
+                        state.refresh()
+                    if state.current < best:
+                        best = state.current
+                        best_X[:] = state.X
+            num_proposals += num_round
+            if budget is not None:
+                budget.charge(num_round)
+            continue
+
+        ##################################
+        # Rare acceptance: vectorized    #
+        ##################################
+        block_size = min(block_size, MAX_BLOCK_SIZE)
+        if remaining is not None:
+            block_size = min(block_size, remaining)
+        X = numpy.array(state.X)
+        N = numpy.array(state.N)
+        t_sum = numpy.array(state.t_sum)
+        e_sum = numpy.array(state.e_sum)
+        T = numpy.array(state.T)
+        E = numpy.array(state.E)
+        # Moves: thread a to NPU q, swaps: threads a and b, from NPU p = X[a]
+        a = rng.integers(LEN_W, size=block_size)
+        b = rng.integers(LEN_W, size=block_size)
+        is_swap = rng.random(block_size) < SWAP_PROBABILITY
+        p = X[a]
+        q = numpy.where(is_swap, X[b], (p + rng.integers(1, LEN_D, size=block_size)) % LEN_D)
+        valid = (p != q) & ~(is_swap & (model_ids[a] == model_ids[b]))
+        # New per-NPU sums of p and q
+        t_p = t_sum[p] - t[a, p] + numpy.where(is_swap, t[b, p], 0.)
+        e_p = e_sum[p] - e[a, p] + numpy.where(is_swap, e[b, p], 0.)
+        t_q = t_sum[q] + t[a, q] - numpy.where(is_swap, t[b, q], 0.)
+        e_q = e_sum[q] + e[a, q] - numpy.where(is_swap, e[b, q], 0.)
+        N_p = N[p] - ~is_swap
+        N_q = N[q] + ~is_swap
+        t_p[N_p == 0] = 0.
+        e_p[N_p == 0] = 0.
+        T_p = t_p * k[p, N_p]
+        E_p = e_p * k[p, N_p]
+        T_q = t_q * k[q, N_q]
+        # Largest T of the NPUs other than p and q, from the top-3
+        top = state.top
+        top_T = [0. if d == -1 else state.T[d] for d in top]
+        T_others = numpy.where((p != top[0]) & (q != top[0]), top_T[0],
+                   numpy.where((p != top[1]) & (q != top[1]), top_T[1], top_T[2]))
+        T_tot = numpy.maximum(numpy.maximum(T_p, T_q), T_others)
+        # Objective deltas
+        dT_tot = T_tot - top_T[0]
+        if opt_target == "T_tot":
+            delta = dT_tot
+        else:
+            E_q = e_q * k[q, N_q]
+            dE_comp = E_p + E_q - E[p] - E[q]
+            dE_idle = dT_tot * state.p_idle_sum - p_idle[p] * (T_p - T[p]) - p_idle[q] * (T_q - T[q])
+            delta = energy_model.objective_by(
+                    opt_target=opt_target,
+                    T_tot=dT_tot,
+                    E_comp=dE_comp,
+                    E_idle=dE_idle,
+                )
+        # Metropolis test, then the first accepted proposal
+        with numpy.errstate(over="ignore"):
+            accept = valid & ((delta <= 0.) | (rng.random(block_size) < numpy.exp(-delta / temp)))
+        accepted = numpy.flatnonzero(accept)
+        num_scored = block_size if len(accepted) == 0 else int(accepted[0]) + 1
+        num_proposals += num_scored
+        if budget is not None:
+            budget.charge(num_scored)
+        rate = 1. / num_scored if len(accepted) > 0 else rate / 2
+        if len(accepted) == 0:
+            continue
+
+        # Apply, re-scoring the proposal exactly as the scalar path
+        j = int(accepted[0])
+        a_j, b_j, swap_j, p_j, q_j = int(a[j]), int(b[j]), bool(is_swap[j]), int(p[j]), int(q[j])
+        delta_j = state.delta(p_j, q_j, *state.sums(a_j, b_j, swap_j, p_j, q_j))
+        state.apply(a_j, b_j, swap_j, p_j, q_j, delta_j)
+        num_accepted += 1
+        if num_accepted % REFRESH_PERIOD == 0:
+            state.refresh()
+        if state.current < best:
+            best = state.current
+            best_X[:] = state.X
+
+    # Debug
+    elapsed_s = (time.perf_counter_ns() - time_start) / 1e9
+    log("proposals: %s (%.0f/s), accepted: %s, best: %s",
+            num_proposals, num_proposals / max(elapsed_s, 1e-9), num_accepted, best)
+
+    # Commit best schedule on S
+    S[:] = best_X
@@ -0,0 +1,198 @@
+# Description:
+#   Symmetry-reduced exhaustive, optimal scheduler.
+#   Threads of the same model are interchangeable, and so are NPUs of the same ARCH.
+#   Instead of assigning thread indices one by one, enumerate only canonical count matrices:
+#       C[d,m] : number of threads of model (m) allocated to NPU (d)
+#   with per-model counts distributed over ARCH classes first, then over the NPUs of each class,
+#   whose rows are kept in non-increasing lexicographic order.
+#   The winner is expanded back to a concrete assignment array.
+#   Count matrices are scored in the per-npu semantics, which the instance must follow.
+#   With a search_budget.SearchBudget, the search stops once the budget is exhausted.
+
+import itertools
+import numpy
+from energy_sim import utils
+from energy_sim import energy_model
+from energy_sim import thread_allocation
+from energy_sim import problem_instance
+from schedulers import exhaustive
+
+# Tracing
+log = utils.get_log(__name__)
+
+# All ways of splitting (total) into (parts) non-negative integers
+def compositions ( total: int, parts: int ):
+    if parts == 1:
+        yield (total,)
+        return
+    for first in range(total, -1, -1):
+        for rest in compositions(total - first, parts - 1):
+            yield (first,) + rest
+
+# All distributions of the per-model counts (total) over (num_npus) interchangeable NPUs,
+# as tuples of per-NPU count rows, in non-increasing lexicographic order
+def distributions (
+            total: tuple,       # Per-model counts
+            num_npus: int,      # Number of NPUs in the class
+            upper: tuple = None,# Upper bound on the first row
+        ):
+    if num_npus == 1:
+        if upper is None or total <= upper:
+            yield (total,)
+        return
+    for row in itertools.product(*[range(count, -1, -1) for count in total]):
+        if upper is not None and row > upper:
+            continue
+        rest = tuple(count - taken for count, taken in zip(total, row))
+        for tail in distributions(rest, num_npus - 1, row):
+            yield (row,) + tail
+
+# Expand a count matrix C {LEN_D x LEN_M} to an assignment array, threads in order
+def expand (
+            instance: problem_instance.ProblemInstance,
+            C,
+            S,
+        ):
+    pending = [[] for _ in range(len(instance.models))]
+    for thread_index, m in enumerate(instance.model_of_thread.tolist()):
+        pending[m].append(thread_index)
+    for d, row in enumerate(C.tolist()):
+        for m, count in enumerate(row):
+            for _ in range(count):
+                S[pending[m].pop(0)] = d
+
+# NPU equivalence classes, by ARCH, and the row of C of each NPU when rows are generated class by class
+def npu_classes ( instance: problem_instance.ProblemInstance ):
+    _, arch_of_npu = numpy.unique(instance.arch_ids, return_inverse=True)
+    classes = [numpy.flatnonzero(arch_of_npu == g).tolist() for g in range(arch_of_npu.max() + 1)]
+    position = numpy.argsort(numpy.concatenate(classes), kind="stable")
+    return classes, position
+
+# Canonical count matrices, as flat rows grouped by class
+def canonical (
+            instance: problem_instance.ProblemInstance,
+            classes: list,      # NPU classes, from npu_classes
+        ):
+    LEN_M = len(instance.models)
+    LEN_G = len(classes)
+    # Memoized per-class distributions
+    memo = {}
+    # Split each model's count over classes
+    for split in itertools.product(*[compositions(count, LEN_G) for count in instance.model_counts.tolist()]):
+        per_class = []
+        for g in range(LEN_G):
+            key = (tuple(split[m][g] for m in range(LEN_M)), len(classes[g]))
+            if key not in memo:
+                memo[key] = list(distributions(*key))
+            per_class.append(memo[key])
+        for rows in itertools.product(*per_class):
+            yield [count for class_rows in rows for row in class_rows for count in row]
+
+# Next chunk of canonical count matrices {size x LEN_D x LEN_M}, None when done
+def next_chunk (
+            instance: problem_instance.ProblemInstance,
+            candidates,         # Generator, from canonical
+            position,           # Row positions, from npu_classes
+            size: int,          # Maximum chunk size
+        ):
+    chunk = list(itertools.islice(candidates, size))
+    if len(chunk) == 0:
+        return None
+    return numpy.array(chunk, dtype=numpy.intp).reshape(len(chunk), instance.LEN_D, len(instance.models))[:,position]
+
+def thread_allocation_SE (
+                            instance: problem_instance.ProblemInstance,
+                            S,
+                            opt_target: str,    # Optimization target
+                            budget = None,      # Optional search_budget.SearchBudget, for anytime search
+                        ):
+    thread_allocation_SE_multi(
+            instance=instance,
+            S_list=[S],
+            opt_targets=[opt_target],
+            budgets=None if budget is None else [budget],
+        )
+
+# Single search for several targets, committing the best schedule of opt_targets[i] on S_list[i]
+def thread_allocation_SE_multi (
+                            instance: problem_instance.ProblemInstance,
+                            S_list: list,       # Assignment arrays, one per target
+                            opt_targets: list,  # Optimization targets
+                            budgets = None,     # Optional search_budget.SearchBudget per target, for anytime search
+                        ):
+
+    # Per-npu semantics only
+    assert(instance.semantics == "per-npu")
+
+    # Pre-compute lengths
+    LEN_D = instance.LEN_D
+    LEN_M = len(instance.models)
+    LEN_T = len(opt_targets)
+
+    # NPU equivalence classes, by ARCH
+    classes, position = npu_classes(instance)
+
+    # Debug
+    log("LEN_D: %s, LEN_M: %s, LEN_G: %s", LEN_D, LEN_M, len(classes))
+    log("model_counts: %s, classes: %s", instance.model_counts, classes)
+    log("opt_targets: %s", opt_targets)
+
+    # Evaluate in chunks, keeping only the incumbents
+    # NOTE: the first budget drives the search
+    budget = None if budgets is None else budgets[0]
+    if budget is not None:
+        budget.start()
+    candidates = canonical(instance, classes)
+    running_min = [float("inf")] * LEN_T
+    best_C = [None] * LEN_T
+    num_candidates = 0
+    complete = False
+    while True:
+        # Next chunk {BLOCK_SIZE x LEN_D x LEN_M}, truncated to the evaluations left
+        chunk_size = exhaustive.BLOCK_SIZE
+        if budget is not None and budget.remaining_evaluations is not None:
+            chunk_size = min(chunk_size, max(budget.remaining_evaluations, 1))
+        C = next_chunk(instance, candidates, position, chunk_size)
+        if C is None:
+            complete = True
+            break
+        num_candidates += len(C)
+
+        # Evaluate chunk at once, on all objectives
+        T_tot, E_comp, E_idle = energy_model.evaluate_counts_batch(instance, C)
+
+        # Minimize by each target
+        for target_index, opt_target in enumerate(opt_targets):
+            chunk_min, chunk_argmin = thread_allocation.argmin_by(
+                    opt_target=opt_target,
+                    T_tot=T_tot,
+                    E_comp=E_comp,
+                    E_idle=E_idle,
+                )
+
+            # New incumbent
+            if chunk_min < running_min[target_index]:
+                running_min[target_index] = chunk_min
+                best_C[target_index] = C[chunk_argmin].copy()
+
+        # Stop on budget
+        if budget is not None and budget.charge(len(C)):
+            break
+
+    # Debug
+    log("num_candidates: %s (of %s), running_min: %s", num_candidates, LEN_D ** instance.LEN_W, running_min)
+
+    # Lower bound: the incumbent if all candidates were scored, else the global bound
+    if budget is not None:
+        complete = complete or next(candidates, None) is None
+        for target_index, opt_target in enumerate(opt_targets):
+            budgets[target_index].follow(budget)
+            if complete:
+                budgets[target_index].close(running_min[target_index], running_min[target_index])
+            else:
+                budgets[target_index].close(running_min[target_index], energy_model.lower_bound(instance, opt_target))
+
+    # Commit best schedules on S_list
+    for S, C in zip(S_list, best_C):
+        assert(C is not None)
+        expand(instance, C, S)
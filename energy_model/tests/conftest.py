@@ -0,0 +1,38 @@
+# Description:
+#   Shared fixtures: pre-processed measures and problem instances built from them.
+
+import os
+import sys
+import pandas
+import pytest
+
+# Run from anywhere, with energy_model/ as the import root (as launch.py does)
+ENERGY_MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENERGY_MODEL_DIR)
+
+from energy_sim import problem_instance
+
+# Input directories
+PRE_PROCESSED_DIR = os.path.join(ENERGY_MODEL_DIR, "..", "measures", "pre-processed")
+NPUS_DIR = os.path.join(ENERGY_MODEL_DIR, "experiment", "NPUs")
+
+@pytest.fixture(scope="session")
+def runtime_df ():
+    return pandas.read_csv(os.path.join(PRE_PROCESSED_DIR, "runtimes.csv"), sep=";", index_col=None)
+
+@pytest.fixture(scope="session")
+def avg_power_df ():
+    return pandas.read_csv(os.path.join(PRE_PROCESSED_DIR, "avg_power.csv"), sep=";", index_col=None)
+
+# Factory: make_instance(hw_config, models), with hw_config the basename of an experiment/NPUs file
+@pytest.fixture(scope="session")
+def make_instance ( runtime_df, avg_power_df ):
+    def make ( hw_config: str, models: list, **kwargs ) -> problem_instance.ProblemInstance:
+        return problem_instance.ProblemInstance(
+                hw_config_df=pandas.read_csv(os.path.join(NPUS_DIR, hw_config + ".csv")),
+                workload_df=pandas.DataFrame({"Model": models}),
+                runtime_df=runtime_df,
+                avg_power_df=avg_power_df,
+                **kwargs,
+            )
+    return make
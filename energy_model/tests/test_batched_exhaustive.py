@@ -0,0 +1,56 @@
+import itertools
+import numpy
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from schedulers import batched_exhaustive
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201", "VGG-16", "MobileNet", "ResNet-50"]
+
+# With carry, each batch is optimal given the schedule of earlier batches
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+@pytest.mark.parametrize("hw_config", ["1x512_3x4096", "2x512_1x1024_1x2304_1x4096"])
+def test_carry_batches_optimal_on_prefix ( make_instance, hw_config, opt_target ):
+    instance = make_instance(hw_config, MODELS, semantics="per-npu")
+    batch_size = 3
+    S = schedule.empty_schedule(instance.LEN_W)
+    batched_exhaustive.thread_allocation_BE(instance, S, batch_size, opt_target, carry=True)
+    for index_low in range(0, instance.LEN_W, batch_size):
+        index_high = min(index_low + batch_size, instance.LEN_W)
+        prefix_instance = instance.take(slice(0, index_high))
+        candidates = numpy.array([
+                list(S[:index_low]) + list(batch)
+                for batch in itertools.product(range(instance.LEN_D), repeat=index_high - index_low)
+            ])
+        objectives = energy_model.objective_by(opt_target, *energy_model.evaluate_batch(prefix_instance, candidates))
+        assert energy_model.evaluate(prefix_instance, S[:index_high]).objective(opt_target) == pytest.approx(objectives.min())
+
+# A single batch is the exhaustive search, with or without carry
+@pytest.mark.parametrize("carry", [False, True])
+def test_single_batch_is_exhaustive ( make_instance, carry ):
+    instance = make_instance("1x512_3x4096", MODELS[:5], semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    batched_exhaustive.thread_allocation_BE(instance, S, instance.LEN_W, "T_tot", carry=carry)
+    X = numpy.array(list(itertools.product(range(instance.LEN_D), repeat=instance.LEN_W)))
+    T_tot, _, _ = energy_model.evaluate_batch(instance, X)
+    assert energy_model.evaluate(instance, S).T_tot == pytest.approx(T_tot.min())
+
+# Carrying the load avoids piling every batch on the same NPUs
+def test_carry_spreads_repeated_batches ( make_instance ):
+    instance = make_instance("4x1024", ["VGG-16"] * 8, semantics="per-npu")
+    T_tot = {}
+    for carry in [False, True]:
+        S = schedule.empty_schedule(instance.LEN_W)
+        batched_exhaustive.thread_allocation_BE(instance, S, 2, "T_tot", carry=carry)
+        T_tot[carry] = energy_model.evaluate(instance, S).T_tot
+        if carry:
+            assert numpy.bincount(S, minlength=instance.LEN_D).tolist() == [2] * 4
+    assert T_tot[True] < T_tot[False]
+
+# The carried load is per-npu, baseline instances are refused with carry only
+def test_carry_baseline_refused ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    S = schedule.empty_schedule(instance.LEN_W)
+    batched_exhaustive.thread_allocation_BE(instance, S, 3, "E_tot")
+    with pytest.raises(AssertionError):
+        batched_exhaustive.thread_allocation_BE(instance, S, 3, "E_tot", carry=True)
@@ -0,0 +1,54 @@
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import search_budget
+from schedulers import branch_and_bound
+from schedulers import dynamic_programming
+from schedulers import exhaustive
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Leaf blocks are truncated to the evaluations left
+@pytest.mark.parametrize("max_evaluations", [1, 1000, 5000])
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_tot"])
+def test_evaluation_budget ( make_instance, max_evaluations, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 3, semantics="per-npu")
+    budget = search_budget.SearchBudget(max_evaluations=max_evaluations)
+    S = schedule.empty_schedule(instance.LEN_W)
+    branch_and_bound.thread_allocation_BB(instance, S, opt_target, budget=budget)
+    assert budget.evaluations == max_evaluations
+    assert budget.gap >= 0.
+    assert (S != schedule.UNALLOCATED).all()
+
+# Within budget, B&B is exact
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_optimum ( make_instance, opt_target ):
+    instance = make_instance("1x512_3x4096", MODELS * 2, semantics="per-npu")
+    budget = search_budget.SearchBudget()
+    S = schedule.empty_schedule(instance.LEN_W)
+    branch_and_bound.thread_allocation_BB(instance, S, opt_target, budget=budget)
+    S_dp = schedule.empty_schedule(instance.LEN_W)
+    dynamic_programming.thread_allocation_DP(instance, S_dp, opt_target)
+    assert budget.gap == 0.
+    assert energy_model.evaluate(instance, S).objective(opt_target) == pytest.approx(
+            energy_model.evaluate(instance, S_dp).objective(opt_target), abs=1e-9)
+
+# B&B returns the Exhaustive optimum, on the reported 7-thread case
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_exhaustive_optimum ( make_instance, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:3], semantics="per-npu")
+    budget = search_budget.SearchBudget()
+    S = schedule.empty_schedule(instance.LEN_W)
+    branch_and_bound.thread_allocation_BB(instance, S, opt_target, budget=budget)
+    S_e = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S_e, opt_target)
+    assert budget.gap == 0.
+    assert energy_model.evaluate(instance, S).objective(opt_target) == pytest.approx(
+            energy_model.evaluate(instance, S_e).objective(opt_target), rel=1e-9)
+
+# Nodes are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(AssertionError):
+        branch_and_bound.thread_allocation_BB(instance, S, "E_tot")
@@ -0,0 +1,61 @@
+import time
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import search_budget
+from schedulers import dynamic_programming
+from schedulers import exhaustive
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Out of budget, DP stops within a stage and reports a gap on a legal schedule
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_time_budget ( make_instance, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 8, semantics="per-npu")
+    budget = search_budget.SearchBudget(time_limit_s=0.1)
+    S = schedule.empty_schedule(instance.LEN_W)
+    time_start = time.perf_counter()
+    dynamic_programming.thread_allocation_DP(instance, S, opt_target, budget=budget)
+    assert time.perf_counter() - time_start < 1.
+    assert (S != schedule.UNALLOCATED).all()
+    assert budget.gap >= 0.
+
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_evaluation_budget ( make_instance, opt_target ):
+    instance = make_instance("1x512_3x4096", MODELS * 3, semantics="per-npu")
+    budget = search_budget.SearchBudget(max_evaluations=1000)
+    S = schedule.empty_schedule(instance.LEN_W)
+    dynamic_programming.thread_allocation_DP(instance, S, opt_target, budget=budget)
+    assert budget.evaluations <= 1000
+    assert (S != schedule.UNALLOCATED).all()
+
+# Within budget, DP is exact
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_unlimited_budget ( make_instance, opt_target ):
+    instance = make_instance("1x512_3x4096", MODELS * 2, semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    dynamic_programming.thread_allocation_DP(instance, S, opt_target)
+    budget = search_budget.SearchBudget()
+    S_budget = schedule.empty_schedule(instance.LEN_W)
+    dynamic_programming.thread_allocation_DP(instance, S_budget, opt_target, budget=budget)
+    assert budget.gap == 0.
+    assert energy_model.evaluate(instance, S_budget).objective(opt_target) == pytest.approx(
+            energy_model.evaluate(instance, S).objective(opt_target))
+
+# DP returns the Exhaustive optimum, on the reported 7-thread case
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_exhaustive_optimum ( make_instance, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:3], semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    dynamic_programming.thread_allocation_DP(instance, S, opt_target)
+    S_e = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S_e, opt_target)
+    assert energy_model.evaluate(instance, S).objective(opt_target) == pytest.approx(
+            energy_model.evaluate(instance, S_e).objective(opt_target), rel=1e-9)
+
+# States are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(AssertionError):
+        dynamic_programming.thread_allocation_DP(instance, S, "E_tot")
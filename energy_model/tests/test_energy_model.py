@@ -0,0 +1,195 @@
+import numpy
+import pandas
+import pytest
+from energy_sim import utils
+from energy_sim import schedule
+from energy_sim import energy_model
+
+HW_CONFIGS = [
+        "4x512",
+        "1x512_3x4096",
+        "2x512_1x1024_1x2304_1x4096",
+    ]
+MODELS = ["MobileNet", "VGG-16", "ResNet-50", "DenseNet-201"]
+
+# Baseline factors: k[i] for (i+1) threads, then k[0] = 0, k[1] = 1
+def baseline_k ( max_threads: int ) -> list:
+    k = [(utils.b0 + utils.b1 * (i+1)) / (i+1) for i in range(max_threads + 1)]
+    k[0] = 0.
+    k[1] = 1.
+    return k
+
+# The original compute_energy_model loops, on an allocation matrix S[thread][d]
+def baseline_compute_energy_model ( hw_config_df, workload_df, S, runtime_df, avg_power_df ):
+    D = list(range(len(hw_config_df)))
+    A = hw_config_df["ARCH"].values
+    M = workload_df["Model"].values
+    LEN_D = len(D)
+    LEN_W = len(M)
+    k = baseline_k(LEN_W)
+    t = runtime_df
+    p = avg_power_df
+
+    # Runtime
+    T = [0. for _ in range(LEN_D)]
+    for thread_index in range(LEN_W):
+        allocated_threads = 1
+        for d in D:
+            if S[thread_index][d]:
+                T[d] += t.loc[
+                        (t["ARCH"] == A[d]) & (t["Model"] == M[thread_index])
+                    ]["Runtime (s)"].values[0] * k[allocated_threads]
+                allocated_threads += 1
+    T_tot = max(T)
+    T_idle = [T_tot - T[d] for d in D]
+
+    # Compute energy
+    E = [0. for _ in range(LEN_D)]
+    allocated_threads = 1
+    for thread_index in range(LEN_W):
+        for d in D:
+            if S[thread_index][d]:
+                runtime = t.loc[
+                        (t["ARCH"] == A[d]) & (t["Model"] == M[thread_index])
+                    ]["Runtime (s)"].values[0]
+                power = p.loc[(p["ARCH"] == A[d]) & (p["Model"] == M[thread_index])]
+                E[d] = (power["Power PL (mW)"].values[0] + power["Power PS (mW)"].values[0]) * runtime * k[allocated_threads]
+                allocated_threads += 1
+    E_comp = sum(E)
+
+    # Idle energy
+    E_idle = 0.
+    for d in D:
+        power = p.loc[(p["ARCH"] == A[d]) & (p["Model"] == "Idle")]
+        E_idle += (power["Power PS (mW)"].values[0] + power["Power PL (mW)"].values[0]) * T_idle[d]
+    return T_tot, E_comp, E_idle
+
+# The lookup-table path reproduces the original loops
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+@pytest.mark.parametrize("seed", range(4))
+def test_evaluate_baseline_matches_original_loops ( make_instance, runtime_df, avg_power_df, hw_config, seed ):
+    rng = numpy.random.default_rng(seed)
+    models = rng.choice(MODELS, size=7).tolist()
+    instance = make_instance(hw_config, models)
+    X = rng.integers(instance.LEN_D, size=instance.LEN_W).astype(schedule.SCHEDULE_DTYPE)
+
+    expected = baseline_compute_energy_model(
+            hw_config_df=pandas.DataFrame({"ARCH": instance.A}),
+            workload_df=pandas.DataFrame({"Model": models}),
+            S=schedule.to_matrix(X, instance.LEN_D),
+            runtime_df=runtime_df,
+            avg_power_df=avg_power_df,
+        )
+    evaluation = energy_model.evaluate_baseline(instance, X)
+    assert (evaluation.T_tot, evaluation.E_compute, evaluation.E_idle) == pytest.approx(expected)
+
+# T[d] and E[d] scale the per-NPU sums by k[d,N[d]]
+def test_evaluate_applies_k_per_npu ( make_instance ):
+    instance = make_instance("1x512_3x4096", ["VGG-16", "MobileNet", "ResNet-50"], semantics="per-npu")
+    X = numpy.array([0, 0, 1], dtype=schedule.SCHEDULE_DTYPE)
+    evaluation = energy_model.evaluate(instance, X)
+
+    t = instance.runtime
+    e = instance.energy
+    T = [(t[0,0] + t[1,0]) * instance.k[0,2], t[2,1], 0., 0.]
+    E = [(e[0,0] + e[1,0]) * instance.k[0,2], e[2,1], 0., 0.]
+    assert evaluation.T_d == pytest.approx(T)
+    assert evaluation.E_d == pytest.approx(E)
+    assert evaluation.T_tot == pytest.approx(max(T))
+    assert evaluation.E_compute == pytest.approx(sum(E))
+    assert evaluation.E_idle == pytest.approx(float((instance.power_idle * (max(T) - numpy.array(T))).sum()))
+
+# The documented model departs from the original loops once an NPU runs several threads
+def test_evaluate_departs_from_baseline_on_shared_npus ( make_instance ):
+    instance = make_instance("4x512", ["VGG-16", "MobileNet"], semantics="per-npu")
+    alone = numpy.array([0, 1], dtype=schedule.SCHEDULE_DTYPE)
+    shared = numpy.array([0, 0], dtype=schedule.SCHEDULE_DTYPE)
+    assert energy_model.evaluate(instance, alone).T_tot == pytest.approx(energy_model.evaluate_baseline(instance, alone).T_tot)
+    assert energy_model.evaluate(instance, shared).T_tot != pytest.approx(energy_model.evaluate_baseline(instance, shared).T_tot)
+    assert energy_model.evaluate(instance, shared).E_compute != pytest.approx(energy_model.evaluate_baseline(instance, shared).E_compute)
+
+# All evaluators agree with evaluate, in the per-npu semantics
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+def test_evaluators_agree ( make_instance, hw_config ):
+    rng = numpy.random.default_rng(0)
+    instance = make_instance(hw_config, rng.choice(MODELS, size=9).tolist(), semantics="per-npu")
+    X = rng.integers(instance.LEN_D, size=(16, instance.LEN_W))
+    T_tot, E_comp, E_idle = energy_model.evaluate_batch(instance, X)
+    for s in range(len(X)):
+        evaluation = energy_model.evaluate(instance, X[s])
+        counts = energy_model.evaluate_counts(instance, energy_model.count_matrix(instance, X[s]))
+        assert (T_tot[s], E_comp[s], E_idle[s]) == pytest.approx((evaluation.T_tot, evaluation.E_compute, evaluation.E_idle))
+        assert (counts.T_tot, counts.E_compute, counts.E_idle) == pytest.approx((evaluation.T_tot, evaluation.E_compute, evaluation.E_idle))
+
+# Results of the original code (baseline commit), pinned on the lookup-table path
+PINNED_BASELINE = [
+        (
+            "1x512_3x4096",
+            ["VGG-16", "MobileNet", "ResNet-50", "VGG-16", "DenseNet-201"],
+            [0, 0, 1, 0, 2],
+            (8.15833044052124, 78699.68518411343, 59064.1977951904),
+        ),
+        (
+            "2x512_1x1024_1x2304_1x4096",
+            ["MobileNet", "ResNet-50", "MobileNet", "VGG-16", "ResNet-50", "DenseNet-201"],
+            [1, 1, 4, 2, 1, 3],
+            (52.96344447135925, 141238.14429962428, 697881.2368696512),
+        ),
+    ]
+
+# Instances default to the baseline semantics, on every evaluation path
+@pytest.mark.parametrize("hw_config, models, X, expected", PINNED_BASELINE)
+def test_baseline_semantics_by_default ( make_instance, runtime_df, avg_power_df, hw_config, models, X, expected ):
+    instance = make_instance(hw_config, models)
+    X = numpy.array(X, dtype=schedule.SCHEDULE_DTYPE)
+    evaluation = energy_model.evaluate(instance, X)
+    T_tot, E_comp, E_idle = energy_model.evaluate_batch(instance, X[numpy.newaxis,:])
+    assert instance.semantics == "baseline"
+    assert (evaluation.T_tot, evaluation.E_compute, evaluation.E_idle) == pytest.approx(expected, rel=1e-12)
+    assert (T_tot[0], E_comp[0], E_idle[0]) == pytest.approx(expected, rel=1e-12)
+    assert energy_model.compute_energy_model(
+            hw_config_df=pandas.DataFrame({"ARCH": instance.A}),
+            workload_df=pandas.DataFrame({"Model": models}),
+            S=schedule.to_matrix(X, instance.LEN_D),
+            runtime_df=runtime_df,
+            avg_power_df=avg_power_df,
+            compute_Ttot=True,
+            compute_Ecompute=True,
+            compute_E_idle=True,
+        ) == pytest.approx(expected, rel=1e-12)
+
+# Batched and single baseline evaluations agree
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+def test_evaluate_baseline_batch ( make_instance, hw_config ):
+    rng = numpy.random.default_rng(1)
+    instance = make_instance(hw_config, rng.choice(MODELS, size=9).tolist())
+    X = rng.integers(instance.LEN_D, size=(16, instance.LEN_W))
+    T_tot, E_comp, E_idle = energy_model.evaluate_baseline_batch(instance, X)
+    for s in range(len(X)):
+        evaluation = energy_model.evaluate_baseline(instance, X[s])
+        assert (T_tot[s], E_comp[s], E_idle[s]) == pytest.approx((evaluation.T_tot, evaluation.E_compute, evaluation.E_idle))
+
+# The per-NPU breakdown adds up to the totals, in either semantics
+@pytest.mark.parametrize("semantics", ["baseline", "per-npu"])
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+def test_breakdown_matches_totals ( make_instance, hw_config, semantics ):
+    rng = numpy.random.default_rng(1)
+    instance = make_instance(hw_config, rng.choice(MODELS, size=7).tolist(), semantics=semantics)
+    for _ in range(8):
+        X = rng.integers(instance.LEN_D, size=instance.LEN_W).astype(schedule.SCHEDULE_DTYPE)
+        evaluation = energy_model.evaluate(instance, X)
+        assert len(evaluation.T_d) == len(evaluation.E_d) == len(evaluation.E_idle_d) == instance.LEN_D
+        assert evaluation.T_tot == pytest.approx(max(evaluation.T_d))
+        assert evaluation.E_compute == pytest.approx(sum(evaluation.E_d))
+        assert evaluation.E_idle == pytest.approx(sum(evaluation.E_idle_d))
+        assert evaluation.E_tot == pytest.approx(evaluation.E_compute + evaluation.E_idle)
+        assert evaluation.E_idle_d == pytest.approx(instance.power_idle * (evaluation.T_tot - evaluation.T_d))
+        # NPUs without threads only idle
+        idle = numpy.bincount(X, minlength=instance.LEN_D) == 0
+        assert (evaluation.T_d[idle] == 0.).all()
+        assert (evaluation.E_d[idle] == 0.).all()
+        # Objectives select the totals
+        assert evaluation.objective("T_tot") == evaluation.T_tot
+        assert evaluation.objective("E_compute") == evaluation.E_compute
+        assert evaluation.objective("E_idle") == evaluation.E_idle
+        assert evaluation.objective("E_tot") == pytest.approx(evaluation.E_tot)
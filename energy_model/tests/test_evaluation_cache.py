@@ -0,0 +1,78 @@
+import numpy
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import evaluation_cache
+
+# Workloads with the same model set, whose packed loads collide across radixes:
+#   W=4: 2*5 + 2 = 12, W=6: 1*7 + 5 = 12
+def test_keys_distinguish_workload_size ( make_instance ):
+    cache = evaluation_cache.EvaluationCache()
+    instances = [
+            make_instance("4x512", ["VGG-16"] * 2 + ["MobileNet"] * 2),
+            make_instance("4x512", ["VGG-16"] * 1 + ["MobileNet"] * 5),
+        ]
+    for instance in instances:
+        S = numpy.zeros(instance.LEN_W, dtype=schedule.SCHEDULE_DTYPE) # All on NPU 0
+        expected = energy_model.evaluate(instance, S)
+        T_tot, E_comp, E_idle = cache.evaluate(instance, S)
+        assert T_tot == pytest.approx(expected.T_tot)
+        assert E_comp == pytest.approx(expected.E_compute)
+        assert E_idle == pytest.approx(expected.E_idle)
+    assert cache.misses == 2
+
+def test_keys_collapse_symmetric_schedules ( make_instance ):
+    cache = evaluation_cache.EvaluationCache()
+    instance = make_instance("4x512", ["VGG-16", "MobileNet", "VGG-16", "MobileNet"], semantics="per-npu")
+    X = numpy.array([
+            [0, 1, 2, 3],
+            [2, 3, 0, 1],   # Threads of the same model permuted
+            [3, 2, 1, 0],   # NPUs of the same ARCH permuted
+        ])
+    cache.evaluate_batch(instance, X)
+    assert cache.misses == 1
+    assert cache.hits == 2
+
+# In the baseline semantics, k is indexed by thread order: only identical schedules collapse
+def test_keys_baseline_semantics ( make_instance ):
+    cache = evaluation_cache.EvaluationCache()
+    instance = make_instance("4x512", ["VGG-16", "MobileNet", "VGG-16", "MobileNet"])
+    X = numpy.array([
+            [0, 1, 2, 3],
+            [2, 3, 0, 1],
+            [0, 1, 2, 3],
+        ])
+    T_tot, E_comp, E_idle = cache.evaluate_batch(instance, X)
+    assert cache.misses == 2
+    assert cache.hits == 1
+    assert (T_tot, E_comp, E_idle) == tuple(pytest.approx(value) for value in energy_model.evaluate_batch(instance, X))
+
+# Per-NPU model counts, when packed loads do not fit
+@pytest.mark.parametrize("max_packed_load", [evaluation_cache.MAX_PACKED_LOAD, 1.])
+def test_keys_fallback ( make_instance, monkeypatch, max_packed_load ):
+    monkeypatch.setattr(evaluation_cache, "MAX_PACKED_LOAD", max_packed_load)
+    cache = evaluation_cache.EvaluationCache()
+    instance = make_instance("2x2304_2x4096", ["VGG-16", "MobileNet", "VGG-16", "ResNet-50"], semantics="per-npu")
+    X = numpy.array([
+            [0, 1, 2, 2],
+            [1, 0, 2, 2],   # NPUs of the same ARCH permuted
+            [0, 1, 3, 3],   # NPUs of the same ARCH permuted
+            [2, 1, 0, 2],   # Threads of the same model permuted
+            [0, 0, 1, 2],
+            [2, 2, 1, 0],
+        ])
+    T_tot, E_comp, E_idle = cache.evaluate_batch(instance, X)
+    assert cache.misses == 3
+    assert cache.hits == 3
+    assert (T_tot, E_comp, E_idle) == tuple(pytest.approx(value) for value in energy_model.evaluate_batch(instance, X))
+
+# Hits across batches scatter back to every duplicate
+def test_evaluate_batch_matches_uncached ( make_instance ):
+    cache = evaluation_cache.EvaluationCache(maxsize=8)
+    instance = make_instance("4x512", ["VGG-16", "MobileNet", "VGG-16", "MobileNet"], semantics="per-npu")
+    rng = numpy.random.default_rng(0)
+    for _ in range(4):
+        X = rng.integers(instance.LEN_D, size=(64, instance.LEN_W))
+        T_tot, E_comp, E_idle = cache.evaluate_batch(instance, X)
+        assert (T_tot, E_comp, E_idle) == tuple(pytest.approx(value) for value in energy_model.evaluate_batch(instance, X))
+    assert len(cache) == 8
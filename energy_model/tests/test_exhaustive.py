@@ -0,0 +1,176 @@
+import itertools
+import numpy
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import search_budget
+from energy_sim import evaluation_cache
+from energy_sim import thread_allocation
+from schedulers import exhaustive
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# An unlimited budget keeps the pool, and adds up the evaluations of all workers
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_tot"])
+def test_parallel_unlimited_budget ( make_instance, monkeypatch, opt_target ):
+    monkeypatch.setattr(exhaustive, "PARALLEL_MIN_SCHEDULES", 1)
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:1])
+    S_serial = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S_serial, opt_target)
+
+    calls = []
+    map_ = exhaustive.get_pool(2).map
+    monkeypatch.setattr(exhaustive.get_pool(2), "map", lambda *args: calls.append(args) or map_(*args))
+    budget = search_budget.SearchBudget()
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, opt_target, num_workers=2, budget=budget)
+    assert len(calls) == 1
+    assert budget.evaluations == instance.LEN_D ** instance.LEN_W
+    assert budget.gap == 0.
+    assert numpy.array_equal(S, S_serial)
+
+# A limited budget runs serially, stopping on its evaluations
+def test_limited_budget_runs_serially ( make_instance, monkeypatch ):
+    monkeypatch.setattr(exhaustive, "PARALLEL_MIN_SCHEDULES", 1)
+    monkeypatch.setattr(exhaustive, "get_pool", lambda num_workers: pytest.fail("pool used"))
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:1])
+    budget = search_budget.SearchBudget(max_evaluations=100)
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, "T_tot", num_workers=2, budget=budget)
+    assert budget.evaluations == 100
+    assert budget.gap >= 0.
+
+# Lower bounds never exceed the optimum, in both semantics
+@pytest.mark.parametrize("semantics", ["baseline", "per-npu"])
+@pytest.mark.parametrize("hw_config, models", [
+        ("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:3]),
+        ("1x512_3x4096", MODELS + MODELS[:2]),
+        ("4x512", ["ResNet-50"] * 6),
+    ])
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_lower_bound_admissible ( make_instance, semantics, hw_config, models, opt_target ):
+    instance = make_instance(hw_config, models, semantics=semantics)
+    optimum = energy_model.evaluate(instance, full_argmin(instance, opt_target)).objective(opt_target)
+    assert energy_model.lower_bound(instance, opt_target) <= optimum * (1 + 1e-12)
+
+# Truncated searches under the default semantics report at least the true gap
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_truncated_gap_default_semantics ( make_instance, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:3])
+    optimum = energy_model.evaluate(instance, full_argmin(instance, opt_target)).objective(opt_target)
+    budget = search_budget.SearchBudget(max_evaluations=100)
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, opt_target, budget=budget)
+    incumbent = energy_model.evaluate(instance, S).objective(opt_target)
+    assert budget.evaluations == 100
+    assert budget.lower_bound <= optimum * (1 + 1e-12)
+    assert budget.gap >= (incumbent - optimum) / abs(incumbent) - 1e-12
+    if incumbent > optimum:
+        assert budget.gap > 0.
+
+# Full enumeration, in itertools.product order
+def enumerate_all ( instance ) -> numpy.ndarray:
+    return numpy.array(list(itertools.product(range(instance.LEN_D), repeat=instance.LEN_W)), dtype=schedule.SCHEDULE_DTYPE)
+
+# First minimum of each target over the full enumeration
+def full_argmin ( instance, opt_target ):
+    X = enumerate_all(instance)
+    objective = energy_model.objective_by(opt_target, *energy_model.evaluate_batch(instance, X))
+    return X[int(numpy.argmin(objective))]
+
+# Blocks decode to the enumeration order of itertools.product, across block boundaries
+@pytest.mark.parametrize("len_d, len_w", [(1, 4), (2, 7), (3, 5), (5, 4)])
+def test_decode_order ( len_d, len_w ):
+    expected = numpy.array(list(itertools.product(range(len_d), repeat=len_w)))
+    indices = numpy.arange(len_d ** len_w, dtype=numpy.int64)
+    blocks = [exhaustive.decode(indices[low : low + 7], len_d, len_w) for low in range(0, len(indices), 7)]
+    assert numpy.array_equal(numpy.concatenate(blocks), expected)
+
+# The block-wise argmin is the first argmin of the full enumeration, ties included:
+# identical threads on identical NPUs tie across blocks
+@pytest.mark.parametrize("hw_config, models", [
+        ("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:1]),
+        ("4x512", ["ResNet-50"] * 6),
+        ("3x1024_2x4096", ["MobileNet"] * 3 + ["VGG-16"] * 3),
+    ])
+@pytest.mark.parametrize("block_size", [7, 64, 1 << 16])
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_block_argmin ( make_instance, monkeypatch, hw_config, models, block_size, opt_target ):
+    monkeypatch.setattr(exhaustive, "BLOCK_SIZE", block_size)
+    instance = make_instance(hw_config, models)
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, opt_target)
+    assert numpy.array_equal(S, full_argmin(instance, opt_target))
+
+# Streaming: schedules are scored in blocks of at most BLOCK_SIZE, each once,
+# whatever the size of the search space
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_streaming_blocks ( make_instance, monkeypatch, use_cache ):
+    monkeypatch.setattr(exhaustive, "BLOCK_SIZE", 100)
+    sizes = []
+    evaluate_batch = energy_model.evaluate_batch
+    monkeypatch.setattr(energy_model, "evaluate_batch", lambda instance, X, **kwargs: sizes.append(len(X)) or evaluate_batch(instance, X, **kwargs))
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:1], semantics="per-npu")
+    cache = evaluation_cache.EvaluationCache() if use_cache else None
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, "E_tot", cache=cache)
+    assert max(sizes) <= 100
+    if not use_cache:
+        assert sum(sizes) == instance.LEN_D ** instance.LEN_W
+    assert numpy.array_equal(S, full_argmin(instance, "E_tot"))
+
+# The pool returns the serial search's schedules, tied optima in different partitions included
+@pytest.mark.parametrize("hw_config, models", [
+        ("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:2]),
+        ("4x512", ["ResNet-50"] * 7),
+        ("3x1024_2x4096", ["MobileNet"] * 3 + ["VGG-16"] * 3),
+    ])
+@pytest.mark.parametrize("num_workers", [2, 3])
+def test_pool_matches_serial ( make_instance, monkeypatch, hw_config, models, num_workers ):
+    monkeypatch.setattr(exhaustive, "PARALLEL_MIN_SCHEDULES", 1)
+    instance = make_instance(hw_config, models)
+    S_serial = [schedule.empty_schedule(instance.LEN_W) for _ in energy_model.OPT_TARGETS]
+    exhaustive.thread_allocation_E_multi(instance, S_serial, energy_model.OPT_TARGETS)
+    S_pool = [schedule.empty_schedule(instance.LEN_W) for _ in energy_model.OPT_TARGETS]
+    exhaustive.thread_allocation_E_multi(instance, S_pool, energy_model.OPT_TARGETS, num_workers=num_workers)
+    for S, S_expected in zip(S_pool, S_serial):
+        assert numpy.array_equal(S, S_expected)
+
+# Identical threads on identical NPUs: the optima of the first partition are tied in others,
+# hence the reduction must keep the first partition's
+def test_pool_ties_across_partitions ( make_instance, monkeypatch ):
+    monkeypatch.setattr(exhaustive, "PARALLEL_MIN_SCHEDULES", 1)
+    instance = make_instance("4x512", ["ResNet-50"] * 7)
+    optimum = full_argmin(instance, "T_tot")
+    objective = energy_model.objective_by("T_tot", *energy_model.evaluate_batch(instance, enumerate_all(instance)))
+    tied = enumerate_all(instance)[objective == objective.min()]
+    assert len(set(tied[:,0].tolist())) > 1
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, "T_tot", num_workers=2)
+    assert numpy.array_equal(S, optimum)
+
+# No caller of the batched evaluator materializes the search space: stacks stay within
+# BLOCK_SIZE schedules, whatever the number of schedules, in the semantics each supports
+@pytest.mark.parametrize("name, semantics", [
+        (name, semantics)
+        for name in ["Exhaustive", "Batched", "Batched-Carry", "Greedy"]
+        for semantics in ["baseline", "per-npu"]
+        if thread_allocation.supports(name, semantics)
+    ])
+def test_batched_evaluations_are_bounded ( make_instance, monkeypatch, name, semantics ):
+    monkeypatch.setattr(exhaustive, "BLOCK_SIZE", 64)
+    sizes = []
+    evaluate_batch = energy_model.evaluate_batch
+    monkeypatch.setattr(energy_model, "evaluate_batch", lambda instance, X, **kwargs: sizes.append(len(X)) or evaluate_batch(instance, X, **kwargs))
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 2, semantics=semantics)
+    row = {"Name": name, "Batch_Size": 5}
+    thread_allocation.thread_allocation(row, instance, "E_tot")
+    assert max(sizes, default=0) <= 64
+
+# Baseline keys are the schedules themselves, never repeated by the enumeration
+def test_cache_bypassed_in_baseline ( make_instance ):
+    instance = make_instance("4x512", ["VGG-16", "MobileNet", "VGG-16", "MobileNet"])
+    cache = evaluation_cache.EvaluationCache()
+    S = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S, "E_tot", cache=cache)
+    assert cache.hits + cache.misses == 0
@@ -0,0 +1,37 @@
+import numpy
+import pandas
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import search_budget
+from energy_sim import thread_allocation
+from schedulers import greedy
+from schedulers import genetic
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"] * 4
+
+# Runs are reproducible from the Seed and Params of the scheduler row, given a generation bound
+def test_seed_reproducible ( make_instance ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS, semantics="per-npu")
+    schedules = {}
+    for seed in [1, 1, 2]:
+        row = pandas.Series({"Name": "Genetic", "Batch_Size": 0, "Seed": seed, "Params": "population_size=32 mutation_rate=0.2 max_generations=20 time_limit_s=None"})
+        budget = search_budget.SearchBudget()
+        # Thread reshuffle of the wrapper
+        numpy.random.seed(0)
+        S = thread_allocation.thread_allocation(row, instance, "E_tot", budget=budget)
+        # Initial population, then the children of each generation
+        assert budget.evaluations == 32 + 20 * (32 - genetic.ELITISM)
+        schedules.setdefault(seed, []).append(S)
+    assert numpy.array_equal(schedules[1][0], schedules[1][1])
+    assert not numpy.array_equal(schedules[1][0], schedules[2][0])
+
+# Elitism keeps the Greedy individual of the initial population, or better
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_not_worse_than_greedy ( make_instance, opt_target ):
+    instance = make_instance("1x512_3x4096", MODELS, semantics="per-npu")
+    S_greedy = schedule.empty_schedule(instance.LEN_W)
+    greedy.thread_allocation_G(instance, S_greedy, opt_target)
+    S = schedule.empty_schedule(instance.LEN_W)
+    genetic.thread_allocation_GA(instance, S, opt_target, population_size=16, max_generations=10, time_limit_s=None, seed=0)
+    assert energy_model.evaluate(instance, S).objective(opt_target) <= energy_model.evaluate(instance, S_greedy).objective(opt_target)
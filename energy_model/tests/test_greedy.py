@@ -0,0 +1,76 @@
+import numpy
+import pytest
+from energy_sim import schedule
+from schedulers import greedy
+
+# Allocations of the original greedy scheduler (baseline commit), per target
+PINNED_BASELINE = [
+        (
+            "1x512_3x4096",
+            ["VGG-16", "MobileNet", "ResNet-50", "VGG-16", "DenseNet-201"],
+            {
+                "T_tot":     [0, 1, 2, 0, 1],
+                "E_compute": [0, 0, 0, 0, 0],
+                "E_idle":    [0, 1, 2, 3, 1],
+                "E_tot":     [0, 1, 2, 2, 1],
+            },
+        ),
+        (
+            "2x512_1x1024_1x2304_1x4096",
+            ["MobileNet", "ResNet-50", "MobileNet", "VGG-16", "ResNet-50", "DenseNet-201"],
+            {
+                "T_tot":     [4, 4, 0, 0, 3, 4],
+                "E_compute": [0, 4, 4, 4, 4, 4],
+                "E_idle":    [4, 4, 3, 0, 3, 4],
+                "E_tot":     [4, 4, 4, 0, 3, 4],
+            },
+        ),
+    ]
+
+@pytest.mark.parametrize("hw_config, models, expected", PINNED_BASELINE)
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_baseline_allocations ( make_instance, hw_config, models, expected, opt_target ):
+    instance = make_instance(hw_config, models)
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy.thread_allocation_G(instance, S, opt_target)
+    assert numpy.asarray(S).tolist() == expected[opt_target]
+
+HW_CONFIGS = [
+        "4x512",
+        "1x512_3x4096",
+        "3x1024_2x4096",
+        "2x512_1x1024_1x2304_1x4096",
+    ]
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Delta scoring allocates as re-evaluating each partial schedule (the scheduler before
+# delta scoring), in both semantics
+@pytest.mark.parametrize("semantics", ["baseline", "per-npu"])
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_delta_matches_exact ( make_instance, semantics, hw_config, seed, opt_target ):
+    rng = numpy.random.default_rng(seed)
+    instance = make_instance(hw_config, rng.choice(MODELS, size=12).tolist(), semantics=semantics)
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy.thread_allocation_G(instance, S, opt_target)
+    S_exact = schedule.empty_schedule(instance.LEN_W)
+    greedy.allocate_exact(instance, S_exact, opt_target)
+    assert numpy.array_equal(S, S_exact)
+
+# Identical NPUs and threads tie on every placement, up to the round-off of delta scores:
+# near-ties break as with a full evaluation
+@pytest.mark.parametrize("semantics", ["baseline", "per-npu"])
+@pytest.mark.parametrize("hw_config", ["4x512", "3x1024_2x4096"])
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_delta_near_ties ( make_instance, monkeypatch, semantics, hw_config, opt_target ):
+    instance = make_instance(hw_config, ["ResNet-50"] * 11, semantics=semantics)
+    calls = []
+    score_exact = greedy.score_exact
+    monkeypatch.setattr(greedy, "score_exact", lambda *args: calls.append(args) or score_exact(*args))
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy.thread_allocation_G(instance, S, opt_target)
+    assert len(calls) != 0
+    S_exact = schedule.empty_schedule(instance.LEN_W)
+    greedy.allocate_exact(instance, S_exact, opt_target)
+    assert numpy.array_equal(S, S_exact)
@@ -0,0 +1,61 @@
+import os
+import numpy
+import pandas
+import pytest
+from energy_sim import schedule
+from schedulers import greedy_lpt
+
+from conftest import ENERGY_MODEL_DIR
+
+WORKLOADS_DIR = os.path.join(ENERGY_MODEL_DIR, "experiment", "Workloads")
+
+# Reference: replay the LPT order, checking each placement against the argmin over all NPUs
+# of the projected finish (t_sum[d] + t[thread,d]) * k[d,N[d]+1]
+def assert_lpt_placements ( instance, S ):
+    X = numpy.asarray(S)
+    order = numpy.argsort(-instance.runtime.mean(axis=1), kind="stable")
+    npus = numpy.arange(instance.LEN_D)
+    t_sum = numpy.zeros(instance.LEN_D)
+    N = numpy.zeros(instance.LEN_D, dtype=int)
+    for thread_index in order:
+        finish = (t_sum + instance.runtime[thread_index]) * instance.k[npus, N + 1]
+        d = X[thread_index]
+        assert finish[d] == finish.min(), (thread_index, d, finish)
+        t_sum[d] += instance.runtime[thread_index, d]
+        N[d] += 1
+
+@pytest.mark.parametrize("hw_config", [
+        "4x512",
+        "1x512_3x4096",
+        "3x1024_2x4096",
+        "2x512_1x1024_1x2304_1x4096",
+    ])
+@pytest.mark.parametrize("workload", [
+        "Workload_Small",
+        "Workload_Medium",
+        "Workload_Large",
+        "Workload_Skew High-energy",
+    ])
+def test_placements_are_argmin ( make_instance, hw_config, workload ):
+    models = pandas.read_csv(os.path.join(WORKLOADS_DIR, workload + ".csv"))["Model"].tolist()
+    instance = make_instance(hw_config, models, semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy_lpt.thread_allocation_LPT(instance, S)
+    assert_lpt_placements(instance, S)
+
+# Random workloads, over all model mixes
+@pytest.mark.parametrize("seed", range(8))
+def test_placements_are_argmin_random ( make_instance, runtime_df, seed ):
+    rng = numpy.random.default_rng(seed)
+    models = sorted(set(runtime_df["Model"]))
+    instance = make_instance("1x512_1x1024_1x2304_1x4096", rng.choice(models, size=24).tolist(), semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy_lpt.thread_allocation_LPT(instance, S)
+    assert_lpt_placements(instance, S)
+
+# Finish times are per-npu, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("4x512", ["VGG-16", "MobileNet"])
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(AssertionError):
+        greedy_lpt.thread_allocation_LPT(instance, S)
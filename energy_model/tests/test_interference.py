@@ -0,0 +1,44 @@
+import numpy
+import pytest
+from energy_sim import utils
+from energy_sim import interference
+
+@pytest.mark.parametrize("max_threads", [0, 1, 2, 8])
+def test_linear_regression_table_length ( max_threads ):
+    k = interference.DEFAULT.table(512, max_threads)
+    assert len(k) == max_threads + 1
+    assert k[0] == 0.
+    if max_threads >= 1:
+        assert k[1] == 1.
+
+def test_linear_regression_table_values ():
+    k = interference.LinearRegression(b0=utils.b0, b1=utils.b1).table(512, 4)
+    # k[n] = (b0 + b1 * (n+1)) / (n+1), for n >= 2
+    n = numpy.arange(2, 5)
+    assert k[2:] == pytest.approx((utils.b0 + utils.b1 * (n+1)) / (n+1))
+
+# Per-ARCH models are tabulated on the NPUs of their ARCH, others on the default
+def test_per_arch_models ( make_instance ):
+    A = make_instance("1x512_3x4096", ["VGG-16"]).A
+    model = interference.PerArch({A[0]: interference.Tabulated([0., 1., 0.5])}, default=interference.DEFAULT)
+    instance = make_instance("1x512_3x4096", ["VGG-16"] * 3, interference=model)
+    for d in range(instance.LEN_D):
+        if A[d] == A[0]:
+            assert instance.k[d].tolist() == [0., 1., 0.5, 0.5]
+        else:
+            assert instance.k[d] == pytest.approx(interference.DEFAULT.table(A[d], 3))
+
+# An empty workload compiles to k[d,0] = 0 only
+def test_empty_workload ( make_instance ):
+    instance = make_instance("4x512", [])
+    assert instance.k.shape == (4, 1)
+    assert (instance.k == 0.).all()
+
+# Models must implement table()
+def test_interface_is_abstract ():
+    with pytest.raises(TypeError):
+        interference.InterferenceModel()
+    class Incomplete(interference.InterferenceModel):
+        pass
+    with pytest.raises(TypeError):
+        Incomplete()
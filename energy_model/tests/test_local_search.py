@@ -0,0 +1,96 @@
+import numpy
+import pandas
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import schedule_state
+from energy_sim import thread_allocation
+from schedulers import local_search
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201", "VGG-16", "MobileNet", "ResNet-50"]
+
+def random_schedule ( instance, seed: int ):
+    rng = numpy.random.default_rng(seed)
+    return rng.integers(instance.LEN_D, size=instance.LEN_W).astype(schedule.SCHEDULE_DTYPE)
+
+# Neighbours of X, evaluated from scratch
+def neighbour_objectives ( instance, X, opt_target: str ):
+    for thread_index in range(instance.LEN_W):
+        for d in range(instance.LEN_D):
+            Y = X.copy()
+            Y[thread_index] = d
+            yield energy_model.evaluate(instance, Y).objective(opt_target)
+    for thread_a in range(instance.LEN_W):
+        for thread_b in range(thread_a + 1, instance.LEN_W):
+            Y = X.copy()
+            Y[thread_a], Y[thread_b] = X[thread_b], X[thread_a]
+            yield energy_model.evaluate(instance, Y).objective(opt_target)
+
+# Refinement never worsens the schedule, and stops at a local optimum
+@pytest.mark.parametrize("strategy", local_search.STRATEGIES)
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+@pytest.mark.parametrize("seed", range(3))
+def test_local_optimum ( make_instance, strategy, opt_target, seed ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS, semantics="per-npu")
+    S = random_schedule(instance, seed)
+    before = energy_model.evaluate(instance, S).objective(opt_target)
+    refinement = local_search.LocalSearch(strategy=strategy)
+    refinement.run(instance, S, opt_target)
+    after = energy_model.evaluate(instance, S).objective(opt_target)
+    assert refinement.objective_before == pytest.approx(before)
+    assert refinement.objective_after == pytest.approx(after)
+    assert after <= before
+    assert (refinement.num_moves == 0) == (after == pytest.approx(before))
+    for objective in neighbour_objectives(instance, S, opt_target):
+        assert objective >= after - 1e-9 * abs(after)
+
+# Larger budgets only improve further: the descent is monotone
+@pytest.mark.parametrize("strategy", local_search.STRATEGIES)
+def test_monotone_in_budget ( make_instance, strategy ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS, semantics="per-npu")
+    previous = float("inf")
+    for max_evaluations in [1, 10, 50, 100, 500, 2000, None]:
+        S = random_schedule(instance, 0)
+        refinement = local_search.LocalSearch(strategy=strategy, max_evaluations=max_evaluations)
+        refinement.run(instance, S, "E_tot")
+        if max_evaluations is not None:
+            assert refinement.evaluations <= max_evaluations
+        assert refinement.objective_after <= previous
+        previous = refinement.objective_after
+
+# The state is recomputed every REFRESH_PERIOD evaluated neighbours, and before committing
+@pytest.mark.parametrize("strategy", local_search.STRATEGIES)
+def test_periodic_refresh ( make_instance, monkeypatch, strategy ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 2, semantics="per-npu")
+    monkeypatch.setattr(local_search, "REFRESH_PERIOD", 16)
+    calls = []
+    refresh = schedule_state.ScheduleState.refresh
+    monkeypatch.setattr(schedule_state.ScheduleState, "refresh", lambda state: calls.append(None) or refresh(state))
+    S = random_schedule(instance, 0)
+    refinement = local_search.LocalSearch(strategy=strategy)
+    refinement.run(instance, S, "E_tot")
+    assert len(calls) == refinement.evaluations // 16 + 1
+    assert refinement.objective_after == energy_model.evaluate(instance, S).objective("E_tot")
+
+# As in launch.py: the objectives recorded by the refinement are those reported for the row
+@pytest.mark.parametrize("name", ["Random", "Round-Robin", "Greedy"])
+@pytest.mark.parametrize("opt_target", energy_model.OPT_TARGETS)
+def test_objectives_match_reported ( make_instance, name, opt_target ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 2, semantics="per-npu")
+    numpy.random.seed(0)
+    row = pandas.Series({"Name": name, "Batch_Size": 0})
+    S, = thread_allocation.thread_allocation_multi(row, instance, [opt_target])
+    before = energy_model.evaluate(instance, S).objective(opt_target)
+    refinement = local_search.LocalSearch()
+    refinement.run(instance, S, opt_target)
+    evaluation = energy_model.evaluate(instance, S)
+    assert refinement.objective_before == before
+    assert refinement.objective_after == evaluation.objective(opt_target)
+    assert refinement.objective_after <= refinement.objective_before
+
+# Neighbours are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS)
+    S = random_schedule(instance, 0)
+    with pytest.raises(AssertionError):
+        local_search.LocalSearch().run(instance, S, "T_tot")
@@ -0,0 +1,26 @@
+import numpy
+import pytest
+from energy_sim import lookup_tables
+
+# t(a,m), straight from the measures
+def runtime ( runtime_df, arch, model ):
+    return runtime_df.loc[(runtime_df["ARCH"] == arch) & (runtime_df["Model"] == model)]["Runtime (s)"].values[0]
+
+# p(a,m) = p_ps(a,m) + p_pl(a,m), straight from the measures
+def power ( avg_power_df, arch, model ):
+    p = avg_power_df.loc[(avg_power_df["ARCH"] == arch) & (avg_power_df["Model"] == model)]
+    return p["Power PS (mW)"].values[0] + p["Power PL (mW)"].values[0]
+
+# Dense tables hold the measures
+def test_tables_match_measures ( runtime_df, avg_power_df ):
+    tables = lookup_tables.get_lookup_tables(runtime_df, avg_power_df)
+    for arch, model in zip(runtime_df["ARCH"], runtime_df["Model"]):
+        a = tables.arch_ids(numpy.array([arch]))[0]
+        m = tables.model_ids(numpy.array([model]))[0]
+        assert tables.runtime[a,m] == pytest.approx(runtime(runtime_df, arch, model))
+        assert tables.energy[a,m] == pytest.approx(power(avg_power_df, arch, model) * runtime(runtime_df, arch, model))
+        assert tables.power_idle[a] == pytest.approx(power(avg_power_df, arch, "Idle"))
+
+# Tables are compiled once per pair of measures
+def test_tables_cached ( runtime_df, avg_power_df ):
+    assert lookup_tables.get_lookup_tables(runtime_df, avg_power_df) is lookup_tables.get_lookup_tables(runtime_df, avg_power_df)
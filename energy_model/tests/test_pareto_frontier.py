@@ -0,0 +1,62 @@
+import itertools
+import numpy
+import pytest
+from energy_sim import pareto
+from energy_sim import energy_model
+from energy_sim import thread_allocation
+from schedulers import pareto_frontier
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Non-dominated objective vectors of all schedules, by pairwise comparison,
+# with points equal up to round-off merged
+def brute_force_frontier ( instance ) -> numpy.ndarray:
+    X = numpy.array(list(itertools.product(range(instance.LEN_D), repeat=instance.LEN_W)))
+    points = numpy.stack(energy_model.evaluate_batch(instance, X), axis=1)
+    points = numpy.unique(points.round(decimals=6), axis=0)
+    dominated = [
+            any((other <= point).all() and (other < point).any() for other in points)
+            for point in points
+        ]
+    return points[~numpy.array(dominated)]
+
+@pytest.mark.parametrize("hw_config, models", [
+        ("4x512", MODELS + MODELS[:2]),
+        ("1x512_3x4096", MODELS + MODELS[1:3]),
+        ("2x512_1x1024_1x2304_1x4096", MODELS + MODELS[:1]),
+    ])
+def test_matches_brute_force ( make_instance, hw_config, models ):
+    instance = make_instance(hw_config, models, semantics="per-npu")
+    frontier = pareto_frontier.pareto_frontier(instance)
+    expected = brute_force_frontier(instance)
+    assert frontier.points.round(decimals=6).tolist() == expected.tolist()
+    # Each schedule evaluates to its point
+    for point, S in zip(frontier.points, frontier.payloads):
+        evaluation = energy_model.evaluate(instance, S)
+        assert (evaluation.T_tot, evaluation.E_compute, evaluation.E_idle) == pytest.approx(point.tolist())
+
+# The frontier reported through the wrappers indexes threads as the caller's workload
+def test_reported_frontier ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS + MODELS[1:3], semantics="per-npu")
+    frontier = pareto.ParetoArchive()
+    S_list = thread_allocation.thread_allocation_multi(
+            scheduler_row={"Name": "Pareto-Frontier"},
+            instance=instance,
+            opt_targets=energy_model.OPT_TARGETS,
+            frontier=frontier,
+        )
+    frontier.sort()
+    assert frontier.points.round(decimals=6).tolist() == brute_force_frontier(instance).tolist()
+    for point, S in zip(frontier.points, frontier.payloads):
+        evaluation = energy_model.evaluate(instance, S)
+        assert (evaluation.T_tot, evaluation.E_compute, evaluation.E_idle) == pytest.approx(point.tolist())
+    # Committed schedules lie on the frontier
+    for S in S_list:
+        evaluation = energy_model.evaluate(instance, S)
+        assert [round(value, 6) for value in (evaluation.T_tot, evaluation.E_compute, evaluation.E_idle)] in frontier.points.round(decimals=6).tolist()
+
+# Count matrices are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    with pytest.raises(AssertionError):
+        pareto_frontier.pareto_frontier(instance)
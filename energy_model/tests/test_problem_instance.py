@@ -0,0 +1,83 @@
+import pickle
+import numpy
+import pandas
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import thread_allocation
+
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "VGG-16", "DenseNet-201", "MobileNet"]
+
+ARRAYS = [
+        "arch_ids",
+        "model_ids",
+        "runtime",
+        "power",
+        "energy",
+        "power_idle",
+        "k",
+        "models",
+        "model_of_thread",
+        "model_counts",
+        "model_runtime",
+        "model_energy",
+    ]
+
+# NOTE: sub-instances keep the factors k of the full workload, hence only compare up to LEN_W threads
+def assert_same_instance ( a, b ):
+    assert (a.A, a.M, a.LEN_D, a.LEN_W, a.semantics) == (b.A, b.M, b.LEN_D, b.LEN_W, b.semantics)
+    for name in ARRAYS:
+        if name == "k":
+            assert numpy.array_equal(a.k[:,:a.LEN_W+1], b.k[:,:b.LEN_W+1])
+        else:
+            assert numpy.array_equal(getattr(a, name), getattr(b, name)), name
+
+# Shuffling then unshuffling the threads restores the instance
+def test_take_round_trip ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    shuffle = numpy.random.default_rng(0).permutation(instance.LEN_W)
+    shuffled = instance.take(shuffle)
+    assert shuffled.M == tuple(MODELS[thread] for thread in shuffle)
+    assert numpy.array_equal(shuffled.runtime, instance.runtime[shuffle])
+    assert_same_instance(shuffled.take(numpy.argsort(shuffle)), instance)
+
+def test_take_slice ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS)
+    assert_same_instance(instance.take(slice(1, 4)), make_instance("1x512_3x4096", MODELS[1:4]))
+
+# A schedule of the shuffled instance, unshuffled as thread_allocation does, evaluates the same
+def test_take_unshuffled_schedule ( make_instance ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS, semantics="per-npu")
+    rng = numpy.random.default_rng(1)
+    for _ in range(8):
+        shuffle = rng.permutation(instance.LEN_W)
+        X = rng.integers(instance.LEN_D, size=instance.LEN_W).astype(schedule.SCHEDULE_DTYPE)
+        X_unshuffled = schedule.empty_schedule(instance.LEN_W)
+        X_unshuffled[shuffle] = X
+        shuffled = energy_model.evaluate(instance.take(shuffle), X)
+        unshuffled = energy_model.evaluate(instance, X_unshuffled)
+        assert (shuffled.T_tot, shuffled.E_compute, shuffled.E_idle) == pytest.approx((unshuffled.T_tot, unshuffled.E_compute, unshuffled.E_idle))
+
+# Schedules returned by the wrapper index threads as in the caller's workload
+def test_thread_allocation_unshuffles ( make_instance ):
+    instance = make_instance("1x512_3x4096", MODELS, semantics="per-npu")
+    row = pandas.Series({"Name": "Exhaustive", "Batch_Size": 0})
+    S = thread_allocation.thread_allocation(row, instance, "E_tot")
+    X = numpy.array(list(numpy.ndindex(*(instance.LEN_D,) * instance.LEN_W)))
+    _, E_comp, E_idle = energy_model.evaluate_batch(instance, X)
+    assert energy_model.evaluate(instance, S).E_tot == pytest.approx((E_comp + E_idle).min())
+
+def test_immutable ( make_instance ):
+    instance = make_instance("4x512", MODELS)
+    with pytest.raises(AttributeError):
+        instance.LEN_W = 0
+    with pytest.raises(AttributeError):
+        del instance.k
+    with pytest.raises(ValueError):
+        instance.runtime[0, 0] = 0.
+
+def test_pickle ( make_instance ):
+    instance = make_instance("4x512", MODELS, semantics="per-npu")
+    restored = pickle.loads(pickle.dumps(instance))
+    assert_same_instance(restored, instance)
+    assert not restored.runtime.flags.writeable
@@ -0,0 +1,51 @@
+import numpy
+from energy_sim import schedule
+from energy_sim import energy_model
+
+def test_empty_schedule ():
+    X = schedule.empty_schedule(3)
+    assert X.dtype == schedule.SCHEDULE_DTYPE
+    assert X.tolist() == [schedule.UNALLOCATED] * 3
+
+# Assignment array -> allocation matrix -> assignment array
+def test_matrix_round_trip ():
+    rng = numpy.random.default_rng(0)
+    for _ in range(16):
+        LEN_D = int(rng.integers(1, 6))
+        X = rng.integers(LEN_D, size=int(rng.integers(1, 10))).astype(schedule.SCHEDULE_DTYPE)
+        S = schedule.to_matrix(X, LEN_D)
+        assert all(sum(row) == 1 for row in S)
+        assert all(S[thread][X[thread]] == 1 for thread in range(len(X)))
+        assert numpy.array_equal(schedule.from_matrix(S), X)
+        assert schedule.from_matrix(S).dtype == schedule.SCHEDULE_DTYPE
+
+# Rows without allocation
+def test_from_matrix_unallocated ():
+    S = [
+            [0, 1, 0],
+            [0, 0, 0],
+            [1, 0, 0],
+        ]
+    assert schedule.from_matrix(S).tolist() == [1, schedule.UNALLOCATED, 0]
+    assert schedule.to_matrix(schedule.from_matrix(S), 3) == S
+
+def test_as_schedule ():
+    X = numpy.array([2, 0, 1], dtype=schedule.SCHEDULE_DTYPE)
+    # Assignment arrays pass through
+    assert schedule.as_schedule(X) is X
+    # Assignment lists
+    assert schedule.as_schedule(X.tolist()).tolist() == X.tolist()
+    assert schedule.as_schedule(X.tolist()).dtype == schedule.SCHEDULE_DTYPE
+    # Allocation matrices, as lists or arrays
+    assert numpy.array_equal(schedule.as_schedule(schedule.to_matrix(X, 3)), X)
+    assert numpy.array_equal(schedule.as_schedule(numpy.array(schedule.to_matrix(X, 3))), X)
+    # Empty workload
+    assert len(schedule.as_schedule([])) == 0
+
+# Both representations evaluate the same
+def test_evaluate_either_representation ( make_instance ):
+    instance = make_instance("1x512_3x4096", ["VGG-16", "MobileNet", "ResNet-50", "VGG-16"])
+    X = numpy.array([0, 3, 1, 0], dtype=schedule.SCHEDULE_DTYPE)
+    compact = energy_model.evaluate(instance, X)
+    matrix = energy_model.evaluate(instance, schedule.to_matrix(X, instance.LEN_D))
+    assert (compact.T_tot, compact.E_compute, compact.E_idle) == (matrix.T_tot, matrix.E_compute, matrix.E_idle)
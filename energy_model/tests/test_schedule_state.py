@@ -0,0 +1,82 @@
+import random
+import numpy
+import pytest
+from energy_sim import energy_model
+from energy_sim import schedule_state
+
+HW_CONFIGS = [
+        "4x512",
+        "1x512_3x4096",
+        "2x512_1x1024_1x2304_1x4096",
+    ]
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Totals of a fully allocated state, against a full evaluation
+def assert_matches_evaluate ( instance, state ):
+    evaluation = energy_model.evaluate(instance, numpy.array(state.X))
+    assert state.T == pytest.approx(evaluation.T_d.tolist(), rel=1e-12)
+    assert state.E == pytest.approx(evaluation.E_d.tolist(), rel=1e-12)
+    for opt_target in energy_model.OPT_TARGETS:
+        assert state.objective(opt_target) == pytest.approx(evaluation.objective(opt_target), rel=1e-9)
+
+# Assign, move, then revert, checking totals against evaluate along the way
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+def test_apply_and_revert ( make_instance, hw_config ):
+    rng = random.Random(0)
+    instance = make_instance(hw_config, [rng.choice(MODELS) for _ in range(9)], semantics="per-npu")
+    state = schedule_state.ScheduleState(instance)
+    X = [rng.randrange(instance.LEN_D) for _ in range(instance.LEN_W)]
+    for thread_index, d in enumerate(X):
+        state.assign(thread_index, d)
+    assert_matches_evaluate(instance, state)
+
+    # Random moves, each reverted
+    for _ in range(500):
+        thread_index = rng.randrange(instance.LEN_W)
+        d = state.X[thread_index]
+        state.move(thread_index, rng.randrange(instance.LEN_D))
+        assert_matches_evaluate(instance, state)
+        state.move(thread_index, d)
+        assert_matches_evaluate(instance, state)
+    assert state.X == X
+
+    # Deallocate all, then the state is empty
+    for thread_index in range(instance.LEN_W):
+        state.unassign(thread_index)
+    assert state.N == [0] * instance.LEN_D
+    assert state.T == [0.] * instance.LEN_D
+    # Running totals only accumulate round-off, flushed by refresh
+    assert state.E_comp == pytest.approx(0., abs=1e-6)
+    state.refresh()
+    assert state.E_comp == 0.
+    assert state.T_tot == 0.
+
+# Deallocating with the saved sums restores them exactly
+def test_unassign_restores_saved_sums ( make_instance ):
+    instance = make_instance("4x512", MODELS * 2, semantics="per-npu")
+    state = schedule_state.ScheduleState(instance)
+    for thread_index in range(instance.LEN_W - 1):
+        state.assign(thread_index, thread_index % 2)
+    saved = (list(state.t_sum), list(state.e_sum), state.T_tot)
+    thread_index = instance.LEN_W - 1
+    state.assign(thread_index, 0)
+    state.unassign(thread_index, saved[0][0], saved[1][0])
+    assert (state.t_sum, state.e_sum, state.T_tot) == saved
+
+# Tentative placements match assigning, without changing the state
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+def test_placements ( make_instance, hw_config ):
+    rng = random.Random(1)
+    instance = make_instance(hw_config, [rng.choice(MODELS) for _ in range(7)], semantics="per-npu")
+    state = schedule_state.ScheduleState(instance)
+    for thread_index in range(instance.LEN_W - 1):
+        state.assign(thread_index, rng.randrange(instance.LEN_D))
+    thread_index = instance.LEN_W - 1
+    X = list(state.X)
+    T_new, E_new, T_tot, E_comp, E_idle = state.placements(thread_index)
+    assert state.X == X
+    for d in range(instance.LEN_D):
+        state.assign(thread_index, d)
+        assert (T_new[d], E_new[d]) == pytest.approx((state.T[d], state.E[d]))
+        assert (T_tot[d], E_comp[d], E_idle[d]) == pytest.approx((state.T_tot, state.E_compute, state.E_idle))
+        state.unassign(thread_index)
@@ -0,0 +1,96 @@
+import random
+import numpy
+import pandas
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from energy_sim import search_budget
+from energy_sim import thread_allocation
+from schedulers import greedy
+from schedulers import simulated_annealing
+
+HW_CONFIGS = [
+        "4x512",
+        "1x512_3x4096",
+        "2x512_1x1024_1x2304_1x4096",
+    ]
+MODELS = ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"]
+
+# Each delta, and the running objective, match full evaluations over many random proposals
+@pytest.mark.parametrize("hw_config", HW_CONFIGS)
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_delta_matches_evaluate ( make_instance, hw_config, opt_target ):
+    rng = random.Random(0)
+    instance = make_instance(hw_config, [rng.choice(MODELS) for _ in range(10)], semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    greedy.thread_allocation_G(instance, S, opt_target)
+    state = simulated_annealing.Annealer(instance, opt_target, S)
+    previous = energy_model.evaluate(instance, S).objective(opt_target)
+    for _ in range(2000):
+        a = rng.randrange(instance.LEN_W)
+        b = rng.randrange(instance.LEN_W)
+        p = state.X[a]
+        is_swap = rng.random() < 0.5
+        q = state.X[b] if is_swap else (p + rng.randrange(1, instance.LEN_D)) % instance.LEN_D
+        if p == q:
+            continue
+        delta = state.delta(p, q, *state.sums(a, b, is_swap, p, q))
+        state.apply(a, b, is_swap, p, q, delta)
+        evaluation = energy_model.evaluate(instance, numpy.array(state.X))
+        assert delta == pytest.approx(evaluation.objective(opt_target) - previous, abs=1e-6 * abs(previous))
+        assert state.current == pytest.approx(evaluation.objective(opt_target), rel=1e-9)
+        assert state.top[0] == int(evaluation.T_d.argmax())
+        previous = evaluation.objective(opt_target)
+
+# Runs are reproducible from the Seed and Params of the scheduler row, given an evaluation budget
+def test_seed_reproducible ( make_instance ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"] * 4, semantics="per-npu")
+    schedules = {}
+    for seed in [1, 1, 2]:
+        row = pandas.Series({"Name": "Simulated-Annealing", "Batch_Size": 0, "Seed": seed, "Params": "cooling=linear t_start=0.05 time_limit_s=None"})
+        budget = search_budget.SearchBudget(max_evaluations=20000)
+        # Thread reshuffle of the wrapper
+        numpy.random.seed(0)
+        S = thread_allocation.thread_allocation(row, instance, "E_tot", budget=budget)
+        assert budget.evaluations == 20000
+        schedules.setdefault(seed, []).append(S)
+    assert numpy.array_equal(schedules[1][0], schedules[1][1])
+    assert not numpy.array_equal(schedules[1][0], schedules[2][0])
+
+# Several targets run one search each, every row as a single-target run, on its own budget
+def test_multi_target_runs_per_target ( make_instance ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 2, semantics="per-npu")
+    row = pandas.Series({"Name": "Simulated-Annealing", "Batch_Size": 0, "Seed": 1, "Params": "cooling=linear t_start=0.05 time_limit_s=None"})
+    opt_targets = ["T_tot", "E_idle"]
+    budgets = [search_budget.SearchBudget(max_evaluations=5000) for _ in opt_targets]
+    numpy.random.seed(0)
+    S_list = thread_allocation.thread_allocation_multi(row, instance, opt_targets, budgets=budgets)
+    # Same sequence of thread reshuffles
+    numpy.random.seed(0)
+    for S, opt_target, budget in zip(S_list, opt_targets, budgets):
+        S_single = thread_allocation.thread_allocation(row, instance, opt_target, budget=search_budget.SearchBudget(max_evaluations=5000))
+        assert numpy.array_equal(S, S_single)
+        assert budget.evaluations == 5000
+
+# Scalar rounds and vectorized blocks stop at the evaluation budget, not past it
+@pytest.mark.parametrize("max_evaluations", [1, 100, 300, 1000, 4321])
+def test_evaluation_budget_exact ( make_instance, max_evaluations ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", MODELS * 3, semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    budget = search_budget.SearchBudget(max_evaluations=max_evaluations)
+    simulated_annealing.thread_allocation_SA(instance, S, "E_tot", time_limit_s=None, seed=0, budget=budget)
+    assert budget.evaluations == max_evaluations
+
+# Without any budget, the search would not stop
+def test_unbounded_rejected ( make_instance ):
+    instance = make_instance("4x512", ["VGG-16", "MobileNet"], semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(SystemExit):
+        simulated_annealing.thread_allocation_SA(instance, S, "T_tot", time_limit_s=None)
+
+# Proposals are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    instance = make_instance("4x512", ["VGG-16", "MobileNet"])
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(AssertionError):
+        simulated_annealing.thread_allocation_SA(instance, S, "T_tot", seed=0)
@@ -0,0 +1,59 @@
+import itertools
+import numpy
+import pytest
+from energy_sim import schedule
+from energy_sim import energy_model
+from schedulers import exhaustive
+from schedulers import symmetric_exhaustive
+
+CASES = [
+        ("4x1024", ["ResNet-50"] * 3 + ["MobileNet"] * 3),
+        ("3x1024_2x4096", ["VGG-16"] * 2 + ["MobileNet"] * 3 + ["DenseNet-201"]),
+        ("2x512_1x1024_1x2304_1x4096", ["VGG-16", "MobileNet", "ResNet-50", "VGG-16", "MobileNet"]),
+    ]
+
+# Canonical form of a schedule: its count matrix, rows sorted within each ARCH class
+def canonical_key ( instance, classes, X ) -> tuple:
+    C = energy_model.count_matrix(instance, X)
+    return tuple(tuple(sorted(map(tuple, C[npus].tolist()), reverse=True)) for npus in classes)
+
+# Exactly one candidate per class of equivalent schedules
+@pytest.mark.parametrize("hw_config, models", CASES)
+def test_canonical_covers_each_class_once ( make_instance, hw_config, models ):
+    instance = make_instance(hw_config, models)
+    classes, position = symmetric_exhaustive.npu_classes(instance)
+    expected = {
+            canonical_key(instance, classes, numpy.array(X))
+            for X in itertools.product(range(instance.LEN_D), repeat=instance.LEN_W)
+        }
+    C = symmetric_exhaustive.next_chunk(instance, symmetric_exhaustive.canonical(instance, classes), position, 1 << 20)
+    keys = []
+    for C_s in C:
+        S = schedule.empty_schedule(instance.LEN_W)
+        symmetric_exhaustive.expand(instance, C_s, S)
+        assert numpy.array_equal(energy_model.count_matrix(instance, S), C_s)
+        keys.append(canonical_key(instance, classes, S))
+    assert len(keys) == len(set(keys))
+    assert set(keys) == expected
+
+# Same optimum as the exhaustive search, in the per-npu semantics
+@pytest.mark.parametrize("hw_config, models", CASES + [
+        ("2x512_1x1024_1x2304_1x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201", "VGG-16", "MobileNet", "ResNet-50"]),
+    ])
+@pytest.mark.parametrize("opt_target", ["T_tot", "E_compute", "E_idle", "E_tot"])
+def test_optimum_matches_exhaustive ( make_instance, hw_config, models, opt_target ):
+    instance = make_instance(hw_config, models, semantics="per-npu")
+    S = schedule.empty_schedule(instance.LEN_W)
+    symmetric_exhaustive.thread_allocation_SE(instance, S, opt_target)
+    S_exhaustive = schedule.empty_schedule(instance.LEN_W)
+    exhaustive.thread_allocation_E(instance, S_exhaustive, opt_target)
+    assert energy_model.evaluate(instance, S).objective(opt_target) == pytest.approx(
+            energy_model.evaluate(instance, S_exhaustive).objective(opt_target), rel=1e-12)
+
+# Count matrices are scored in the per-npu semantics, baseline instances are refused
+def test_baseline_refused ( make_instance ):
+    hw_config, models = CASES[0]
+    instance = make_instance(hw_config, models)
+    S = schedule.empty_schedule(instance.LEN_W)
+    with pytest.raises(AssertionError):
+        symmetric_exhaustive.thread_allocation_SE(instance, S, "E_tot")
@@ -0,0 +1,79 @@
+import time
+import numpy
+import pandas
+import pytest
+from energy_sim import energy_model
+from energy_sim import search_budget
+from energy_sim import thread_allocation
+
+# A shared search serves all targets in one run, each as well as a run per target
+@pytest.mark.parametrize("name", ["Exhaustive", "Batched"])
+def test_multi_matches_single ( make_instance, name ):
+    instance = make_instance("1x512_3x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201", "VGG-16", "MobileNet"])
+    row = pandas.Series({"Name": name, "Batch_Size": 3})
+    numpy.random.seed(0)
+    S_list = thread_allocation.thread_allocation_multi(row, instance, energy_model.OPT_TARGETS)
+    for S, opt_target in zip(S_list, energy_model.OPT_TARGETS):
+        numpy.random.seed(0)
+        S_single = thread_allocation.thread_allocation(row, instance, opt_target)
+        assert energy_model.evaluate(instance, S).objective(opt_target) == pytest.approx(energy_model.evaluate(instance, S_single).objective(opt_target))
+
+# Target-agnostic heuristics run once on the first target's budget, the others mirror it
+@pytest.mark.parametrize("name", thread_allocation.TARGET_AGNOSTIC)
+def test_agnostic_budgets_follow ( make_instance, name ):
+    instance = make_instance("1x512_3x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"], semantics="per-npu")
+    row = pandas.Series({"Name": name, "Batch_Size": 0})
+    budgets = [search_budget.SearchBudget() for _ in energy_model.OPT_TARGETS]
+    S_list = thread_allocation.thread_allocation_multi(row, instance, energy_model.OPT_TARGETS, budgets=budgets)
+    assert all(numpy.array_equal(S, S_list[0]) for S in S_list)
+    for budget in budgets[1:]:
+        assert (budget.start_ns, budget.evaluations) == (budgets[0].start_ns, budgets[0].evaluations)
+
+def test_row_params ():
+    row = pandas.Series({"Name": "Simulated-Annealing", "Batch_Size": 0, "Seed": 7., "Params": "cooling=linear t_start=0.05 time_limit_s=None"})
+    assert thread_allocation.row_seed(row) == 7
+    assert thread_allocation.row_params(row, thread_allocation.SA_PARAMS) == {
+            "cooling": "linear",
+            "t_start": 0.05,
+            "time_limit_s": None,
+        }
+
+def test_row_params_empty ():
+    row = pandas.Series({"Name": "Genetic", "Batch_Size": 0, "Seed": float("nan"), "Params": float("nan")})
+    assert thread_allocation.row_seed(row) is None
+    assert thread_allocation.row_params(row, thread_allocation.GA_PARAMS) == {}
+    # Rows without the optional columns
+    row = pandas.Series({"Name": "Genetic", "Batch_Size": 0})
+    assert thread_allocation.row_seed(row) is None
+    assert thread_allocation.row_params(row, thread_allocation.GA_PARAMS) == {}
+
+# Randomized schedulers stop on the search budget's wall-clock limit, not on their default
+@pytest.mark.parametrize("name", ["Simulated-Annealing", "Genetic"])
+def test_budget_time_limit ( make_instance, name ):
+    instance = make_instance("2x512_1x1024_1x2304_1x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"] * 6, semantics="per-npu")
+    row = pandas.Series({"Name": name, "Batch_Size": 0, "Seed": 1, "Params": "time_limit_s=10"})
+    budget = search_budget.SearchBudget(time_limit_s=0.05)
+    time_start = time.perf_counter()
+    thread_allocation.thread_allocation(row, instance, "T_tot", budget=budget)
+    assert time.perf_counter() - time_start < 1.
+    assert budget.evaluations > 0
+
+# Exactly the schedulers in BUDGETED account their evaluations
+@pytest.mark.parametrize("name", [
+        "Exhaustive", "Exhaustive-Symmetric", "Dynamic-Programming", "Pareto-Frontier", "Branch-and-Bound",
+        "Simulated-Annealing", "Genetic",
+        "Greedy", "Greedy-LPT", "Round-Robin", "Random", "Arch-Affine", "Batched", "Batched-Carry",
+    ])
+def test_budgeted_schedulers ( make_instance, name ):
+    instance = make_instance("1x512_3x4096", ["VGG-16", "MobileNet", "ResNet-50", "DenseNet-201"], semantics="per-npu")
+    row = pandas.Series({"Name": name, "Batch_Size": 2, "Seed": 1, "Params": "time_limit_s=0.01"
+            if name in ["Simulated-Annealing", "Genetic"] else float("nan")})
+    budget = search_budget.SearchBudget()
+    thread_allocation.thread_allocation(row, instance, "T_tot", budget=budget)
+    assert (budget.evaluations > 0) == (name in thread_allocation.BUDGETED)
+
+# Per-npu only schedulers are refused in other semantics, others run in all
+@pytest.mark.parametrize("name", thread_allocation.PER_NPU_ONLY + ["Exhaustive", "Greedy", "Genetic"])
+def test_supports ( name ):
+    assert thread_allocation.supports(name, "per-npu")
+    assert thread_allocation.supports(name, "baseline") == (name not in thread_allocation.PER_NPU_ONLY)
@@ -0,0 +1,70 @@
+import pytest
+from energy_sim import utils
+
+# Restore switches, module settings and tracers after each test
+@pytest.fixture(autouse=True)
+def restore_tracing ():
+    modules = dict(utils._log_modules)
+    log_on = utils.LOG_ON
+    yield
+    utils._log_modules.clear()
+    utils._log_modules.update(modules)
+    utils.LOG_ON = log_on
+
+# Messages are formatted only when the module traces
+def test_lazy_formatting ( capsys ):
+    class Unformattable:
+        def __str__ ( self ):
+            raise AssertionError("formatted")
+    greedy = utils.get_log("schedulers.greedy")
+    utils.set_log_on("schedulers.greedy", False)
+    greedy("%s", Unformattable())
+    utils.set_log_on("schedulers.greedy")
+    greedy("%s and %s", 1, "two")
+    assert capsys.readouterr().out == "[LOG]: 1 and two\n"
+
+def test_all_on_except_one ():
+    greedy = utils.get_log("schedulers.greedy")
+    exhaustive = utils.get_log("schedulers.exhaustive")
+    utils.set_log_on("*")
+    utils.set_log_on("schedulers.greedy", False)
+    assert not greedy.on
+    assert exhaustive.on
+    assert not utils.is_log_on("schedulers.greedy")
+    assert utils.is_log_on("schedulers.exhaustive")
+    # Tracers registered later follow the same settings
+    assert utils.get_log("schedulers.not_yet_registered").on
+
+def test_wildcard_resets_modules ():
+    greedy = utils.get_log("schedulers.greedy")
+    utils.set_log_on("schedulers.greedy", False)
+    utils.set_log_on("*")
+    assert greedy.on
+    utils.set_log_on("*", False)
+    utils.set_log_on("schedulers.greedy")
+    assert greedy.on
+    assert not utils.get_log("schedulers.exhaustive").on
+
+def test_parse_modules ():
+    assert utils._parse_modules("*,-schedulers.greedy,energy_sim.energy_model,") == {
+            "*": True,
+            "schedulers.greedy": False,
+            "energy_sim.energy_model": True,
+        }
+
+# Assigning the global switch after import updates existing tracers, and print_log
+def test_global_switch_after_import ( capsys ):
+    from schedulers import greedy
+    assert not greedy.log.on
+    utils.LOG_ON = True
+    assert greedy.log.on
+    assert utils.get_log("schedulers.not_yet_registered_either").on
+    utils.print_log("on %s", 1)
+    assert capsys.readouterr().out == "[LOG]: on 1\n"
+    # Per-module settings still take precedence
+    utils.set_log_on("schedulers.greedy", False)
+    assert not greedy.log.on
+    utils.LOG_ON = False
+    utils.print_log("off")
+    assert capsys.readouterr().out == ""
+    assert not utils.get_log("schedulers.exhaustive").on